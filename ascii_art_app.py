@@ -1,73 +1,256 @@
 import sys
 import os
+import threading
 from PIL import Image
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QFileDialog, QLabel, 
-                             QSlider, QSpinBox, QTextEdit, QComboBox, QCheckBox,
+                             QSlider, QSpinBox, QComboBox, QCheckBox,
                              QMessageBox, QFrame, QSplitter, QGridLayout,
-                             QColorDialog, QGroupBox)
+                             QColorDialog, QGroupBox, QDoubleSpinBox)
 from PyQt5.QtGui import QPixmap, QFont, QColor, QPalette, QIcon, QTextCursor
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtCore import (Qt, QSize, QObject, QRunnable, QThreadPool, QTimer,
+                          pyqtSignal)
 
-# ASCII character sets (from darkest to lightest)
-ASCII_SETS = {
-    "Standard": ["@", "#", "S", "%", "?", "*", "+", ";", ":", ",", "."],
-    "Detailed": ["$", "@", "B", "%", "8", "&", "W", "M", "#", "*", "o", "a", "h", "k", "b", "d", "p", "q", "w", "m", "Z", "O", "0", "Q", "L", "C", "J", "U", "Y", "X", "z", "c", "v", "u", "n", "x", "r", "j", "f", "t", "/", "\\", "|", "(", ")", "1", "{", "}", "[", "]", "?", "-", "_", "+", "~", "<", ">", "i", "!", "l", "I", ";", ":", ",", "\"", "^", "`", "'", ".", " "],
-    "Simple": ["#", "+", ":", ".", " "],
-    "WhatsApp": ["█", "▓", "▒", "░", "⠀"],  # WhatsApp-friendly characters (block elements and invisible space)
-    "iPhone": ["#", "8", "=", ":", "."]  # iPhone-WhatsApp friendly (narrower characters)
+from ascii_converter import (ASCII_SETS, CHARSETS_CONFIG, DEFAULT_QUALITY, QUALITY_SETTINGS,
+                             AsciiArtConverter, ConversionCache, Instrumentation, load_charsets, stage)
+from ascii_shapes import MATCHING_MODES, dither_sub_cells, pattern_codes, render_shapes, sampled_plane
+from ascii_thumbnails import THUMBNAIL_SIZE, ThumbnailCache
+from ascii_viewer import AsciiViewer
+# ascii_color, ascii_export and ascii_raster are imported where they are used,
+# so the window opens without loading the export code
+
+
+# Delay before slider/spin box changes re-render the output
+LIVE_RENDER_DELAY_MS = 150
+
+# Stands in for the ASCII art in HTML templates which are written around the streamed rows
+ART_MARKER = "\x00ascii-art\x00"
+
+# Contrast presets, keyword arguments of AsciiArtConverter.adjust_tone
+CONTRAST_PRESETS = {
+    "None": {},
+    "Auto Levels": {"auto_levels": True},
+    "Equalize": {"equalize": True},
+    "Local Contrast": {"clahe": True},
 }
 
-class AsciiArtConverter:
-    @staticmethod
-    def resize_image(image, new_width, aspect_correction=0.5):
-        width, height = image.size
-        # Apply aspect ratio correction factor to compensate for character height/width ratio
-        # Most fixed-width fonts have characters that are about 2x taller than wide
-        ratio = height / width / aspect_correction
-        new_height = int(new_width * ratio)
-        resized_image = image.resize((new_width, new_height))
-        return resized_image
+
+# Dithering methods of AsciiArtConverter.dither
+DITHER_PRESETS = {
+    "None": None,
+    "Ordered": "ordered",
+    "Floyd-Steinberg": "floyd-steinberg",
+}
+
+
+# Stages whose output the GUI keeps, in pipeline order: (name, parameters read, upstream stages).
+# Changing a parameter re-runs its stage and the stages downstream of it; display settings
+# (font size, colors, zoom) are not in the graph and never reach the converter.
+RENDER_STAGES = (
+    ("resize", ("image", "width", "aspect_ratio", "quality", "layout"), ()),
+    ("tone", ("tone", "dither"), ("resize",)),
+    ("map", ("charset", "invert", "dither"), ("tone",)),
+    ("color", ("full_color",), ("resize",)),
+)
+
+
+class RenderPipeline:
+    """Conversion for the GUI that keeps every stage's output and re-runs only invalidated stages.
+
+    Brightness mapping, or shape matching when a coverage layout is given.
+    """
     
-    @staticmethod
-    def pixels_to_ascii(image, ascii_chars):
-        pixels = image.getdata()
-        # Map pixel values to characters based on brightness
-        # Adjust the division value based on the number of characters
-        divisor = 256 // len(ascii_chars)
-        characters = "".join([ascii_chars[min(pixel//divisor, len(ascii_chars)-1)] for pixel in pixels])
-        return characters
+    def __init__(self, cache):
+        self.cache = cache
+        self.keys = {}
+        self.outputs = {}
+        self.lock = threading.Lock()
     
     @staticmethod
-    def gray(image, invert=False):
-        grayscale_image = image.convert("L")
-        # Invert the image if requested
-        if invert:
-            grayscale_image = Image.eval(grayscale_image, lambda x: 255 - x)
-        return grayscale_image
+    def values(image_path, params, layout=None, full_color=False):
+        try:
+            stat = os.stat(image_path)
+            image = (image_path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            image = (image_path,)
+        # The character set by content, so reloading a set under the same name re-renders
+        charset = ASCII_SETS[params["ascii_set"]].key
+        return dict(params, image=image, image_path=image_path, layout=layout, full_color=full_color,
+                    charset=charset)
     
     @staticmethod
-    def convert_to_ascii(image_path, width=100, ascii_set="Standard", invert=False, aspect_ratio=0.5):
+    def stage_keys(values):
+        # A stage's key holds its own parameters and the keys of the stages it reads
+        keys = {}
+        for name, names, upstream in RENDER_STAGES:
+            keys[name] = tuple(values[param] for param in names) + tuple(keys[stage] for stage in upstream)
+        return keys
+    
+    def request_keys(self, image_path, params, layout=None, full_color=False):
+        """Stage keys of a request, to compare with the keys ``run`` returned for a shown result."""
+        return self.stage_keys(self.values(image_path, params, layout, full_color))
+    
+    def run(self, image_path, params, layout=None, instrumentation=None, full_color=False):
+        """Return ``(text, colors, keys)``; ``colors`` is ``(cells, palette, columns)`` in full color mode.
+
+        ``keys`` are the stage keys of this result. They are returned rather
+        than read from the pipeline later, since a newer run may have replaced
+        the pipeline's keys before this result is shown.
+        """
+        values = self.values(image_path, params, layout, full_color)
+        with self.lock:
+            keys = self.stage_keys(values)
+            for name, key in keys.items():
+                if self.keys.get(name) != key:
+                    self.outputs[name] = getattr(self, name)(values, instrumentation)
+                    self.keys[name] = key
+            return self.outputs["map"], self.outputs["color"], keys
+    
+    def resize(self, values, instrumentation):
+        if values["layout"] is None:
+            plane = AsciiArtConverter.grayscale_plane(values["image_path"], values["width"],
+                                                      values["aspect_ratio"], self.cache, values["quality"],
+                                                      instrumentation)
+            return plane, plane.size
+        with stage(instrumentation, "open"):
+            image = Image.open(values["image_path"])
+        return sampled_plane(image, values["width"], values["aspect_ratio"], values["quality"],
+                             values["layout"], instrumentation)
+    
+    def tone(self, values, instrumentation):
+        plane, grid = self.outputs["resize"]
+        plane, curve = AsciiArtConverter.tone_plane(plane, values["tone"], instrumentation)
+        if values["layout"] is None or grid[0] < 1 or grid[1] < 1:
+            return plane, curve
+        plane, curve = dither_sub_cells(plane, values["layout"], values["dither"], curve, instrumentation)
+        # Pattern codes do not depend on the character set, so they are kept with the tone
+        with stage(instrumentation, "format") as timed:
+            codes = pattern_codes(plane, grid, values["layout"], curve)
+            timed.pixels = grid[0] * grid[1]
+        return codes, None
+    
+    def map(self, values, instrumentation):
+        plane, curve = self.outputs["tone"]
+        ascii_chars = ASCII_SETS[values["ascii_set"]]
+        if values["layout"] is None:
+            # Dithering depends on the glyph levels, so it runs with the mapping
+            plane, curve = AsciiArtConverter.dither_plane(plane, ascii_chars, values["invert"], values["dither"],
+                                                          curve, instrumentation)
+            return AsciiArtConverter.render_ascii(plane, ascii_chars, values["invert"], instrumentation, curve)
+        return render_shapes(plane, ascii_chars, values["invert"], values["layout"], instrumentation,
+                             values["dither"])
+    
+    def color(self, values, instrumentation):
+        if not values["full_color"]:
+            return None
+        grid = self.outputs["resize"][1]
+        if grid[0] < 1 or grid[1] < 1:
+            return None
+        # Cell colors come from the RGB image resized like in ascii_color.color_rows
+        with stage(instrumentation, "open"):
+            image = Image.open(values["image_path"])
+        scale = AsciiArtConverter.decode_scale(image.size, grid, values["quality"])
+        reduced = AsciiArtConverter.load_reduced(image, scale, instrumentation)
+        with stage(instrumentation, "resize") as timed:
+            resized = reduced.resize(grid, QUALITY_SETTINGS[values["quality"]][1])
+            timed.pixels = grid[0] * grid[1]
+        from ascii_color import quantize_cells
+        with stage(instrumentation, "color") as timed:
+            cells, palette = quantize_cells(resized, "truecolor")
+            timed.pixels = grid[0] * grid[1]
+        return cells, palette, grid[0]
+
+
+class ConversionSignals(QObject):
+    finished = pyqtSignal(int, str)
+    failed = pyqtSignal(int, str)
+
+
+class ConversionTask(QRunnable):
+    """Runs one conversion off the GUI thread.
+
+    A task superseded by a newer request is cancelled: it is skipped if it has
+    not started yet, and its result is dropped otherwise.
+    """
+    
+    def __init__(self, request_id, image_path, params, pipeline, layout=None, full_color=False):
+        super().__init__()
+        self.request_id = request_id
+        self.image_path = image_path
+        self.params = params
+        self.pipeline = pipeline
+        self.layout = layout
+        self.full_color = full_color
+        self.colors = None
+        self.keys = None
+        self.cancelled = False
+        self.instrumentation = Instrumentation()
+        self.signals = ConversionSignals()
+    
+    def cancel(self):
+        self.cancelled = True
+    
+    def run(self):
+        if self.cancelled:
+            return
         try:
-            image = Image.open(image_path)
-            ascii_chars = ASCII_SETS[ascii_set]
-            
-            # Convert image to ASCII
-            new_image_data = AsciiArtConverter.pixels_to_ascii(
-                AsciiArtConverter.gray(
-                    AsciiArtConverter.resize_image(image, width, aspect_ratio), 
-                    invert
-                ),
-                ascii_chars
-            )
-            
-            # Format
-            pixel_count = len(new_image_data)  
-            ascii_image = "\n".join([new_image_data[index:(index+width)] for index in range(0, pixel_count, width)])
-            
-            return ascii_image
+            result, self.colors, self.keys = self.pipeline.run(self.image_path, self.params, self.layout,
+                                                               self.instrumentation, self.full_color)
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(self.request_id, str(e))
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(self.request_id, result)
+
+
+class AnimationExportTask(QRunnable):
+    """Converts every frame of an animated image and streams them to a file."""
+    
+    def __init__(self, image_path, file_name, params, html_options=None):
+        super().__init__()
+        self.image_path = image_path
+        self.file_name = file_name
+        self.params = params
+        self.html_options = html_options
+        self.signals = ConversionSignals()
+    
+    def run(self):
+        from ascii_export import save_frames_html, save_frames_text
+        try:
+            frames = AsciiArtConverter.convert_frames(self.image_path, **self.params)
+            if self.html_options is not None:
+                count = save_frames_html(frames, self.file_name, **self.html_options)
+            else:
+                count = save_frames_text(frames, self.file_name)
+        except Exception as e:
+            self.signals.failed.emit(0, str(e))
+            return
+        self.signals.finished.emit(count, self.file_name)
+
+
+class PreviewSignals(QObject):
+    finished = pyqtSignal(int, bytes)
+    failed = pyqtSignal(int, str)
+
+
+class PreviewTask(QRunnable):
+    """Loads the preview thumbnail of an image off the GUI thread, as PNG bytes."""
+    
+    def __init__(self, request_id, image_path, thumbnails):
+        super().__init__()
+        self.request_id = request_id
+        self.image_path = image_path
+        self.thumbnails = thumbnails
+        self.signals = PreviewSignals()
+    
+    def run(self):
+        try:
+            data = self.thumbnails.get(self.image_path, THUMBNAIL_SIZE)
         except Exception as e:
-            return f"Error: {str(e)}"
+            self.signals.failed.emit(self.request_id, str(e))
+            return
+        self.signals.finished.emit(self.request_id, data)
 
 
 class AsciiArtApp(QMainWindow):
@@ -76,10 +259,34 @@ class AsciiArtApp(QMainWindow):
         
         # Initialize attributes before calling initUI
         self.current_image_path = None
+        self.ascii_result = ""               # Last conversion, exported without reading back the widget
+        self.shown_keys = None               # Pipeline stage keys of ascii_result
         self.text_color = QColor("#000000")  # Default text color
         self.bg_color = QColor("#ffffff")    # Default background color
+        self.cache = ConversionCache()       # Reused across conversions of the same image
+        self.pipeline = RenderPipeline(self.cache)  # Re-runs only the stages a control change invalidates
+        self.thumbnails = ThumbnailCache()   # Previews of recently opened images, kept on disk
+        self.preview_id = 0
+        self.preview_task = None
+        
+        # Conversions run on a single background thread; newer requests supersede older ones
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(1)
+        self.conversion_task = None
+        self.conversion_id = 0
+        self.export_task = None
+        
+        # User character sets, registered before the character set list is built
+        charset_error = None
+        if os.path.exists(CHARSETS_CONFIG):
+            try:
+                load_charsets(CHARSETS_CONFIG)
+            except Exception as e:
+                charset_error = f"Could not load {CHARSETS_CONFIG}: {str(e)}"
         
         self.initUI()
+        if charset_error:
+            self.statusBar().showMessage(charset_error)
         
     def initUI(self):
         self.setWindowTitle("ASCII Art Generator")
@@ -164,47 +371,93 @@ class AsciiArtApp(QMainWindow):
         # Character set selection
         settings_layout.addWidget(QLabel("Character Set:"), 2, 0)
         self.charset_combo = QComboBox()
-        for key in ASCII_SETS.keys():
-            self.charset_combo.addItem(key)
-        settings_layout.addWidget(self.charset_combo, 2, 1, 1, 2)
+        self.refresh_charsets()
+        settings_layout.addWidget(self.charset_combo, 2, 1)
+        self.load_charsets_button = QPushButton("Load...")
+        self.load_charsets_button.setToolTip("Register character sets from a JSON file")
+        self.load_charsets_button.clicked.connect(self.load_charset_file)
+        settings_layout.addWidget(self.load_charsets_button, 2, 2)
+        
+        # Decoding quality (reduced-resolution decode and resampling filter)
+        settings_layout.addWidget(QLabel("Quality:"), 3, 0)
+        self.quality_combo = QComboBox()
+        for key in QUALITY_SETTINGS.keys():
+            self.quality_combo.addItem(key)
+        self.quality_combo.setCurrentText(DEFAULT_QUALITY)
+        settings_layout.addWidget(self.quality_combo, 3, 1, 1, 2)
+        
+        # Glyph matching: plain brightness or font coverage tables
+        settings_layout.addWidget(QLabel("Matching:"), 4, 0)
+        self.matching_combo = QComboBox()
+        for key in MATCHING_MODES.keys():
+            self.matching_combo.addItem(key)
+        self.matching_combo.setToolTip("Shape modes pick glyphs whose outline follows the edges of each cell")
+        settings_layout.addWidget(self.matching_combo, 4, 1, 1, 2)
+        
+        # Contrast adjustment of the downscaled image, and gamma
+        settings_layout.addWidget(QLabel("Contrast:"), 5, 0)
+        self.contrast_combo = QComboBox()
+        for key in CONTRAST_PRESETS.keys():
+            self.contrast_combo.addItem(key)
+        self.contrast_combo.setToolTip("Stretch or equalize brightness before choosing characters")
+        settings_layout.addWidget(self.contrast_combo, 5, 1)
+        self.gamma_spin = QDoubleSpinBox()
+        self.gamma_spin.setRange(0.2, 5.0)
+        self.gamma_spin.setSingleStep(0.1)
+        self.gamma_spin.setValue(1.0)
+        self.gamma_spin.setToolTip("Gamma, above 1 brightens the midtones")
+        settings_layout.addWidget(self.gamma_spin, 5, 2)
+        
+        # Dithering to the glyph levels
+        settings_layout.addWidget(QLabel("Dither:"), 6, 0)
+        self.dither_combo = QComboBox()
+        for key in DITHER_PRESETS.keys():
+            self.dither_combo.addItem(key)
+        self.dither_combo.setToolTip("Spread the rounding error over neighbouring cells to show smooth gradients")
+        settings_layout.addWidget(self.dither_combo, 6, 1, 1, 2)
         
         # Font size for output
-        settings_layout.addWidget(QLabel("Font Size:"), 3, 0)
+        settings_layout.addWidget(QLabel("Font Size:"), 7, 0)
         self.font_size_spin = QSpinBox()
         self.font_size_spin.setRange(4, 20)
         self.font_size_spin.setValue(8)  # Default font size
         self.font_size_spin.valueChanged.connect(self.update_font_size)
-        settings_layout.addWidget(self.font_size_spin, 3, 1, 1, 2)
+        settings_layout.addWidget(self.font_size_spin, 7, 1, 1, 2)
         
         # Invert option
         self.invert_check = QCheckBox("Invert Colors")
-        settings_layout.addWidget(self.invert_check, 4, 0, 1, 3)
+        settings_layout.addWidget(self.invert_check, 8, 0, 1, 3)
         
         # Color options
-        settings_layout.addWidget(QLabel("Text Color:"), 5, 0)
+        settings_layout.addWidget(QLabel("Text Color:"), 9, 0)
         self.text_color_button = QPushButton()
         self.text_color_button.setFixedSize(QSize(30, 20))
         self.text_color_button.setStyleSheet(f"background-color: {self.text_color.name()}; border: 1px solid #888;")
         self.text_color_button.clicked.connect(self.choose_text_color)
-        settings_layout.addWidget(self.text_color_button, 5, 1)
+        settings_layout.addWidget(self.text_color_button, 9, 1)
         
-        settings_layout.addWidget(QLabel("Background:"), 6, 0)
+        settings_layout.addWidget(QLabel("Background:"), 10, 0)
         self.bg_color_button = QPushButton()
         self.bg_color_button.setFixedSize(QSize(30, 20))
         self.bg_color_button.setStyleSheet(f"background-color: {self.bg_color.name()}; border: 1px solid #888;")
         self.bg_color_button.clicked.connect(self.choose_bg_color)
-        settings_layout.addWidget(self.bg_color_button, 6, 1)
+        settings_layout.addWidget(self.bg_color_button, 10, 1)
         
         # Apply colors to output
         self.apply_colors_check = QCheckBox("Apply Colors")
         self.apply_colors_check.setChecked(True)
-        settings_layout.addWidget(self.apply_colors_check, 7, 0, 1, 3)
+        settings_layout.addWidget(self.apply_colors_check, 11, 0, 1, 3)
         
         # WhatsApp mode
         self.whatsapp_mode_check = QCheckBox("WhatsApp Mode")
         self.whatsapp_mode_check.setToolTip("Optimize for sharing on WhatsApp (especially iPhone)")
         self.whatsapp_mode_check.stateChanged.connect(self.toggle_whatsapp_mode)
-        settings_layout.addWidget(self.whatsapp_mode_check, 8, 0, 1, 3)
+        settings_layout.addWidget(self.whatsapp_mode_check, 12, 0, 1, 3)
+        
+        # Full color HTML export
+        self.full_color_check = QCheckBox("Full Color")
+        self.full_color_check.setToolTip("Color each character like the image, in the output and when saving as HTML")
+        settings_layout.addWidget(self.full_color_check, 13, 0, 1, 3)
         
         settings_group.setLayout(settings_layout)
         control_layout.addWidget(settings_group)
@@ -226,8 +479,7 @@ class AsciiArtApp(QMainWindow):
         # ASCII Output
         output_group = QGroupBox("ASCII Output")
         output_layout = QVBoxLayout()
-        self.output_text = QTextEdit()
-        self.output_text.setReadOnly(True)
+        self.output_text = AsciiViewer()
         self.output_text.setFont(QFont("Courier New", 8))
         output_layout.addWidget(self.output_text)
         
@@ -248,6 +500,12 @@ class AsciiArtApp(QMainWindow):
         self.save_html_button.clicked.connect(self.save_as_html)
         self.save_html_button.setEnabled(False)
         
+        self.save_image_button = QPushButton("Save as Image")
+        self.save_image_button.setIcon(QIcon.fromTheme("image-x-generic"))
+        self.save_image_button.setToolTip("Render the ASCII art to a PNG or SVG file")
+        self.save_image_button.clicked.connect(self.save_as_image)
+        self.save_image_button.setEnabled(False)
+        
         self.whatsapp_button = QPushButton("Share to WhatsApp")
         self.whatsapp_button.setIcon(QIcon.fromTheme("document-share"))
         self.whatsapp_button.clicked.connect(self.share_to_whatsapp)
@@ -257,8 +515,16 @@ class AsciiArtApp(QMainWindow):
         output_buttons.addWidget(self.copy_button)
         output_buttons.addWidget(self.save_button)
         output_buttons.addWidget(self.save_html_button)
+        output_buttons.addWidget(self.save_image_button)
         output_buttons.addWidget(self.whatsapp_button)
         
+        self.animation_button = QPushButton("Export Animation")
+        self.animation_button.setIcon(QIcon.fromTheme("media-playback-start"))
+        self.animation_button.setToolTip("Convert every frame of an animated image (GIF)")
+        self.animation_button.clicked.connect(self.export_animation)
+        self.animation_button.setEnabled(False)
+        output_buttons.addWidget(self.animation_button)
+        
         output_layout.addLayout(output_buttons)
         output_group.setLayout(output_layout)
         right_layout.addWidget(output_group)
@@ -268,6 +534,25 @@ class AsciiArtApp(QMainWindow):
         splitter.addWidget(right_panel)
         splitter.setSizes([400, 600])
         
+        # Debounced live re-rendering while adjusting the conversion controls; the pipeline
+        # only re-runs the stages downstream of the changed setting (see RENDER_STAGES)
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.setInterval(LIVE_RENDER_DELAY_MS)
+        self.render_timer.timeout.connect(self.convert_image)
+        self.width_spin.valueChanged.connect(self.schedule_render)
+        self.aspect_spin.valueChanged.connect(self.schedule_render)
+        self.gamma_spin.valueChanged.connect(self.schedule_render)
+        self.quality_combo.currentTextChanged.connect(self.schedule_render)
+        self.matching_combo.currentTextChanged.connect(self.schedule_render)
+        self.contrast_combo.currentTextChanged.connect(self.schedule_render)
+        self.dither_combo.currentTextChanged.connect(self.schedule_render)
+        self.charset_combo.currentTextChanged.connect(self.schedule_render)
+        self.invert_check.stateChanged.connect(self.schedule_render)
+        self.full_color_check.stateChanged.connect(self.schedule_render)
+        # Display settings restyle the output without converting
+        self.apply_colors_check.stateChanged.connect(self.apply_colors)
+        
         # Status bar
         self.statusBar().showMessage("Ready")
         
@@ -307,7 +592,7 @@ class AsciiArtApp(QMainWindow):
             QLabel {
                 color: #343a40;
             }
-            QTextEdit {
+            AsciiViewer {
                 background-color: white;
                 border: 1px solid #ced4da;
                 border-radius: 4px;
@@ -337,17 +622,62 @@ class AsciiArtApp(QMainWindow):
             self.image_label.setText(os.path.basename(file_name))
             self.display_preview()
             self.convert_button.setEnabled(True)
+            try:
+                self.animation_button.setEnabled(AsciiArtConverter.frame_count(file_name) > 1)
+            except Exception:
+                self.animation_button.setEnabled(False)
+            self.cancel_conversion()
             self.statusBar().showMessage(f"Image loaded: {os.path.basename(file_name)}")
     
     def display_preview(self):
         if self.current_image_path:
-            pixmap = QPixmap(self.current_image_path)
-            if not pixmap.isNull():
-                pixmap = pixmap.scaled(300, 200, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.preview_label.setPixmap(pixmap)
-                self.preview_label.setMinimumSize(1, 1)  # Allow the label to resize with the pixmap
-            else:
-                self.preview_label.setText("Cannot display preview")
+            # Decoded at reduced resolution on a worker thread; previews of
+            # images selected since then are dropped when they arrive
+            self.preview_id += 1
+            self.preview_label.setText("Loading preview...")
+            self.preview_task = PreviewTask(self.preview_id, self.current_image_path, self.thumbnails)
+            self.preview_task.signals.finished.connect(self.preview_loaded)
+            self.preview_task.signals.failed.connect(self.preview_failed)
+            QThreadPool.globalInstance().start(self.preview_task)
+    
+    def preview_loaded(self, request_id, data):
+        if request_id != self.preview_id:
+            return
+        pixmap = QPixmap()
+        if pixmap.loadFromData(data, "PNG"):
+            self.preview_label.setPixmap(pixmap)
+            self.preview_label.setMinimumSize(1, 1)  # Allow the label to resize with the pixmap
+        else:
+            self.preview_label.setText("Cannot display preview")
+    
+    def preview_failed(self, request_id, message):
+        if request_id == self.preview_id:
+            self.preview_label.setText("Cannot display preview")
+    
+    def refresh_charsets(self):
+        """Fill the character set list from the registry, keeping the current selection."""
+        current = self.charset_combo.currentText()
+        self.charset_combo.clear()
+        for key in ASCII_SETS.keys():
+            self.charset_combo.addItem(key)
+        index = self.charset_combo.findText(current)
+        if index >= 0:
+            self.charset_combo.setCurrentIndex(index)
+    
+    def load_charset_file(self):
+        file_name, _ = QFileDialog.getOpenFileName(
+            self, "Load Character Sets", "", "JSON Files (*.json);;All Files (*)"
+        )
+        
+        if file_name:
+            try:
+                names = load_charsets(file_name)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Error loading character sets: {str(e)}")
+                self.statusBar().showMessage("Loading character sets failed")
+                return
+            self.refresh_charsets()
+            self.statusBar().showMessage(f"Loaded character sets: {', '.join(names)}")
     
     def choose_text_color(self):
         color = QColorDialog.getColor(self.text_color, self, "Select Text Color")
@@ -356,7 +686,7 @@ class AsciiArtApp(QMainWindow):
             self.text_color_button.setStyleSheet(f"background-color: {color.name()}; border: 1px solid #888;")
             
             # Update the output text color if colored output is enabled
-            if self.apply_colors_check.isChecked() and self.output_text.toPlainText():
+            if self.apply_colors_check.isChecked() and self.ascii_result:
                 self.apply_colors()
     
     def choose_bg_color(self):
@@ -366,64 +696,132 @@ class AsciiArtApp(QMainWindow):
             self.bg_color_button.setStyleSheet(f"background-color: {color.name()}; border: 1px solid #888;")
             
             # Update the output background if colored output is enabled
-            if self.apply_colors_check.isChecked() and self.output_text.toPlainText():
+            if self.apply_colors_check.isChecked() and self.ascii_result:
                 self.apply_colors()
     
     def apply_colors(self):
         # Apply the selected colors to the output text
         if self.apply_colors_check.isChecked():
-            self.output_text.setStyleSheet(
-                f"background-color: {self.bg_color.name()}; color: {self.text_color.name()};"
-            )
+            self.output_text.setColors(self.text_color, self.bg_color)
         else:
-            self.output_text.setStyleSheet("")
+            self.output_text.setColors(QColor("#000000"), QColor("#ffffff"))
     
     def update_font_size(self):
         """Update the font size of the ASCII output text."""
         size = self.font_size_spin.value()
         self.output_text.setFont(QFont("Courier New", size))
     
+    def conversion_params(self):
+        return {
+            "width": self.width_spin.value(),
+            "aspect_ratio": self.aspect_spin.value() / 100,  # Convert percentage to decimal
+            "ascii_set": self.charset_combo.currentText(),
+            "invert": self.invert_check.isChecked(),
+            "quality": self.quality_combo.currentText(),
+            "tone": self.tone_options(),
+            "dither": DITHER_PRESETS[self.dither_combo.currentText()],
+        }
+    
+    def tone_options(self):
+        tone = dict(CONTRAST_PRESETS[self.contrast_combo.currentText()])
+        if self.gamma_spin.value() != 1.0:
+            tone["gamma"] = self.gamma_spin.value()
+        return tone or None
+    
+    def matching_layout(self):
+        return MATCHING_MODES[self.matching_combo.currentText()]
+    
+    def schedule_render(self):
+        """Re-render after the controls have been still for a moment."""
+        if self.current_image_path:
+            self.render_timer.start()
+    
+    def cancel_conversion(self):
+        self.render_timer.stop()
+        if self.conversion_task is not None:
+            self.conversion_task.cancel()
+            self.conversion_task = None
+        self.conversion_id += 1
+    
     def convert_image(self):
         if not self.current_image_path:
             return
         
+        params, layout = self.conversion_params(), self.matching_layout()
+        full_color = self.full_color_check.isChecked()
+        self.cancel_conversion()
+        if self.ascii_result and self.shown_keys == self.pipeline.request_keys(self.current_image_path, params,
+                                                                               layout, full_color):
+            # Only display settings changed since the shown result
+            self.statusBar().showMessage("Conversion complete (unchanged)")
+            return
+        task = ConversionTask(self.conversion_id, self.current_image_path, params, self.pipeline, layout,
+                              full_color)
+        task.signals.finished.connect(self.conversion_finished)
+        task.signals.failed.connect(self.conversion_failed)
+        self.conversion_task = task
+        self.statusBar().showMessage("Converting image to ASCII...")
+        self.thread_pool.start(task)
+    
+    def convert_image_now(self):
+        """Convert on the GUI thread, for callers that need the result immediately."""
+        if not self.current_image_path:
+            return
+        
+        self.cancel_conversion()
+        instrumentation = Instrumentation()
         try:
-            width = self.width_spin.value()
-            aspect_ratio = self.aspect_spin.value() / 100  # Convert percentage to decimal
-            charset = self.charset_combo.currentText()
-            invert = self.invert_check.isChecked()
-            
-            self.statusBar().showMessage("Converting image to ASCII...")
-            
-            ascii_result = AsciiArtConverter.convert_to_ascii(
-                self.current_image_path, 
-                width=width,
-                ascii_set=charset,
-                invert=invert,
-                aspect_ratio=aspect_ratio
-            )
-            
-            self.output_text.setText(ascii_result)
-            self.apply_colors()
-            
-            # Enable buttons
-            self.save_button.setEnabled(True)
-            self.copy_button.setEnabled(True)
-            self.save_html_button.setEnabled(True)
-            self.whatsapp_button.setEnabled(True)
-            
-            self.statusBar().showMessage("Conversion complete")
-            
+            ascii_result, colors, keys = self.pipeline.run(self.current_image_path, self.conversion_params(),
+                                                           self.matching_layout(), instrumentation,
+                                                           self.full_color_check.isChecked())
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error converting image: {str(e)}")
-            self.statusBar().showMessage("Conversion failed")
+            self.conversion_failed(self.conversion_id, str(e))
+            return
+        self.conversion_finished(self.conversion_id, ascii_result, instrumentation.stats, colors, keys)
+    
+    def conversion_finished(self, request_id, ascii_result, stats=None, colors=None, keys=None):
+        if request_id != self.conversion_id:
+            return  # Superseded by a newer request
+        if self.conversion_task is not None:
+            if stats is None:
+                stats = self.conversion_task.instrumentation.stats
+            colors = self.conversion_task.colors
+            keys = self.conversion_task.keys
+        self.conversion_task = None
+        # What the view shows, so that an unchanged request can skip converting
+        self.shown_keys = keys
+        
+        # Setting the text resets the scroll ranges and repaints, so skip it when nothing changed
+        if ascii_result != self.ascii_result:
+            self.ascii_result = ascii_result
+            self.output_text.setText(ascii_result)
+        self.output_text.setCellColors(*(colors or (None,)))
+        self.apply_colors()
+        
+        # Enable buttons
+        self.save_button.setEnabled(True)
+        self.copy_button.setEnabled(True)
+        self.save_html_button.setEnabled(True)
+        self.save_image_button.setEnabled(True)
+        self.whatsapp_button.setEnabled(True)
+        
+        # Show where the time went; an empty breakdown means the result was cached
+        breakdown = stats.summary() if stats is not None else ""
+        self.statusBar().showMessage(f"Conversion complete ({breakdown or 'cached'})")
+    
+    def conversion_failed(self, request_id, message):
+        if request_id != self.conversion_id:
+            return
+        self.conversion_task = None
+        QMessageBox.critical(self, "Error", f"Error converting image: {message}")
+        self.statusBar().showMessage("Conversion failed")
     
     def copy_to_clipboard(self):
-        if not self.output_text.toPlainText():
+        if not self.ascii_result:
             return
             
         clipboard = QApplication.clipboard()
-        text = self.output_text.toPlainText()
+        text = self.ascii_result
         
         # For WhatsApp mode, add formatting to help with iPhone display
         if self.whatsapp_mode_check.isChecked():
@@ -436,7 +834,7 @@ class AsciiArtApp(QMainWindow):
         self.statusBar().showMessage("ASCII art copied to clipboard (WhatsApp-optimized)" if self.whatsapp_mode_check.isChecked() else "ASCII art copied to clipboard")
     
     def save_ascii(self):
-        if not self.output_text.toPlainText():
+        if not self.ascii_result:
             return
             
         file_name, _ = QFileDialog.getSaveFileName(
@@ -444,16 +842,17 @@ class AsciiArtApp(QMainWindow):
         )
         
         if file_name:
+            from ascii_export import save_text, text_blocks
             try:
-                with open(file_name, 'w') as f:
-                    f.write(self.output_text.toPlainText())
+                # Stream the rows to disk in chunks
+                save_text(text_blocks(self.ascii_result), file_name)
                 self.statusBar().showMessage(f"ASCII art saved to {file_name}")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error saving file: {str(e)}")
                 self.statusBar().showMessage("Save failed")
     
     def save_as_html(self):
-        if not self.output_text.toPlainText():
+        if not self.ascii_result:
             return
             
         file_name, _ = QFileDialog.getSaveFileName(
@@ -461,9 +860,9 @@ class AsciiArtApp(QMainWindow):
         )
         
         if file_name:
+            from ascii_color import ColorStats, color_rows, half_block_rows
+            from ascii_export import save_html, text_blocks
             try:
-                text = self.output_text.toPlainText()
-                
                 # Special handling for WhatsApp mode
                 if self.whatsapp_mode_check.isChecked():
                     # Add a special note for WhatsApp sharing
@@ -480,50 +879,111 @@ class AsciiArtApp(QMainWindow):
                 else:
                     whatsapp_note = ""
                 
-                # Replace spaces with non-breaking spaces and newlines with <br>
-                text = text.replace(" ", "&nbsp;").replace("\n", "<br>")
-                
-                # Get the current font size
-                font_size = self.font_size_spin.value()
-                
                 # Calculate an appropriate line-height based on aspect ratio
                 aspect_ratio = self.aspect_spin.value() / 100
                 line_height = aspect_ratio * 1.2  # Adjust this multiplier as needed
                 
-                html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>ASCII Art</title>
-    <style>
-        body {{
-            background-color: {self.bg_color.name()};
-            margin: 20px;
-            font-family: monospace;
-        }}
-        pre {{
-            color: {self.text_color.name()};
-            font-family: 'Courier New', monospace;
-            font-size: {font_size}pt;
-            line-height: {line_height};
-            white-space: pre;
-            letter-spacing: {"-0.1em" if self.whatsapp_mode_check.isChecked() else "0"};
-        }}
-    </style>
-</head>
-<body>
-    <pre>{text}</pre>
-    {whatsapp_note}
-</body>
-</html>"""
-                
-                with open(file_name, 'w') as f:
-                    f.write(html_content)
-                self.statusBar().showMessage(f"ASCII art saved as HTML to {file_name}")
+                color_stats = None
+                if self.full_color_check.isChecked():
+                    # Colored spans, with runs of equal colors merged, streamed row by row
+                    color_stats = ColorStats()
+                    if self.matching_layout() == "halfblock":
+                        # Both halves of every cell in their own color
+                        params = self.conversion_params()
+                        blocks = half_block_rows(Image.open(self.current_image_path), params["width"],
+                                                 params["aspect_ratio"], params["quality"], mode="html",
+                                                 stats=color_stats)
+                    else:
+                        blocks = color_rows(Image.open(self.current_image_path), mode="html",
+                                            stats=color_stats, **self.conversion_params())
+                else:
+                    # Rows are escaped and written in chunks
+                    blocks = text_blocks(self.ascii_result)
+                save_html(
+                    blocks, file_name,
+                    text_color=self.text_color.name(),
+                    bg_color=self.bg_color.name(),
+                    font_size=self.font_size_spin.value(),
+                    line_height=line_height,
+                    letter_spacing="-0.1em" if self.whatsapp_mode_check.isChecked() else "0",
+                    footer=whatsapp_note,
+                    escape=color_stats is None
+                )
+                message = f"ASCII art saved as HTML to {file_name}"
+                if color_stats is not None:
+                    message += f" ({color_stats.summary()})"
+                self.statusBar().showMessage(message)
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error saving HTML file: {str(e)}")
                 self.statusBar().showMessage("Save failed")
     
+    def save_as_image(self):
+        if not self.ascii_result:
+            return
+        
+        file_name, selected_filter = QFileDialog.getSaveFileName(
+            self, "Save as Image", "", "PNG Images (*.png);;SVG Images (*.svg)"
+        )
+        
+        if file_name:
+            from ascii_color import color_plane
+            from ascii_raster import save_png, save_svg
+            try:
+                svg = file_name.lower().endswith(".svg") or (
+                    "SVG" in selected_filter and not file_name.lower().endswith(".png"))
+                colors = None
+                if self.full_color_check.isChecked():
+                    params = self.conversion_params()
+                    colors = color_plane(Image.open(self.current_image_path), params["width"],
+                                         params["aspect_ratio"], params["quality"])
+                save_image = save_svg if svg else save_png
+                save_image(self.ascii_result, file_name, text_color=self.text_color.name(),
+                           bg_color=self.bg_color.name(), colors=colors)
+                self.statusBar().showMessage(f"ASCII art saved as image to {file_name}")
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Error saving image: {str(e)}")
+                self.statusBar().showMessage("Save failed")
+    
+    def export_animation(self):
+        if not self.current_image_path or self.export_task is not None:
+            return
+        
+        file_name, selected_filter = QFileDialog.getSaveFileName(
+            self, "Export Animation", "", "HTML Files (*.html);;Text Files (*.txt)"
+        )
+        if not file_name:
+            return
+        
+        params = self.conversion_params()
+        html_options = None
+        if file_name.lower().endswith(".html") or (
+                "HTML" in selected_filter and not file_name.lower().endswith(".txt")):
+            html_options = {
+                "text_color": self.text_color.name(),
+                "bg_color": self.bg_color.name(),
+                "font_size": self.font_size_spin.value(),
+                "line_height": params["aspect_ratio"] * 1.2,
+            }
+        
+        # Run on the global pool so exports do not queue behind conversions
+        self.export_task = AnimationExportTask(self.current_image_path, file_name, params, html_options)
+        self.export_task.signals.finished.connect(self.animation_exported)
+        self.export_task.signals.failed.connect(self.animation_export_failed)
+        self.animation_button.setEnabled(False)
+        self.statusBar().showMessage("Exporting animation...")
+        QThreadPool.globalInstance().start(self.export_task)
+    
+    def animation_exported(self, count, file_name):
+        self.export_task = None
+        self.animation_button.setEnabled(True)
+        self.statusBar().showMessage(f"{count} frames exported to {file_name}")
+    
+    def animation_export_failed(self, _, message):
+        self.export_task = None
+        self.animation_button.setEnabled(True)
+        QMessageBox.critical(self, "Error", f"Error exporting animation: {message}")
+        self.statusBar().showMessage("Export failed")
+    
     def toggle_whatsapp_mode(self, state):
         """Toggle WhatsApp-friendly mode for better sharing on mobile."""
         if state:
@@ -551,32 +1011,23 @@ class AsciiArtApp(QMainWindow):
 
     def share_to_whatsapp(self):
         """Prepare and share ASCII art to WhatsApp."""
-        if not self.output_text.toPlainText():
+        if not self.ascii_result:
             return
         
         # Automatically enable WhatsApp mode if not already enabled
         if not self.whatsapp_mode_check.isChecked():
             self.whatsapp_mode_check.setChecked(True)
             # This will trigger toggle_whatsapp_mode and convert
-            self.convert_image()
+            self.convert_image_now()
         
         # Create temporary HTML file for easy copy-paste to WhatsApp
         temp_dir = os.path.join(os.path.expanduser("~"), ".ascii_art_temp")
         os.makedirs(temp_dir, exist_ok=True)
         temp_file = os.path.join(temp_dir, "whatsapp_share.html")
         
+        from ascii_export import text_blocks, write_html_blocks
+        from ascii_raster import save_png
         try:
-            text = self.output_text.toPlainText()
-            
-            # Process text for iPhone-WhatsApp compatibility
-            lines = text.split("\n")
-            # Add double line breaks for iPhone display
-            text = "\n\n".join(lines)
-            
-            # Special handling for WhatsApp
-            # Replace spaces with non-breaking spaces and newlines with <br><br> for iPhone
-            text = text.replace(" ", "&nbsp;").replace("\n", "<br><br>")
-            
             html_content = f"""<!DOCTYPE html>
 <html>
 <head>
@@ -665,7 +1116,7 @@ class AsciiArtApp(QMainWindow):
         <h2>Your WhatsApp ASCII Art</h2>
         <div class="clearfix">
             <div class="message">
-                <pre>{text}</pre>
+                <pre>{ART_MARKER}</pre>
             </div>
         </div>
         <div class="instructions">
@@ -688,6 +1139,12 @@ class AsciiArtApp(QMainWindow):
             <button class="btn" id="selectBtn">Select ASCII Art</button>
             <a href="https://web.whatsapp.com/" target="_blank" class="btn">Open WhatsApp Web</a>
         </div>
+        <div class="instructions">
+            <h3>Or share it as a picture:</h3>
+            <p>Pasted text can lose its alignment on phones. This picture keeps it exactly:
+               save it and send it as a photo.</p>
+            <img src="whatsapp_share.png" alt="ASCII art" style="max-width: 100%;">
+        </div>
     </div>
     
     <script>
@@ -701,8 +1158,14 @@ class AsciiArtApp(QMainWindow):
 </body>
 </html>"""
             
+            html_head, html_tail = html_content.split(ART_MARKER, 1)
             with open(temp_file, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+                f.write(html_head)
+                # Double line breaks between rows for iPhone display, written in chunks
+                write_html_blocks(f, text_blocks(self.ascii_result), row_separator="<br><br><br><br>")
+                f.write(html_tail)
+            # The same art as a picture, which phones cannot reflow
+            save_png(self.ascii_result, os.path.join(temp_dir, "whatsapp_share.png"))
             
             # Open the HTML file in the default browser
             import webbrowser
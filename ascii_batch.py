@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""Headless batch conversion of images and directory trees to ASCII art.
+
+Examples:
+    python ascii_batch.py photos/ --width 120 --output-dir ascii/
+    python ascii_batch.py "shots/**/*.jpg" --charset Detailed --workers 8
+
+Outputs are written next to each input (``photo.jpg`` -> ``photo.txt``) or,
+with ``--output-dir``, mirrored below that directory. A manifest records the
+source hash and parameters of every output, so reruns only convert new or
+changed images.
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from ascii_converter import (ASCII_SETS, CHARSETS_CONFIG, DEFAULT_QUALITY, DITHER_MODES, MAPPED_EXTENSIONS,
+                             QUALITY_SETTINGS, AsciiArtConverter, Instrumentation, MappedImage, StageStats,
+                             content_hash, load_charsets, register_charset, stage)
+from ascii_color import ColorStats, color_plane, color_rows, half_block_rows
+from ascii_export import save_html, save_text
+from ascii_grid import GRID_EXTENSION, AsciiGrid
+from ascii_raster import IMAGE_FONT_SIZE, save_png, save_svg
+from ascii_shapes import SHAPE_LAYOUTS, render_shape_blocks, shape_plane
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".pgm", ".ppm", ".pnm", ".tif", ".tiff")
+# Rendered images carry their own suffix, so that they never replace a source image
+# and are not picked up as inputs by the next run
+RENDERED_SUFFIX = ".ascii"
+OUTPUT_EXTENSIONS = {"text": ".txt", "html": ".html", "png": RENDERED_SUFFIX + ".png",
+                     "svg": RENDERED_SUFFIX + ".svg", "grid": GRID_EXTENSION}
+# Output formats rendered from the whole text at once
+IMAGE_FORMATS = ("png", "svg")
+MANIFEST_NAME = ".ascii_batch.json"
+
+
+def find_images(patterns):
+    """Expand files, directories and glob patterns into (source, root) pairs.
+
+    ``root`` is the directory the output tree is mirrored from.
+    """
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            root = pattern
+            matches = (
+                os.path.join(dirpath, name)
+                for dirpath, _, names in os.walk(pattern)
+                for name in sorted(names)
+            )
+        elif glob.has_magic(pattern):
+            root = _glob_root(pattern)
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            root = os.path.dirname(pattern)
+            matches = [pattern]
+        for path in matches:
+            if not path.lower().endswith(IMAGE_EXTENSIONS) or not os.path.isfile(path):
+                continue
+            if os.path.splitext(os.path.splitext(path)[0])[1].lower() == RENDERED_SUFFIX:
+                # Output of an earlier --format png run
+                continue
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                yield path, root
+
+
+def _glob_root(pattern):
+    # Longest leading part of the pattern without wildcards
+    parts = []
+    for part in pattern.split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts)
+
+
+def output_path(source, root, output_dir, extension=".txt"):
+    stem = os.path.splitext(source)[0]
+    if output_dir is None:
+        return stem + extension
+    relative = os.path.relpath(stem, root or ".")
+    return os.path.join(output_dir, relative + extension)
+
+
+def convert_file(job):
+    """Convert one image; runs in a worker process.
+
+    Returns a dict with the source hash and timing, or the error message.
+    """
+    source, target, params, known_hash, profile = job
+    start = time.perf_counter()
+    instrumentation = Instrumentation() if profile else None
+    result = {"source": source, "target": target, "hash": None, "pixels": 0, "stages": None}
+    mapped = None
+    try:
+        if os.path.abspath(target) == os.path.abspath(source):
+            raise ValueError("the output would overwrite the source image")
+        charset = ASCII_SETS.get(params["charset"])
+        if charset is None or charset.spec != params["charset_spec"]:
+            # Workers that were not forked from the parent lack its user character sets
+            charset = register_charset(**params["charset_spec"])
+        if source.lower().endswith(MAPPED_EXTENSIONS) and not (params["color"] or params["shape"]):
+            try:
+                # Uncompressed images are streamed through a memory map instead of loaded
+                mapped = MappedImage(source)
+            except (ValueError, KeyError, struct.error):
+                pass
+        with stage(instrumentation, "open") as timed:
+            if mapped is not None:
+                result["hash"] = mapped.digest()
+            else:
+                with open(source, "rb") as f:
+                    data = f.read()
+                result["hash"] = content_hash(data)
+                timed.bytes = len(data)
+        if result["hash"] == known_hash and os.path.exists(target):
+            # Touched but unchanged since the last run
+            result["status"] = "unchanged"
+        else:
+            if mapped is not None:
+                result["pixels"] = mapped.size[0] * mapped.size[1]
+            else:
+                with stage(instrumentation, "open"):
+                    image = Image.open(io.BytesIO(data))
+                # Count source pixels before the decoder reduces the image
+                result["pixels"] = image.width * image.height
+            color_stats = None
+            cell_colors = None
+            tone = params["tone"]
+            dither = params["dither"]
+            grid = None
+            if params["format"] == "grid":
+                # The grid is rendered later, with any character set and export
+                if mapped is not None:
+                    plane = AsciiArtConverter.mapped_plane(mapped, params["width"], params["aspect_ratio"],
+                                                           instrumentation=instrumentation)
+                    grid = AsciiGrid(plane, params["aspect_ratio"], result["hash"])
+                else:
+                    grid = AsciiGrid.from_image(image, params["width"], params["aspect_ratio"], params["quality"],
+                                                bool(params["color"]), result["hash"], instrumentation)
+            elif mapped is not None:
+                plane = AsciiArtConverter.mapped_plane(mapped, params["width"], params["aspect_ratio"],
+                                                       instrumentation=instrumentation)
+                plane, curve = AsciiArtConverter.tone_plane(plane, tone, instrumentation)
+                plane, curve = AsciiArtConverter.dither_plane(plane, charset, params["invert"], dither, curve,
+                                                              instrumentation)
+                blocks = AsciiArtConverter.render_blocks(
+                    plane, charset, params["invert"], instrumentation=instrumentation, curve=curve
+                )
+            elif params["color"] and params["format"] in IMAGE_FORMATS:
+                # Images color the glyphs with the resized image itself
+                cell_colors = color_plane(image, params["width"], params["aspect_ratio"], params["quality"],
+                                          instrumentation)
+                with stage(instrumentation, "gray"):
+                    plane = AsciiArtConverter.gray(cell_colors)
+                plane, curve = AsciiArtConverter.tone_plane(plane, tone, instrumentation)
+                plane, curve = AsciiArtConverter.dither_plane(plane, charset, params["invert"], dither, curve,
+                                                              instrumentation)
+                blocks = AsciiArtConverter.render_blocks(
+                    plane, charset, params["invert"], instrumentation=instrumentation, curve=curve
+                )
+            elif params["color"] and params["shape"] == "halfblock":
+                # Two colors per cell, streamed one block per row
+                color_stats = ColorStats()
+                blocks = half_block_rows(
+                    image, params["width"], params["aspect_ratio"], params["quality"],
+                    "html" if params["format"] == "html" else params["color"],
+                    stats=color_stats, instrumentation=instrumentation
+                )
+            elif params["color"]:
+                # Colored rows are streamed as produced, one block per row
+                color_stats = ColorStats()
+                blocks = color_rows(
+                    image, params["width"], params["charset"], params["invert"], params["aspect_ratio"],
+                    params["quality"], "html" if params["format"] == "html" else params["color"],
+                    stats=color_stats, instrumentation=instrumentation, tone=tone, dither=dither
+                )
+            elif params["shape"]:
+                codes = shape_plane(image, params["width"], params["aspect_ratio"], params["quality"],
+                                    params["shape"], instrumentation, tone, dither)
+                blocks = render_shape_blocks(codes, charset, params["invert"], params["shape"],
+                                             instrumentation=instrumentation, dither=dither)
+            else:
+                plane = AsciiArtConverter.reduced_plane(
+                    image, params["width"], params["aspect_ratio"], params["quality"], instrumentation
+                )
+                plane, curve = AsciiArtConverter.tone_plane(plane, tone, instrumentation)
+                plane, curve = AsciiArtConverter.dither_plane(plane, charset, params["invert"], dither, curve,
+                                                              instrumentation)
+                # Rows are rendered in blocks and streamed to disk as they are produced
+                blocks = AsciiArtConverter.render_blocks(
+                    plane, charset, params["invert"], instrumentation=instrumentation, curve=curve
+                )
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            if grid is not None:
+                grid.save(target, instrumentation=instrumentation)
+            elif params["format"] == "html":
+                save_html(blocks, target, line_height=params["aspect_ratio"] * 1.2,
+                          escape=color_stats is None, instrumentation=instrumentation)
+            elif params["format"] in IMAGE_FORMATS:
+                save_image = save_png if params["format"] == "png" else save_svg
+                save_image("\n".join(blocks), target, colors=cell_colors, font_size=params["font_size"],
+                           instrumentation=instrumentation)
+            else:
+                save_text(blocks, target, instrumentation=instrumentation)
+            if color_stats is not None:
+                result["color"] = color_stats.summary()
+            result["status"] = "converted"
+    except Exception as e:
+        result.update(status="failed", hash=None, error=str(e))
+    finally:
+        if mapped is not None:
+            mapped.close()
+    result["elapsed"] = time.perf_counter() - start
+    if instrumentation is not None:
+        result["stages"] = instrumentation.stats.as_dict()
+    return result
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, path)
+
+
+def plan_jobs(sources, output_dir, params, manifest, force=False, profile=False):
+    """Split sources into jobs to run and outputs that are already up to date."""
+    params_key = json.dumps(params, sort_keys=True)
+    extension = OUTPUT_EXTENSIONS[params["format"]]
+    jobs, up_to_date = [], []
+    for source, root in sources:
+        target = output_path(source, root, output_dir, extension)
+        stat = os.stat(source)
+        entry = manifest.get(os.path.abspath(target))
+        known_hash = None
+        if entry and entry["params"] == params_key and not force:
+            if (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns, stat.st_size) \
+                    and os.path.exists(target):
+                up_to_date.append(source)
+                continue
+            known_hash = entry["hash"]
+        jobs.append((source, target, params, known_hash, profile))
+    return jobs, up_to_date
+
+
+def run(jobs, workers):
+    if workers == 1 or len(jobs) <= 1:
+        yield from map(convert_file, jobs)
+        return
+    # Larger chunks keep inter-process overhead low on very large trees
+    chunksize = max(1, min(64, len(jobs) // (workers * 8)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(convert_file, jobs, chunksize=chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert images to ASCII art in bulk.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", help="mirror the input tree below this directory "
+                                                   "(default: write next to each input)")
+    parser.add_argument("-w", "--width", type=int, default=100, help="characters per line")
+    parser.add_argument("-c", "--charset", default="Standard",
+                        help="character set: one of the built-in sets or a name from --charsets")
+    parser.add_argument("--charsets", help=f"JSON file of user character sets "
+                                           f"(default: {CHARSETS_CONFIG} if it exists)")
+    parser.add_argument("-a", "--aspect-ratio", type=float, default=0.5,
+                        help="character width/height correction")
+    parser.add_argument("-Q", "--quality", default=DEFAULT_QUALITY, choices=list(QUALITY_SETTINGS),
+                        help="reduced-resolution decoding and resampling quality")
+    parser.add_argument("--format", default="text", choices=list(OUTPUT_EXTENSIONS),
+                        help="write plain text, HTML, PNG or SVG files, or grid files that ascii_grid.py "
+                             "renders with any character set later")
+    parser.add_argument("--color", choices=("ansi256", "truecolor"),
+                        help="color every cell: ANSI escapes for text output, colored spans for HTML, "
+                             "the image colors for PNG and SVG")
+    parser.add_argument("--font-size", type=int, default=IMAGE_FONT_SIZE,
+                        help="font size in pixels of PNG and SVG output")
+    parser.add_argument("--shape", choices=list(SHAPE_LAYOUTS),
+                        help="match glyph shapes on this sub-cell layout instead of brightness only; "
+                             "braille and halfblock draw 2x4 dots or two half blocks per cell")
+    parser.add_argument("-i", "--invert", action="store_true", help="invert brightness")
+    parser.add_argument("--auto-levels", action="store_true",
+                        help="stretch the darkest and brightest levels of each image to full range")
+    parser.add_argument("--equalize", action="store_true", help="equalize the brightness histogram")
+    parser.add_argument("--clahe", action="store_true",
+                        help="contrast-limited local equalization per tile (local contrast)")
+    parser.add_argument("--gamma", type=float, default=1.0,
+                        help="gamma correction, above 1 brightens the midtones")
+    parser.add_argument("--dither", choices=list(DITHER_MODES),
+                        help="dither to the glyph levels instead of taking the nearest glyph per cell")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of CPUs)")
+    parser.add_argument("-f", "--force", action="store_true", help="convert up-to-date outputs again")
+    parser.add_argument("--manifest", help=f"state file for incremental runs "
+                                           f"(default: {MANIFEST_NAME} in the output directory)")
+    parser.add_argument("-p", "--profile", action="store_true",
+                        help="report time spent in each pipeline stage")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args(argv)
+    if args.shape and args.color and (args.shape != "halfblock" or args.format in IMAGE_FORMATS):
+        parser.error("--shape can only be combined with --color as --shape halfblock, "
+                     "for text and HTML output")
+    if args.format == "grid" and args.shape:
+        parser.error("--format grid stores one brightness per cell, which shape matching cannot use")
+    if args.format == "grid" and (args.auto_levels or args.equalize or args.clahe or args.gamma != 1.0
+                                  or args.dither or args.invert):
+        parser.error("--format grid stores the unadjusted brightness; pass the contrast, dithering and "
+                     "inversion options to ascii_grid.py when rendering the grid")
+    charsets_path = args.charsets or (CHARSETS_CONFIG if os.path.exists(CHARSETS_CONFIG) else None)
+    if charsets_path:
+        try:
+            load_charsets(charsets_path)
+        except Exception as e:
+            parser.error(f"cannot load character sets from {charsets_path}: {e}")
+    if args.gamma <= 0:
+        parser.error("--gamma must be positive")
+    if args.charset not in ASCII_SETS:
+        parser.error(f"unknown character set {args.charset!r} (choose from {', '.join(ASCII_SETS)})")
+    tone = {option: True for option in ("auto_levels", "equalize", "clahe") if getattr(args, option)}
+    if args.gamma != 1.0:
+        tone["gamma"] = args.gamma
+
+    params = {
+        "width": args.width,
+        "charset": args.charset,
+        "charset_spec": ASCII_SETS[args.charset].spec,
+        "aspect_ratio": args.aspect_ratio,
+        "invert": args.invert,
+        "quality": args.quality,
+        "format": args.format,
+        "color": args.color,
+        "shape": args.shape,
+        "tone": tone or None,
+        "dither": args.dither,
+    }
+    if args.format in IMAGE_FORMATS:
+        params["font_size"] = args.font_size
+    manifest_path = args.manifest or os.path.join(args.output_dir or ".", MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    params_key = json.dumps(params, sort_keys=True)
+
+    start = time.perf_counter()
+    sources = list(find_images(args.inputs))
+    jobs, up_to_date = plan_jobs(sources, args.output_dir, params, manifest, args.force, args.profile)
+    stage_totals = StageStats()
+
+    counts = {"converted": 0, "unchanged": 0, "failed": 0}
+    pixels = 0
+    try:
+        for result in run(jobs, max(1, args.workers)):
+            status = result["status"]
+            counts[status] += 1
+            pixels += result["pixels"]
+            if result["stages"]:
+                stage_totals.merge(result["stages"])
+            if status == "failed":
+                print(f"FAILED {result['source']}: {result['error']}", file=sys.stderr)
+                continue
+            stat = os.stat(result["source"])
+            manifest[os.path.abspath(result["target"])] = {
+                "hash": result["hash"],
+                "params": params_key,
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+            }
+            if not args.quiet:
+                print(f"{result['elapsed'] * 1000:8.1f} ms  {status:9}  {result['source']} -> {result['target']}")
+                if result.get("color"):
+                    print(f"             {result['color']}")
+                if result["stages"]:
+                    file_stats = StageStats()
+                    file_stats.merge(result["stages"])
+                    print(f"             {file_stats.summary()}")
+    finally:
+        save_manifest(manifest_path, manifest)
+
+    elapsed = time.perf_counter() - start
+    done = counts["converted"] + counts["unchanged"]
+    rate = done / elapsed if elapsed else 0.0
+    print(f"{len(sources)} images: {counts['converted']} converted, "
+          f"{len(up_to_date) + counts['unchanged']} up to date, {counts['failed']} failed "
+          f"in {elapsed:.2f} s ({rate:.1f} images/s, {pixels / elapsed / 1e6 if elapsed else 0:.1f} Mpixels/s)")
+    if args.profile and stage_totals.stages:
+        # Stage times are summed over all workers, so they can exceed the wall time
+        print(f"stages (summed across workers): {stage_totals.summary()}")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
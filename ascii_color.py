@@ -0,0 +1,260 @@
+"""Full-color rendering to ANSI escapes or HTML spans.
+
+Glyphs come from the usual brightness mapping; each cell is additionally
+colored with the RGB of the resized image. Colors are quantized with Pillow
+(a fixed 6x6x6 cube for 256-color terminals, an adaptive palette otherwise)
+so that neighbouring cells often share a color, and runs of equal colors in a
+row are merged into a single escape sequence or ``<span>``.
+
+Half-block rows show two colors per cell instead: an upper half block drawn
+in the color of the top sample over a background of the bottom sample.
+"""
+import html
+import re
+
+from PIL import Image, ImageChops
+
+from ascii_converter import (ASCII_SETS, DEFAULT_QUALITY, QUALITY_SETTINGS, AsciiArtConverter,
+                             stage)
+
+COLOR_MODES = ("ansi256", "truecolor", "html")
+# Palette size for the truecolor and HTML modes; fewer colors give longer runs
+DEFAULT_COLORS = 64
+ANSI_RESET = "\x1b[0m"
+HALF_BLOCK = "▀"
+
+# Runs of equal palette indices within one row, and of equal index pairs
+_RUNS = re.compile(rb"(.)\1*", re.DOTALL)
+_PAIR_RUNS = re.compile(rb"(..)\1*", re.DOTALL)
+
+# Channel levels of the xterm 6x6x6 color cube (codes 16-231)
+CUBE_LEVELS = (0, 95, 135, 175, 215, 255)
+
+
+def _cube_index(value):
+    # Nearest cube level for an 8-bit channel value
+    if value < 48:
+        return 0
+    if value < 115:
+        return 1
+    return (value - 35) // 40
+
+
+# Per-channel tables so that red + green + blue gives the cube index 0-215
+_CUBE_TABLES = tuple(
+    [_cube_index(value) * weight for value in range(256)] for weight in (36, 6, 1)
+)
+CUBE_PALETTE = [
+    (CUBE_LEVELS[index // 36], CUBE_LEVELS[index // 6 % 6], CUBE_LEVELS[index % 6])
+    for index in range(216)
+]
+
+
+class ColorStats:
+    """Counts showing how much merging runs of equal colors saved."""
+
+    def __init__(self):
+        self.cells = 0
+        self.runs = 0
+        self.merged_chars = 0
+        self.unmerged_chars = 0
+
+    @property
+    def savings(self):
+        """Fraction of output saved compared with one color code per cell."""
+        if not self.unmerged_chars:
+            return 0.0
+        return 1 - self.merged_chars / self.unmerged_chars
+
+    def summary(self):
+        return (f"{self.cells} cells in {self.runs} color runs, "
+                f"{self.merged_chars} chars instead of {self.unmerged_chars} "
+                f"({self.savings:.0%} smaller)")
+
+
+def quantize_cells(image, mode, colors=DEFAULT_COLORS):
+    """Quantize a grid-sized image to one palette index byte per cell.
+
+    Returns ``(indices, palette)`` where ``palette`` lists ``(r, g, b)``. Done
+    entirely with Pillow operations, without a per-pixel Python loop.
+    """
+    rgb = image.convert("RGB")
+    if mode == "ansi256":
+        red, green, blue = (band.point(table) for band, table in zip(rgb.split(), _CUBE_TABLES))
+        indices = ImageChops.add(ImageChops.add(red, green), blue)
+        return indices.tobytes(), CUBE_PALETTE
+    quantized = rgb.quantize(colors=colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    palette = quantized.getpalette()
+    palette = [tuple(palette[index:index + 3]) for index in range(0, len(palette), 3)]
+    return quantized.tobytes(), palette
+
+
+def _run_markup(mode, palette):
+    # (prefix, suffix) around a run for every palette index
+    if mode == "ansi256":
+        return [(f"\x1b[38;5;{16 + index}m", "") for index in range(len(palette))]
+    if mode == "truecolor":
+        return [(f"\x1b[38;2;{r};{g};{b}m", "") for r, g, b in palette]
+    return [(f'<span style="color:#{r:02x}{g:02x}{b:02x}">', "</span>") for r, g, b in palette]
+
+
+def _pair_markup(mode, palette, top, bottom):
+    # (prefix, suffix) around a run of half blocks in the colors of two palette indices
+    if mode == "ansi256":
+        return f"\x1b[38;5;{16 + top};48;5;{16 + bottom}m", ""
+    (red, green, blue), (low_red, low_green, low_blue) = palette[top], palette[bottom]
+    if mode == "truecolor":
+        return f"\x1b[38;2;{red};{green};{blue};48;2;{low_red};{low_green};{low_blue}m", ""
+    return (f'<span style="color:#{red:02x}{green:02x}{blue:02x};'
+            f'background-color:#{low_red:02x}{low_green:02x}{low_blue:02x}">', "</span>")
+
+
+def iter_color_rows(image, ascii_chars, invert=False, mode="truecolor", colors=DEFAULT_COLORS,
+                    stats=None, instrumentation=None, tone=None, dither=None):
+    """Yield colored rows for a grid-sized RGB image.
+
+    ANSI rows end with a reset sequence; HTML rows contain escaped glyphs in
+    ``<span>`` elements and belong inside a ``<pre>``. ``stats`` (a
+    ``ColorStats``) is updated as rows are produced. ``tone`` and ``dither``
+    affect the glyph brightness only, the colors are kept.
+    """
+    if mode not in COLOR_MODES:
+        raise ValueError(f"Unknown color mode: {mode}")
+    width, height = image.size
+    if not width or not height:
+        return
+    plane, curve = AsciiArtConverter.tone_plane(AsciiArtConverter.gray(image), tone, instrumentation)
+    plane, curve = AsciiArtConverter.dither_plane(plane, ascii_chars, invert, dither, curve, instrumentation)
+    ascii_image = AsciiArtConverter.render_ascii(plane, ascii_chars, invert, instrumentation, curve)
+    with stage(instrumentation, "color") as timed:
+        cells, palette = quantize_cells(image, mode, colors)
+        timed.pixels = width * height
+    markup = _run_markup(mode, palette)
+    escape = mode == "html" and any(html.escape(char, quote=False) != char for char in ascii_chars)
+    row_end = ANSI_RESET if mode != "html" else ""
+
+    for y, glyphs in enumerate(ascii_image.split("\n")):
+        with stage(instrumentation, "color") as timed:
+            row_cells = cells[y * width:(y + 1) * width]
+            parts = []
+            for run in _RUNS.finditer(row_cells):
+                start, end = run.span()
+                prefix, suffix = markup[row_cells[start]]
+                text = glyphs[start:end]
+                if escape:
+                    text = html.escape(text, quote=False)
+                parts.append(prefix)
+                parts.append(text)
+                parts.append(suffix)
+                if stats is not None:
+                    stats.runs += 1
+                    stats.unmerged_chars += (len(prefix) + len(suffix)) * (end - start) + len(text)
+            parts.append(row_end)
+            row = "".join(parts)
+            timed.bytes = len(row)
+        if stats is not None:
+            stats.cells += width
+            stats.merged_chars += len(row)
+            stats.unmerged_chars += len(row_end)
+        yield row
+
+
+def color_plane(image, width=100, aspect_ratio=0.5, quality=DEFAULT_QUALITY, instrumentation=None):
+    """Grid-sized color image for an opened image, decoded at reduced resolution like the plain path."""
+    grid = AsciiArtConverter.grid_size(image.size, width, aspect_ratio)
+    scale = AsciiArtConverter.decode_scale(image.size, grid, quality)
+    reduced = AsciiArtConverter.load_reduced(image, scale, instrumentation)
+    with stage(instrumentation, "resize") as timed:
+        resized = reduced.resize(grid, QUALITY_SETTINGS[quality][1])
+        timed.pixels = grid[0] * grid[1]
+    return resized
+
+
+def color_rows(image, width=100, ascii_set="Standard", invert=False, aspect_ratio=0.5,
+               quality=DEFAULT_QUALITY, mode="truecolor", colors=DEFAULT_COLORS, stats=None,
+               instrumentation=None, tone=None, dither=None):
+    """Colored rows for an opened image, decoded at reduced resolution like the plain path."""
+    resized = color_plane(image, width, aspect_ratio, quality, instrumentation)
+    return iter_color_rows(resized, ASCII_SETS[ascii_set], invert, mode, colors, stats, instrumentation, tone,
+                           dither)
+
+
+def iter_half_block_rows(image, mode="truecolor", colors=DEFAULT_COLORS, stats=None, instrumentation=None):
+    """Yield rows of colored half blocks for an RGB image of two samples per cell, top over bottom.
+
+    Every cell is an upper half block in the color of its top sample on the
+    color of its bottom sample; runs of cells with the same pair of colors
+    share one escape sequence or ``<span>``. Rows are like ``iter_color_rows``.
+    """
+    if mode not in COLOR_MODES:
+        raise ValueError(f"Unknown color mode: {mode}")
+    width, height = image.size
+    if not width or height < 2:
+        return
+    with stage(instrumentation, "color") as timed:
+        samples, palette = quantize_cells(image, mode, colors)
+        timed.pixels = width * height
+    row_end = ANSI_RESET if mode != "html" else ""
+    markup = {}
+
+    for y in range(height // 2):
+        with stage(instrumentation, "color") as timed:
+            # Top and bottom index of every cell, interleaved into pairs
+            pairs = bytearray(width * 2)
+            pairs[0::2] = samples[2 * y * width:(2 * y + 1) * width]
+            pairs[1::2] = samples[(2 * y + 1) * width:(2 * y + 2) * width]
+            parts = []
+            for run in _PAIR_RUNS.finditer(pairs):
+                start, end = run.span()
+                key = (pairs[start], pairs[start + 1])
+                if key not in markup:
+                    markup[key] = _pair_markup(mode, palette, *key)
+                prefix, suffix = markup[key]
+                text = HALF_BLOCK * ((end - start) // 2)
+                parts.append(prefix)
+                parts.append(text)
+                parts.append(suffix)
+                if stats is not None:
+                    stats.runs += 1
+                    stats.unmerged_chars += (len(prefix) + len(suffix) + 1) * len(text)
+            parts.append(row_end)
+            row = "".join(parts)
+            timed.bytes = len(row)
+        if stats is not None:
+            stats.cells += width
+            stats.merged_chars += len(row)
+            stats.unmerged_chars += len(row_end)
+        yield row
+
+
+def half_block_plane(image, width=100, aspect_ratio=0.5, quality=DEFAULT_QUALITY, instrumentation=None):
+    """Color image of the grid with two samples per cell, stacked vertically, decoded at reduced resolution."""
+    columns, rows = AsciiArtConverter.grid_size(image.size, width, aspect_ratio)
+    sampled = (max(columns, 0), max(rows, 0) * 2)
+    if not sampled[0] or not sampled[1]:
+        return Image.new("RGB", sampled)
+    scale = AsciiArtConverter.decode_scale(image.size, sampled, quality)
+    reduced = AsciiArtConverter.load_reduced(image, scale, instrumentation)
+    with stage(instrumentation, "resize") as timed:
+        resized = reduced.resize(sampled, QUALITY_SETTINGS[quality][1])
+        timed.pixels = sampled[0] * sampled[1]
+    return resized
+
+
+def half_block_rows(image, width=100, aspect_ratio=0.5, quality=DEFAULT_QUALITY, mode="truecolor",
+                    colors=DEFAULT_COLORS, stats=None, instrumentation=None):
+    """Colored half-block rows for an opened image, twice the vertical resolution of ``color_rows``."""
+    resized = half_block_plane(image, width, aspect_ratio, quality, instrumentation)
+    return iter_half_block_rows(resized, mode, colors, stats, instrumentation)
+
+
+def convert_to_color(image_path, width=100, ascii_set="Standard", invert=False, aspect_ratio=0.5,
+                     quality=DEFAULT_QUALITY, mode="truecolor", colors=DEFAULT_COLORS,
+                     instrumentation=None, tone=None, dither=None):
+    """Convert an image file to colored text; returns ``(text, ColorStats)``."""
+    stats = ColorStats()
+    with stage(instrumentation, "open"):
+        image = Image.open(image_path)
+    rows = color_rows(image, width, ascii_set, invert, aspect_ratio, quality, mode, colors, stats,
+                      instrumentation, tone, dither)
+    return "\n".join(rows), stats
@@ -0,0 +1,1443 @@
+"""Image to ASCII conversion core shared by the GUI and the command line tools.
+
+This module must not import PyQt5 so it can be used headless. It is also
+imported first by every entry point, so modules only some paths need (thread
+pools, JSON) are imported where they are used to keep startup short.
+"""
+import sys
+import os
+import io
+import bisect
+import hashlib
+import math
+import mmap
+import struct
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from PIL import Image, ImageChops, ImageSequence
+
+# Built-in ASCII character sets (from darkest to lightest)
+BUILTIN_SETS = {
+    "Standard": ["@", "#", "S", "%", "?", "*", "+", ";", ":", ",", "."],
+    "Detailed": ["$", "@", "B", "%", "8", "&", "W", "M", "#", "*", "o", "a", "h", "k", "b", "d", "p", "q", "w", "m", "Z", "O", "0", "Q", "L", "C", "J", "U", "Y", "X", "z", "c", "v", "u", "n", "x", "r", "j", "f", "t", "/", "\\", "|", "(", ")", "1", "{", "}", "[", "]", "?", "-", "_", "+", "~", "<", ">", "i", "!", "l", "I", ";", ":", ",", "\"", "^", "`", "'", ".", " "],
+    "Simple": ["#", "+", ":", ".", " "],
+    "WhatsApp": ["█", "▓", "▒", "░", "⠀"],  # WhatsApp-friendly characters (block elements and invisible space)
+    "iPhone": ["#", "8", "=", ":", "."]  # iPhone-WhatsApp friendly (narrower characters)
+}
+
+# How gray levels are split between the glyphs of a set
+THRESHOLD_MODES = ("uniform", "gamma", "equalized", "breakpoints")
+
+# Character sets loaded by the GUI at startup when the file exists
+CHARSETS_CONFIG = os.path.join(os.path.expanduser("~"), ".ascii_art_charsets.json")
+
+
+def glyph_indices(count, thresholds="uniform", gamma=1.0, histogram=None, breakpoints=None):
+    """Index of the glyph (0 = darkest) used for each of the 256 gray levels.
+
+    ``uniform`` gives every glyph ``256 // count`` levels, ``gamma`` spaces
+    the thresholds along ``level ** gamma``, ``equalized`` gives every glyph an
+    equal share of a 256-bin reference ``histogram`` and ``breakpoints`` lists
+    the ``count - 1`` levels at which the next glyph starts.
+    """
+    if thresholds == "uniform":
+        divisor = 256 // count
+        return [min(level // divisor, count - 1) for level in range(256)]
+    if thresholds == "gamma":
+        if gamma <= 0:
+            raise ValueError("gamma must be positive")
+        return [min(int((level / 255) ** gamma * count), count - 1) for level in range(256)]
+    if thresholds == "equalized":
+        if histogram is None or len(histogram) != 256 or not sum(histogram):
+            raise ValueError("equalized thresholds need a non-empty 256-bin histogram")
+        total = sum(histogram)
+        indices = []
+        below = 0
+        for pixels in histogram:
+            # Position of the middle of this level in the cumulative histogram
+            indices.append(min(int((below + pixels / 2) / total * count), count - 1))
+            below += pixels
+        return indices
+    if thresholds == "breakpoints":
+        if breakpoints is None or len(breakpoints) != count - 1:
+            raise ValueError(f"{count} glyphs need {count - 1} breakpoints")
+        if any(not 0 < level < 256 for level in breakpoints) or list(breakpoints) != sorted(set(breakpoints)):
+            raise ValueError("breakpoints must be increasing gray levels between 1 and 255")
+        return [bisect.bisect_right(breakpoints, level) for level in range(256)]
+    raise ValueError(f"Unknown thresholds: {thresholds}")
+
+
+def check_monospace(ascii_chars):
+    """Raise ``ValueError`` unless every glyph is one character occupying one cell."""
+    if not 1 <= len(ascii_chars) <= 256:
+        raise ValueError("a character set needs between 1 and 256 glyphs")
+    for char in ascii_chars:
+        if not isinstance(char, str) or len(char) != 1:
+            raise ValueError(f"{char!r} is not a single character")
+        if unicodedata.east_asian_width(char) in ("W", "F"):
+            raise ValueError(f"{char!r} is double width")
+        if unicodedata.category(char) in ("Cc", "Cf", "Cn", "Co", "Cs", "Mn", "Me", "Zl", "Zp"):
+            raise ValueError(f"{char!r} does not occupy a cell of its own")
+
+
+def build_lookup_table(ascii_chars, invert=False, indices=None):
+    """Precompute the 256-entry gray level -> glyph tables for a character set.
+
+    Returns ``(planes, encoding)``. Each plane is a ``bytes.translate`` table
+    producing one byte of the encoded glyph, so a whole image is mapped with one
+    translate per plane: a single plane for ASCII sets, two for UTF-16 and four
+    for UTF-32. ``indices`` (see ``glyph_indices``) defaults to uniform thresholds.
+    """
+    if indices is None:
+        indices = glyph_indices(len(ascii_chars))
+    if invert:
+        indices = indices[::-1]
+    glyphs = [ascii_chars[index] for index in indices]
+    return encode_glyphs(glyphs)
+
+
+def encode_glyphs(glyphs):
+    """Encode a 256-entry byte value -> glyph list into ``(planes, encoding)``."""
+    highest = max(ord(char) for char in glyphs)
+    if highest < 0x80:
+        encoding, unit = "ascii", 1
+    elif highest < 0x10000:
+        encoding, unit = "utf-16-le", 2
+    else:
+        encoding, unit = "utf-32-le", 4
+    encoded = [glyph.encode(encoding) for glyph in glyphs]
+    planes = tuple(bytes(code[byte] for code in encoded) for byte in range(unit))
+    return planes, encoding
+
+
+def compose_table(table, curve):
+    """Fold a 256-entry gray level curve into a ``(planes, encoding)`` table.
+
+    Mapping through the composed table equals applying the curve and then the
+    table, without an extra pass over the pixels.
+    """
+    planes, encoding = table
+    levels = bytes(curve)
+    return tuple(levels.translate(plane) for plane in planes), encoding
+
+
+def _map_pixels(pixels, table, width=None, height=None):
+    # Translate gray levels into encoded glyphs, one plane per encoded byte.
+    # When width is given every row carries one padding column which becomes
+    # the line break.
+    planes, encoding = table
+    newline = "\n".encode(encoding)
+    mapped = []
+    for plane, newline_byte in zip(planes, newline):
+        mapped_plane = pixels.translate(plane)
+        if width is not None:
+            mapped_plane = bytearray(mapped_plane)
+            mapped_plane[width::width + 1] = bytes((newline_byte,)) * height
+        mapped.append(mapped_plane)
+    if len(mapped) == 1:
+        buffer = mapped[0]
+    else:
+        # Interleave the planes back into code units
+        unit = len(mapped)
+        buffer = bytearray(len(pixels) * unit)
+        for index, mapped_plane in enumerate(mapped):
+            buffer[index::unit] = mapped_plane
+    if width is not None:
+        # Drop the trailing line break
+        buffer = memoryview(buffer)[:-len(newline)]
+    return str(buffer, encoding)
+
+
+_LOOKUP_TABLES = {}
+
+
+def get_lookup_table(ascii_chars, invert=False):
+    if isinstance(ascii_chars, Charset):
+        # Registered sets carry the tables compiled at registration
+        return ascii_chars.tables[bool(invert)]
+    key = (tuple(ascii_chars), bool(invert))
+    table = _LOOKUP_TABLES.get(key)
+    if table is None:
+        table = _LOOKUP_TABLES[key] = build_lookup_table(key[0], key[1])
+    return table
+
+
+class Charset(tuple):
+    """A validated character set with its lookup tables compiled once.
+
+    Behaves as the tuple of its glyphs (darkest first); ``tables`` holds the
+    normal and inverted ``(planes, encoding)`` tables used for every
+    conversion. The threshold options are those of ``glyph_indices``.
+    """
+    
+    def __new__(cls, glyphs, name=None, thresholds="uniform", gamma=1.0, histogram=None, breakpoints=None):
+        charset = super().__new__(cls, glyphs)
+        check_monospace(charset)
+        charset.name = name
+        charset.thresholds = thresholds
+        charset.gamma = gamma
+        charset.histogram = tuple(histogram) if histogram is not None else None
+        charset.breakpoints = tuple(breakpoints) if breakpoints is not None else None
+        indices = glyph_indices(len(charset), thresholds, gamma, charset.histogram, charset.breakpoints)
+        charset.tables = (build_lookup_table(charset, False, indices), build_lookup_table(charset, True, indices))
+        return charset
+    
+    def __reduce__(self):
+        # Recompile in worker processes instead of pickling the tables
+        return (Charset, (tuple(self), self.name, self.thresholds, self.gamma, self.histogram, self.breakpoints))
+    
+    @property
+    def key(self):
+        """Hashable identity of the glyphs and thresholds, for cache keys."""
+        return (tuple(self), self.thresholds, self.gamma, self.histogram, self.breakpoints)
+    
+    @property
+    def spec(self):
+        """JSON-compatible definition accepted by ``register_charset``."""
+        spec = {"name": self.name, "chars": list(self), "thresholds": self.thresholds}
+        if self.thresholds == "gamma":
+            spec["gamma"] = self.gamma
+        elif self.thresholds == "equalized":
+            spec["histogram"] = list(self.histogram)
+        elif self.thresholds == "breakpoints":
+            spec["breakpoints"] = list(self.breakpoints)
+        return spec
+
+
+# Registered character sets by name, in registration order
+ASCII_SETS = {}
+
+
+def register_charset(name, chars, thresholds="uniform", gamma=1.0, histogram=None, breakpoints=None):
+    """Validate, compile and register a character set, replacing one of the same name.
+
+    ``chars`` is a string or sequence of glyphs from darkest to lightest.
+    Raises ``ValueError`` for glyphs that are not one cell wide or invalid
+    thresholds.
+    """
+    charset = Charset(chars, name, thresholds, gamma, histogram, breakpoints)
+    ASCII_SETS[name] = charset
+    return charset
+
+
+def load_charsets(path=CHARSETS_CONFIG):
+    """Register the character sets of a JSON config file and return their names.
+
+    The file holds a list of ``register_charset`` arguments (optionally under
+    a ``"charsets"`` key). Equalized sets may name a ``"reference"`` image,
+    relative to the file, instead of giving a histogram.
+    """
+    import json
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    if isinstance(config, dict):
+        config = config.get("charsets", [])
+    names = []
+    for entry in config:
+        entry = dict(entry)
+        reference = entry.pop("reference", None)
+        if reference is not None:
+            with Image.open(os.path.join(os.path.dirname(path), reference)) as image:
+                entry["histogram"] = image.convert("L").histogram()
+        names.append(register_charset(**entry).name)
+    return names
+
+
+for _name, _chars in BUILTIN_SETS.items():
+    register_charset(_name, _chars)
+
+
+# Decoding quality -> (oversampling of the target grid kept when decoding at
+# reduced resolution, resampling filter for the final resize). "exact" decodes
+# at full resolution.
+QUALITY_SETTINGS = {
+    "fast": (1, Image.Resampling.BOX),
+    "balanced": (2, Image.Resampling.BICUBIC),
+    "high": (4, Image.Resampling.LANCZOS),
+    "exact": (None, Image.Resampling.BICUBIC),
+}
+DEFAULT_QUALITY = "balanced"
+
+# Frame duration in milliseconds for animations that do not specify one
+DEFAULT_FRAME_DURATION = 100
+
+
+def content_hash(data):
+    """Hash of a file's bytes used to key caches and skip unchanged inputs."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """``content_hash`` of a file, read in chunks instead of all at once."""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+# Pipeline stages reported by the instrumentation, in pipeline order
+STAGES = ("open", "decode", "resize", "gray", "tone", "dither", "format", "map", "color", "export")
+
+# Contrast options, the keyword arguments of ``AsciiArtConverter.adjust_tone``
+TONE_OPTIONS = ("auto_levels", "gamma", "equalize", "clahe")
+# Share of the darkest and brightest pixels clipped by auto-levels
+LEVELS_CUTOFF = 0.005
+# Tiles per side and histogram clip limit (times the mean bin) of local contrast
+CLAHE_TILES = 8
+CLAHE_CLIP_LIMIT = 2.0
+
+# Dithering methods of ``AsciiArtConverter.dither``; without one every pixel
+# takes its nearest glyph
+DITHER_MODES = ("ordered", "floyd-steinberg")
+# Side of the Bayer threshold matrix of ordered dithering (a power of two)
+BAYER_SIZE = 8
+# Tiled threshold planes kept for recently dithered plane sizes
+THRESHOLD_PLANES = 8
+
+
+def _levels_range(histogram, cutoff=LEVELS_CUTOFF):
+    # Darkest and brightest levels once ``cutoff`` of the pixels is ignored at each end
+    total = sum(histogram)
+    limit = total * cutoff
+    low, seen = 0, 0
+    for low, pixels in enumerate(histogram):
+        seen += pixels
+        if seen > limit:
+            break
+    high, seen = 255, 0
+    for high in range(255, -1, -1):
+        seen += histogram[high]
+        if seen > limit:
+            break
+    return low, high
+
+
+def _equalize_curve(histogram, clip_limit=None):
+    # Histogram equalization curve, optionally clipping each bin at clip_limit times
+    # the mean bin and spreading the excess evenly as in CLAHE
+    total = sum(histogram)
+    if clip_limit:
+        limit = max(1.0, clip_limit * total / 256)
+        excess = sum(max(0.0, pixels - limit) for pixels in histogram)
+        histogram = [min(pixels, limit) + excess / 256 for pixels in histogram]
+    cdf, running = [], 0
+    for pixels in histogram:
+        running += pixels
+        cdf.append(running)
+    lowest = next((value for value in cdf if value), 0)
+    if total - lowest <= 0:
+        return list(range(256))
+    return [max(0, round((value - lowest) * 255 / (total - lowest))) for value in cdf]
+
+
+def glyph_levels(ascii_chars, invert=False):
+    """Gray level in the middle of each glyph's share of the lookup table, ascending.
+
+    Dithering quantizes to these levels, so that the lookup table maps every
+    dithered pixel to the glyph its level stands for.
+    """
+    if isinstance(ascii_chars, Charset):
+        indices = glyph_indices(len(ascii_chars), ascii_chars.thresholds, ascii_chars.gamma,
+                                ascii_chars.histogram, ascii_chars.breakpoints)
+    else:
+        indices = glyph_indices(len(ascii_chars))
+    if invert:
+        indices = indices[::-1]
+    spans = {}
+    for level, index in enumerate(indices):
+        low, high = spans.get(index, (level, level))
+        spans[index] = (min(low, level), max(high, level))
+    return sorted((low + high) // 2 for low, high in spans.values())
+
+
+def _bayer_matrix(size=BAYER_SIZE):
+    # Rows of the recursive Bayer index matrix, values 0 to size * size - 1
+    matrix = [[0]]
+    while len(matrix) < size:
+        half = len(matrix)
+        matrix = [[4 * matrix[y % half][x % half] + (0, 2, 3, 1)[y // half * 2 + x // half]
+                   for x in range(2 * half)] for y in range(2 * half)]
+    return matrix
+
+
+_THRESHOLD_PLANES = OrderedDict()
+_THRESHOLD_LOCK = threading.Lock()
+_DITHER_TABLES = {}
+_MASK_TABLE = [0] + [255] * 255
+
+
+def _threshold_plane(size, matrix_size=BAYER_SIZE):
+    # The Bayer matrix tiled over an image of ``size``, scaled to thresholds in 1-254
+    key = (tuple(size), matrix_size)
+    with _THRESHOLD_LOCK:
+        plane = _THRESHOLD_PLANES.get(key)
+        if plane is not None:
+            _THRESHOLD_PLANES.move_to_end(key)
+            return plane
+    width, height = size
+    cells = matrix_size * matrix_size
+    rows = [bytes(int((value + 0.5) * 255 / cells) for value in row) * (width // matrix_size + 1)
+            for row in _bayer_matrix(matrix_size)]
+    plane = Image.frombytes("L", size, b"".join(rows[y % matrix_size][:width] for y in range(height)))
+    with _THRESHOLD_LOCK:
+        _THRESHOLD_PLANES[key] = plane
+        if len(_THRESHOLD_PLANES) > THRESHOLD_PLANES:
+            _THRESHOLD_PLANES.popitem(last=False)
+    return plane
+
+
+def _dither_tables(levels):
+    # Point tables of the level below and above every gray value, and of its
+    # position between them scaled to 0-255
+    key = tuple(levels)
+    tables = _DITHER_TABLES.get(key)
+    if tables is None:
+        lower, upper, position = [], [], []
+        index = 0
+        for value in range(256):
+            while index + 1 < len(levels) and levels[index + 1] <= value:
+                index += 1
+            below = levels[index]
+            above = levels[index + 1] if index + 1 < len(levels) and below <= value else below
+            lower.append(below)
+            upper.append(above)
+            position.append(255 * (value - below) // (above - below) if above > below else 0)
+        tables = _DITHER_TABLES[key] = (lower, upper, position)
+    return tables
+
+
+def _ordered_dither(plane, levels):
+    # Every pixel lies between two levels (or beyond the outermost); it takes the
+    # upper one where its position between them exceeds the threshold matrix
+    lower, upper, position = _dither_tables(levels)
+    mask = ImageChops.subtract(plane.point(position), _threshold_plane(plane.size))
+    return Image.composite(plane.point(upper), plane.point(lower), mask.point(_MASK_TABLE))
+
+
+def _floyd_steinberg_dither(plane, levels):
+    # Pillow diffuses the error in C when quantizing to a palette of the levels
+    palette = Image.new("P", (1, 1))
+    palette.putpalette([channel for level in levels for channel in (level, level, level)]
+                       + [levels[0]] * 3 * (256 - len(levels)))
+    quantized = plane.convert("RGB").quantize(palette=palette, dither=Image.Dither.FLOYDSTEINBERG)
+    return quantized.convert("L")
+
+
+_DITHERERS = {
+    "ordered": _ordered_dither,
+    "floyd-steinberg": _floyd_steinberg_dither,
+}
+
+
+def _tile_spans(size, tiles):
+    # Spans between neighbouring tile centres: (start, stop, first tile, second tile,
+    # weight of the second tile per position, 0-255)
+    centres = [int((tile + 0.5) * size / tiles) for tile in range(tiles)]
+    edges = [0] + centres + [size]
+    spans = []
+    for index in range(len(edges) - 1):
+        start, stop = edges[index], edges[index + 1]
+        if start >= stop:
+            continue
+        first, second = max(0, index - 1), min(tiles - 1, index)
+        if first == second:
+            weights = bytes(stop - start)
+        else:
+            weights = bytes(round(255 * (position - start) / (stop - start)) for position in range(start, stop))
+        spans.append((start, stop, first, second, weights))
+    return spans
+
+
+class StageStats:
+    """Aggregate calls, wall time, bytes and pixels per pipeline stage."""
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, nbytes=0, pixels=0):
+        with self._lock:
+            totals = self.stages.setdefault(stage, [0, 0.0, 0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += nbytes
+            totals[3] += pixels
+
+    def merge(self, other):
+        """Add the totals of another ``StageStats`` or of its ``as_dict()`` output."""
+        stages = other.as_dict() if isinstance(other, StageStats) else other
+        for stage, totals in stages.items():
+            with self._lock:
+                mine = self.stages.setdefault(stage, [0, 0.0, 0, 0])
+                mine[0] += totals["calls"]
+                mine[1] += totals["seconds"]
+                mine[2] += totals["bytes"]
+                mine[3] += totals["pixels"]
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                stage: {"calls": calls, "seconds": seconds, "bytes": nbytes, "pixels": pixels}
+                for stage, (calls, seconds, nbytes, pixels) in self.stages.items()
+            }
+
+    @property
+    def total_seconds(self):
+        return sum(totals[1] for totals in self.stages.values())
+
+    def summary(self):
+        """One-line breakdown such as ``decode 3.1 ms · resize 1.2 ms``."""
+        order = {stage: index for index, stage in enumerate(STAGES)}
+        stages = sorted(self.stages.items(), key=lambda item: order.get(item[0], len(order)))
+        return " · ".join(f"{stage} {totals[1] * 1000:.1f} ms" for stage, totals in stages)
+
+
+class _Stage:
+    # Times one stage; callers may set ``bytes`` and ``pixels`` inside the block
+    __slots__ = ("instrumentation", "name", "bytes", "pixels", "start")
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.bytes = 0
+        self.pixels = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.name, time.perf_counter() - self.start, self.bytes, self.pixels)
+        return False
+
+
+class _NullStage:
+    # Shared no-op stage used when instrumentation is disabled
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Instrumentation:
+    """Optional per-stage profiling hook for the conversion pipeline.
+
+    Pass an instance as ``instrumentation=`` to the converter; every stage is
+    recorded into ``stats`` and, if given, reported to
+    ``callback(stage, seconds, nbytes, pixels)``.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.stats = StageStats()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def record(self, stage, seconds, nbytes=0, pixels=0):
+        self.stats.record(stage, seconds, nbytes, pixels)
+        if self.callback is not None:
+            self.callback(stage, seconds, nbytes, pixels)
+
+
+def stage(instrumentation, name):
+    """Context manager timing a stage, or a shared no-op when instrumentation is None."""
+    if instrumentation is None:
+        return _NULL_STAGE
+    return _Stage(instrumentation, name)
+
+
+class StreamRenderer:
+    """Renders a stream of fixed-size raw 8-bit grayscale frames.
+
+    The frame geometry is fixed up front so the grid, decode reduction and the
+    newline-terminated output buffer are computed once and reused for every
+    frame; ``render`` returns a view of that buffer which is only valid until
+    the next call.
+    """
+
+    def __init__(self, frame_size, width=100, ascii_set="Standard", invert=False, aspect_ratio=0.5,
+                 quality=DEFAULT_QUALITY):
+        self.frame_size = frame_size
+        self.grid = AsciiArtConverter.grid_size(frame_size, width, aspect_ratio)
+        self.scale = AsciiArtConverter.decode_scale(frame_size, self.grid, quality)
+        self.resample = QUALITY_SETTINGS[quality][1]
+        self.ascii_chars = ASCII_SETS[ascii_set]
+        self.invert = invert
+        planes, encoding = get_lookup_table(self.ascii_chars, invert)
+        # Non-ASCII sets have variable-width rows and are encoded per frame instead
+        self.glyph_bytes = planes[0] if encoding == "ascii" else None
+        columns, rows = self.grid
+        self.row_stride = columns + 1
+        self.output = bytearray(b"\n" * (self.row_stride * rows))
+        self._view = memoryview(self.output)
+
+    def resize(self, frame):
+        """Wrap a raw frame buffer without copying and resize it to the grid."""
+        image = Image.frombuffer("L", self.frame_size, frame, "raw", "L", 0, 1)
+        if self.scale > 1:
+            image = image.reduce(self.scale)
+        return image.resize(self.grid, self.resample)
+
+    def map(self, plane):
+        """Map a grid-sized grayscale plane into the output buffer and return a view of it."""
+        if self.glyph_bytes is None:
+            return memoryview(
+                (AsciiArtConverter.render_ascii(plane, self.ascii_chars, self.invert) + "\n").encode("utf-8")
+            )
+        columns, rows = self.grid
+        mapped = plane.tobytes().translate(self.glyph_bytes)
+        view, stride = self._view, self.row_stride
+        # Copy rows between the newline columns that were written once up front
+        for row in range(rows):
+            view[row * stride:row * stride + columns] = mapped[row * columns:(row + 1) * columns]
+        return view
+
+    def render(self, frame):
+        return self.map(self.resize(frame))
+
+
+# Character rows per band in the tiled conversion
+DEFAULT_BAND_ROWS = 32
+
+
+class BandPool:
+    """Splits the stages of one conversion into horizontal bands run on a thread pool.
+
+    Every split keeps the exact filter taps of the serial operation, so the
+    result is identical to converting on one thread: box reduction works on
+    whole blocks, Pillow resamples horizontally (rows independent) and then
+    vertically (columns independent), and gray conversion and mapping are per
+    pixel. ``count`` is the number of bands each pass is split into.
+    """
+    
+    def __init__(self, workers=None, count=1):
+        self.workers = workers or os.cpu_count() or 1
+        self.count = max(1, count)
+        from concurrent.futures import ThreadPoolExecutor
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.executor.shutdown()
+    
+    def _bands(self, size, multiple=1):
+        # Split range(size) into about ``count`` bands whose edges are multiples of ``multiple``
+        step = max(1, -(-size // (self.count * multiple))) * multiple
+        return [(top, min(size, top + step)) for top in range(0, size, step)]
+    
+    @staticmethod
+    def _canvas(image, size):
+        # Blank image the bands are pasted into, sharing the palette of paletted images
+        canvas = Image.new(image.mode, size)
+        if image.mode in ("P", "PA"):
+            canvas.putpalette(image.getpalette())
+        return canvas
+    
+    def reduce(self, image, factor):
+        """``image.reduce(factor)`` in bands of whole blocks."""
+        image = _reducible(image)
+        image.load()
+        width, height = image.size
+        reduced = self._canvas(image, (-(-width // factor), -(-height // factor)))
+        
+        def reduce_band(band):
+            top, bottom = band
+            return top // factor, image.crop((0, top, width, bottom)).reduce(factor)
+        
+        for top, part in self.executor.map(reduce_band, self._bands(height, factor)):
+            reduced.paste(part, (0, top))
+        return reduced
+    
+    def resize(self, image, grid, resample):
+        """``image.resize(grid, resample)`` as a banded horizontal and a striped vertical pass."""
+        image.load()
+        mode = image.mode
+        if mode in ("LA", "RGBA") and resample != Image.NEAREST:
+            # Resize with premultiplied alpha like Pillow does, once for both passes
+            image = image.convert(mode[:-1] + "a")
+        width, height = image.size
+        columns, rows = grid
+        
+        def horizontal(band):
+            top, bottom = band
+            return top, image.crop((0, top, width, bottom)).resize((columns, bottom - top), resample)
+        
+        stretched = self._canvas(image, (columns, height))
+        for top, part in self.executor.map(horizontal, self._bands(height)):
+            stretched.paste(part, (0, top))
+        
+        def vertical(strip):
+            left, right = strip
+            return left, stretched.crop((left, 0, right, height)).resize((right - left, rows), resample)
+        
+        resized = self._canvas(image, grid)
+        step = max(1, -(-columns // self.workers))
+        strips = [(left, min(columns, left + step)) for left in range(0, columns, step)]
+        for left, part in self.executor.map(vertical, strips):
+            resized.paste(part, (left, 0))
+        return resized.convert(mode) if resized.mode != mode else resized
+    
+    def render(self, image, ascii_chars, invert=False, instrumentation=None):
+        """Gray conversion and mapping of a grid-sized image, band by band."""
+        width, height = image.size
+        
+        def render_band(band):
+            top, bottom = band
+            with stage(instrumentation, "gray"):
+                plane = AsciiArtConverter.gray(image.crop((0, top, width, bottom)))
+            return AsciiArtConverter.render_ascii(plane, ascii_chars, invert, instrumentation)
+        
+        return "\n".join(self.executor.map(render_band, self._bands(height)))
+
+
+class CacheTier:
+    """A size-bounded LRU mapping with hit/miss counters."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            # Entries larger than the whole tier are never kept
+            if size > self.budget:
+                return
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.budget:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ConversionCache:
+    """Multi-level cache for conversions keyed by the image content hash.
+
+    The ``images`` tier holds decoded images, ``planes`` the resized grayscale
+    plane per (width, aspect_ratio) and ``results`` the final text per
+    (charset, invert). ``memory_budget`` is in bytes and is split between the
+    tiers according to ``TIER_SHARES``.
+    """
+
+    TIER_SHARES = {"images": 0.6, "planes": 0.25, "results": 0.15}
+
+    def __init__(self, memory_budget=256 * 1024 * 1024):
+        self.memory_budget = memory_budget
+        self.images = CacheTier(int(memory_budget * self.TIER_SHARES["images"]))
+        self.planes = CacheTier(int(memory_budget * self.TIER_SHARES["planes"]))
+        self.results = CacheTier(int(memory_budget * self.TIER_SHARES["results"]))
+        # (path, mtime, size) -> content hash, so unchanged files are not rehashed
+        self._digests = {}
+
+    def digest(self, image_path):
+        """Return the content hash of a file and its bytes when they had to be read."""
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(key)
+        if digest is not None:
+            return digest, None
+        with open(image_path, "rb") as f:
+            data = f.read()
+        digest = content_hash(data)
+        self._digests[key] = digest
+        return digest, data
+
+    def clear(self):
+        for tier in (self.images, self.planes, self.results):
+            tier.clear()
+        self._digests.clear()
+
+    def stats(self):
+        return {
+            "images": self.images.stats(),
+            "planes": self.planes.stats(),
+            "results": self.results.stats(),
+        }
+
+
+def _image_size(image):
+    return image.width * image.height * len(image.getbands())
+
+
+def _reducible(image):
+    # Image.reduce rejects palette, 1-bit and 16-bit images; convert them to the
+    # nearest mode it accepts, which grayscale conversion treats the same way
+    if image.mode == "P":
+        return image.convert("RGBA" if "transparency" in image.info else "RGB")
+    if image.mode == "1":
+        return image.convert("L")
+    if image.mode.startswith("I;16"):
+        return image.convert("I")
+    return image
+
+
+# Uncompressed formats that can be read through a memory map
+MAPPED_EXTENSIONS = (".pgm", ".ppm", ".pnm", ".tif", ".tiff", ".raw")
+# Source bytes mapped per band when streaming a memory-mapped image
+BAND_BYTES = 16 * 1024 * 1024
+
+_TIFF_MAGIC = (b"II*\0", b"MM\0*", b"II+\0", b"MM\0+")
+# TIFF field types used by the tags below: SHORT, LONG and LONG8
+_TIFF_TYPES = {3: ("H", 2), 4: ("L", 4), 16: ("Q", 8)}
+
+
+def _pnm_layout(f):
+    # Binary PGM (P5) or PPM (P6) with 8-bit samples
+    header = f.read(1024)
+    mode = {b"P5": "L", b"P6": "RGB"}.get(header[:2])
+    if mode is None:
+        raise ValueError("not a binary PGM/PPM file")
+    values = []
+    position = 2
+    try:
+        while len(values) < 3:
+            if header[position] in b" \t\r\n":
+                position += 1
+            elif header[position:position + 1] == b"#":
+                position = header.index(b"\n", position) + 1
+            else:
+                start = position
+                while header[position] not in b" \t\r\n":
+                    position += 1
+                values.append(int(header[start:position]))
+    except IndexError:
+        raise ValueError("truncated PGM/PPM header")
+    width, height, maxval = values
+    if maxval != 255:
+        raise ValueError("only 8-bit PGM/PPM files can be memory-mapped")
+    # A single whitespace character separates the header from the pixels
+    return mode, (width, height), [(0, height, position + 1)], False
+
+
+def _tiff_layout(f):
+    # Uncompressed, striped, 8 bits per sample TIFF or BigTIFF; first image only
+    header = f.read(16)
+    order = "<" if header[:2] == b"II" else ">"
+    if struct.unpack(order + "H", header[2:4])[0] == 42:
+        ifd_offset = struct.unpack(order + "L", header[4:8])[0]
+        count_format, entry_format, offset_format = "H", "HHL4s", "L"
+    else:
+        ifd_offset = struct.unpack(order + "Q", header[8:16])[0]
+        count_format, entry_format, offset_format = "Q", "HHQ8s", "Q"
+    inline = struct.calcsize(order + offset_format)
+
+    f.seek(ifd_offset)
+    count = struct.unpack(order + count_format, f.read(struct.calcsize(order + count_format)))[0]
+    entry_size = struct.calcsize(order + entry_format)
+    entries = f.read(count * entry_size)
+    tags = {}
+    for index in range(count):
+        tag, field_type, length, value = struct.unpack_from(order + entry_format, entries, index * entry_size)
+        if field_type not in _TIFF_TYPES:
+            continue
+        code, size = _TIFF_TYPES[field_type]
+        if length * size > inline:
+            # Values that do not fit the entry are stored elsewhere in the file
+            f.seek(struct.unpack(order + offset_format, value)[0])
+            value = f.read(length * size)
+        tags[tag] = struct.unpack(order + code * length, value[:length * size])
+
+    width, height = tags[256][0], tags[257][0]
+    if tags.get(259, (1,))[0] != 1:
+        raise ValueError("compressed TIFF files cannot be memory-mapped")
+    if 322 in tags or 273 not in tags:
+        raise ValueError("only striped TIFF files can be memory-mapped")
+    if any(bits != 8 for bits in tags.get(258, (1,))):
+        raise ValueError("only 8-bit TIFF files can be memory-mapped")
+    samples = tags.get(277, (1,))[0]
+    photometric = tags.get(262, (1,))[0]
+    mode = {1: "L", 3: "RGB", 4: "RGBA"}.get(samples)
+    if mode is None or (samples > 1 and (photometric != 2 or tags.get(284, (1,))[0] != 1)):
+        raise ValueError("unsupported TIFF sample layout")
+    if samples == 1 and photometric not in (0, 1):
+        # Palette (3) and mask images hold indices, not gray levels
+        raise ValueError("only grayscale single-sample TIFF files can be memory-mapped")
+
+    rows_per_strip = min(tags.get(278, (height,))[0], height)
+    row_bytes = width * samples
+    strips = []
+    for index, offset in enumerate(tags[273]):
+        first = index * rows_per_strip
+        if first >= height:
+            break
+        rows = min(rows_per_strip, height - first)
+        if strips and strips[-1][2] + strips[-1][1] * row_bytes == offset:
+            # Merge strips stored back to back so bands rarely have to be copied
+            strips[-1] = (strips[-1][0], strips[-1][1] + rows, strips[-1][2])
+        else:
+            strips.append((first, rows, offset))
+    # Photometric 0 stores white as zero
+    return mode, (width, height), strips, photometric == 0
+
+
+class MappedImage:
+    """An uncompressed 8-bit image read through a memory map.
+
+    Opens binary PGM/PPM, uncompressed striped TIFF and headerless 8-bit
+    grayscale files (when ``raw_size`` is given). Only the header is parsed,
+    so pixels are paged in one band of rows at a time and released again
+    once the band has been reduced.
+    """
+    
+    def __init__(self, path, raw_size=None):
+        with open(path, "rb") as f:
+            if raw_size is not None:
+                layout = ("L", tuple(raw_size), [(0, raw_size[1], 0)], False)
+            else:
+                magic = f.read(4)
+                f.seek(0)
+                if magic[:2] in (b"P5", b"P6"):
+                    layout = _pnm_layout(f)
+                elif magic in _TIFF_MAGIC:
+                    layout = _tiff_layout(f)
+                else:
+                    raise ValueError("not an uncompressed PGM/PPM or TIFF file")
+            self.mode, self.size, self.strips, self.invert = layout
+            self.row_bytes = self.size[0] * Image.getmodebands(self.mode)
+            end = max(offset + rows * self.row_bytes for _, rows, offset in self.strips)
+            if os.fstat(f.fileno()).st_size < end:
+                raise ValueError("image data is truncated")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._map, "madvise"):
+            self._map.madvise(mmap.MADV_SEQUENTIAL)
+        self._view = memoryview(self._map)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        self._view.release()
+        self._map.close()
+    
+    def _spans(self, top, bottom):
+        # Byte ranges holding rows top..bottom
+        for first, rows, offset in self.strips:
+            start, stop = max(top, first), min(bottom, first + rows)
+            if start < stop:
+                yield offset + (start - first) * self.row_bytes, offset + (stop - first) * self.row_bytes
+    
+    def rows(self, top, bottom):
+        """Buffer with rows top..bottom, a view into the map unless they span several strips."""
+        pieces = [self._view[start:stop] for start, stop in self._spans(top, bottom)]
+        return pieces[0] if len(pieces) == 1 else memoryview(b"".join(pieces))
+    
+    def release(self, top, bottom):
+        """Drop the pages of rows top..bottom from memory; they stay in the page cache."""
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        for start, stop in self._spans(top, bottom):
+            start -= start % mmap.PAGESIZE
+            self._map.madvise(mmap.MADV_DONTNEED, start, stop - start)
+    
+    def digest(self):
+        """Content hash of the whole file, equal to ``content_hash`` of its bytes."""
+        hasher = hashlib.blake2b(digest_size=16)
+        for start in range(0, len(self._map), BAND_BYTES):
+            hasher.update(self._view[start:start + BAND_BYTES])
+            if hasattr(mmap, "MADV_DONTNEED"):
+                self._map.madvise(mmap.MADV_DONTNEED, start, min(BAND_BYTES, len(self._map) - start))
+        return hasher.hexdigest()
+
+
+class AsciiArtConverter:
+    @staticmethod
+    def grid_size(image_size, new_width, aspect_correction=0.5):
+        width, height = image_size
+        # Apply aspect ratio correction factor to compensate for character height/width ratio
+        # Most fixed-width fonts have characters that are about 2x taller than wide
+        ratio = height / width / aspect_correction
+        return new_width, int(new_width * ratio)
+    
+    @staticmethod
+    def resize_image(image, new_width, aspect_correction=0.5, resample=None):
+        size = AsciiArtConverter.grid_size(image.size, new_width, aspect_correction)
+        resized_image = image.resize(size, resample)
+        return resized_image
+    
+    @staticmethod
+    def decode_scale(image_size, grid, quality=DEFAULT_QUALITY):
+        """Largest power-of-two reduction that keeps the image above the grid times the oversampling."""
+        oversample = QUALITY_SETTINGS[quality][0]
+        if oversample is None or grid[0] < 1 or grid[1] < 1:
+            return 1
+        wanted_width, wanted_height = grid[0] * oversample, grid[1] * oversample
+        scale = 1
+        while (image_size[0] // (scale * 2) >= wanted_width
+               and image_size[1] // (scale * 2) >= wanted_height):
+            scale *= 2
+        return scale
+    
+    @staticmethod
+    def load_reduced(image, scale, instrumentation=None, bands=None):
+        """Decode an opened image at roughly 1/scale of its size, reducing in bands when given a ``BandPool``."""
+        with stage(instrumentation, "decode") as timed:
+            original_width, original_height = image.size
+            if scale > 1 and image.format == "JPEG":
+                # The JPEG decoder scales by 1/2, 1/4 or 1/8 during the DCT,
+                # so the full resolution image is never materialised
+                image.draft(image.mode, (image.width // scale, image.height // scale))
+            image.load()
+            # Box-reduce whatever the decoder could not (all formats other than JPEG)
+            factor = min(image.width // max(1, original_width // scale),
+                         image.height // max(1, original_height // scale))
+            if factor >= 2:
+                image = _reducible(image)
+                image = bands.reduce(image, factor) if bands is not None else image.reduce(factor)
+            timed.pixels = image.width * image.height
+            timed.bytes = _image_size(image)
+        return image
+    
+    @staticmethod
+    def resize_plane(image, grid, quality=DEFAULT_QUALITY, instrumentation=None):
+        """Resize a decoded image to the character grid and convert it to grayscale."""
+        with stage(instrumentation, "resize") as timed:
+            resized = image.resize(grid, QUALITY_SETTINGS[quality][1])
+            timed.pixels = grid[0] * grid[1]
+        with stage(instrumentation, "gray") as timed:
+            plane = AsciiArtConverter.gray(resized)
+            timed.pixels = grid[0] * grid[1]
+        return plane
+    
+    @staticmethod
+    def reduced_plane(image, width=100, aspect_ratio=0.5, quality=DEFAULT_QUALITY, instrumentation=None):
+        """Resized grayscale plane of an opened (not yet loaded) image, decoded at reduced resolution."""
+        grid = AsciiArtConverter.grid_size(image.size, width, aspect_ratio)
+        scale = AsciiArtConverter.decode_scale(image.size, grid, quality)
+        image = AsciiArtConverter.load_reduced(image, scale, instrumentation)
+        return AsciiArtConverter.resize_plane(image, grid, quality, instrumentation)
+    
+    @staticmethod
+    def pixels_to_ascii(image, ascii_chars, invert=False):
+        # Map pixel values to characters based on brightness with a precomputed table
+        return _map_pixels(image.tobytes(), get_lookup_table(ascii_chars, invert))
+    
+    @staticmethod
+    def render_ascii(image, ascii_chars, invert=False, instrumentation=None, curve=None):
+        """Map a grayscale image to newline separated rows of characters.
+
+        A tone ``curve`` from ``adjust_tone`` is folded into the lookup table.
+        """
+        table = get_lookup_table(ascii_chars, invert)
+        if curve is not None:
+            table = compose_table(table, curve)
+        return AsciiArtConverter.render_table(image, table, instrumentation)
+    
+    @staticmethod
+    def render_table(image, table, instrumentation=None):
+        """Map a single band image through a ``(planes, encoding)`` lookup table."""
+        width, height = image.size
+        if not width or not height:
+            return ""
+        with stage(instrumentation, "format") as timed:
+            # Pad every row with one extra column which becomes the line break
+            pixels = image.crop((0, 0, width + 1, height)).tobytes()
+            timed.bytes = len(pixels)
+        with stage(instrumentation, "map") as timed:
+            ascii_image = _map_pixels(pixels, table, width, height)
+            timed.pixels = width * height
+            timed.bytes = len(ascii_image)
+        return ascii_image
+    
+    @staticmethod
+    def render_blocks(image, ascii_chars, invert=False, rows_per_block=64, instrumentation=None, curve=None):
+        """Yield the rendered rows in blocks of ``rows_per_block`` rows.
+
+        Blocks are newline separated rows without a trailing newline, so only
+        one block of text exists at a time when streaming to a writer.
+        """
+        width, height = image.size
+        for top in range(0, height, rows_per_block):
+            band = image.crop((0, top, width, min(height, top + rows_per_block)))
+            yield AsciiArtConverter.render_ascii(band, ascii_chars, invert, instrumentation, curve)
+    
+    @staticmethod
+    def tone_curve(histogram, auto_levels=False, gamma=1.0, equalize=False):
+        """Gray level curve for auto-levels, histogram equalization and gamma, applied in that order.
+
+        ``histogram`` is the 256-bin histogram of the resized plane. Gamma
+        above 1 brightens the midtones. Returns None for the identity.
+        """
+        curve = list(range(256))
+        if auto_levels and sum(histogram):
+            low, high = _levels_range(histogram)
+            if high > low:
+                curve = [min(255, max(0, round((level - low) * 255 / (high - low)))) for level in range(256)]
+        if equalize and sum(histogram):
+            # Equalize the histogram as it is after the previous steps
+            adjusted = [0] * 256
+            for level, pixels in enumerate(histogram):
+                adjusted[curve[level]] += pixels
+            equalized = _equalize_curve(adjusted)
+            curve = [equalized[level] for level in curve]
+        if gamma != 1.0:
+            if gamma <= 0:
+                raise ValueError("gamma must be positive")
+            curve = [round(255 * (level / 255) ** (1 / gamma)) for level in curve]
+        return None if curve == list(range(256)) else curve
+    
+    @staticmethod
+    def local_contrast(plane, tiles=CLAHE_TILES, clip_limit=CLAHE_CLIP_LIMIT):
+        """Contrast-limited equalization per tile, blended bilinearly between tile centres (CLAHE).
+
+        Unlike the global curves this changes the plane itself; it is cheap
+        because the plane is already reduced to the character grid.
+        """
+        width, height = plane.size
+        tiles_x, tiles_y = max(1, min(tiles, width)), max(1, min(tiles, height))
+        curves = [
+            [
+                _equalize_curve(plane.crop((column * width // tiles_x, row * height // tiles_y,
+                                            (column + 1) * width // tiles_x,
+                                            (row + 1) * height // tiles_y)).histogram(), clip_limit)
+                for column in range(tiles_x)
+            ]
+            for row in range(tiles_y)
+        ]
+        output = Image.new("L", plane.size)
+        for top, bottom, row_a, row_b, weights_y in _tile_spans(height, tiles_y):
+            for left, right, column_a, column_b, weights_x in _tile_spans(width, tiles_x):
+                region = plane.crop((left, top, right, bottom))
+                size = region.size
+                mask_x = Image.frombytes("L", size, weights_x * size[1])
+                mask_y = Image.frombytes("L", size, b"".join(bytes((weight,)) * size[0] for weight in weights_y))
+                upper = Image.composite(region.point(curves[row_a][column_b]),
+                                        region.point(curves[row_a][column_a]), mask_x)
+                lower = Image.composite(region.point(curves[row_b][column_b]),
+                                        region.point(curves[row_b][column_a]), mask_x)
+                output.paste(Image.composite(lower, upper, mask_y), (left, top))
+        return output
+    
+    @staticmethod
+    def adjust_tone(plane, auto_levels=False, gamma=1.0, equalize=False, clahe=False, instrumentation=None):
+        """Contrast adjustment of a resized grayscale plane.
+
+        Returns ``(plane, curve)``: local contrast (``clahe``) changes the plane,
+        while auto-levels, equalization and gamma become a single curve (or
+        None) that the renderers fold into the glyph lookup table.
+        """
+        with stage(instrumentation, "tone") as timed:
+            if clahe:
+                plane = AsciiArtConverter.local_contrast(plane)
+            curve = AsciiArtConverter.tone_curve(plane.histogram(), auto_levels, gamma, equalize)
+            timed.pixels = plane.width * plane.height
+        return plane, curve
+    
+    @staticmethod
+    def tone_plane(plane, tone=None, instrumentation=None):
+        """``adjust_tone`` with the options of a ``tone`` dict (see ``TONE_OPTIONS``), if any."""
+        if not tone:
+            return plane, None
+        return AsciiArtConverter.adjust_tone(plane, instrumentation=instrumentation, **tone)
+    
+    @staticmethod
+    def dither(plane, levels, method="ordered", instrumentation=None):
+        """Quantize a grayscale plane to the ascending gray ``levels`` with dithering.
+
+        ``ordered`` compares every pixel with a tiled Bayer matrix in a few
+        whole-image Pillow operations; ``floyd-steinberg`` diffuses the error
+        through Pillow's palette quantizer.
+        """
+        if method not in _DITHERERS:
+            raise ValueError(f"Unknown dithering: {method}")
+        with stage(instrumentation, "dither") as timed:
+            if plane.width and plane.height:
+                plane = _DITHERERS[method](plane, list(levels))
+            timed.pixels = plane.width * plane.height
+        return plane
+    
+    @staticmethod
+    def dither_plane(plane, ascii_chars, invert=False, dither=None, curve=None, instrumentation=None):
+        """Dither a plane to the glyph levels of a character set; returns ``(plane, curve)``.
+
+        Without ``dither`` the plane and tone curve pass through unchanged. The
+        curve is applied before dithering, so the result needs no curve.
+        """
+        if not dither:
+            return plane, curve
+        if curve is not None:
+            plane = plane.point(curve)
+        return AsciiArtConverter.dither(plane, glyph_levels(ascii_chars, invert), dither, instrumentation), None
+    
+    @staticmethod
+    def gray(image, invert=False):
+        grayscale_image = image.convert("L")
+        # Invert the image if requested
+        if invert:
+            grayscale_image = grayscale_image.point(list(range(255, -1, -1)))
+        return grayscale_image
+    
+    @staticmethod
+    def grayscale_plane(image_path, width=100, aspect_ratio=0.5, cache=None, quality=DEFAULT_QUALITY,
+                        instrumentation=None):
+        """Return the resized grayscale plane for an image, using the cache tiers when given."""
+        if cache is None:
+            with stage(instrumentation, "open"):
+                image = Image.open(image_path)
+            return AsciiArtConverter.reduced_plane(image, width, aspect_ratio, quality, instrumentation)
+        
+        with stage(instrumentation, "open") as timed:
+            digest, data = cache.digest(image_path)
+            timed.bytes = len(data) if data is not None else 0
+        return AsciiArtConverter._cached_plane(cache, image_path, digest, data, width, aspect_ratio, quality,
+                                               instrumentation)
+    
+    @staticmethod
+    def _cached_plane(cache, image_path, digest, data, width, aspect_ratio, quality, instrumentation=None):
+        plane_key = (digest, width, aspect_ratio, quality)
+        plane = cache.planes.get(plane_key)
+        if plane is None:
+            with stage(instrumentation, "open"):
+                # Reuse the bytes read for hashing instead of reading the file again
+                image = Image.open(io.BytesIO(data) if data is not None else image_path)
+            grid = AsciiArtConverter.grid_size(image.size, width, aspect_ratio)
+            scale = AsciiArtConverter.decode_scale(image.size, grid, quality)
+            # Decoded images are shared by every grid size with the same reduction
+            image_key = (digest, scale)
+            reduced = cache.images.get(image_key)
+            if reduced is None:
+                reduced = AsciiArtConverter.load_reduced(image, scale, instrumentation)
+                cache.images.put(image_key, reduced, _image_size(reduced))
+            plane = AsciiArtConverter.resize_plane(reduced, grid, quality, instrumentation)
+            cache.planes.put(plane_key, plane, _image_size(plane))
+        return plane
+    
+    @staticmethod
+    def convert_to_ascii(image_path, width=100, ascii_set="Standard", invert=False, aspect_ratio=0.5,
+                         cache=None, quality=DEFAULT_QUALITY, instrumentation=None, tone=None, dither=None):
+        try:
+            ascii_chars = ASCII_SETS[ascii_set]
+            if cache is None:
+                plane = AsciiArtConverter.grayscale_plane(image_path, width, aspect_ratio, quality=quality,
+                                                          instrumentation=instrumentation)
+                plane, curve = AsciiArtConverter.tone_plane(plane, tone, instrumentation)
+                plane, curve = AsciiArtConverter.dither_plane(plane, ascii_chars, invert, dither, curve,
+                                                              instrumentation)
+                # Convert image to ASCII, inversion and tone are folded into the lookup table
+                return AsciiArtConverter.render_ascii(plane, ascii_chars, invert, instrumentation, curve)
+            
+            with stage(instrumentation, "open") as timed:
+                digest, data = cache.digest(image_path)
+                timed.bytes = len(data) if data is not None else 0
+            result_key = (digest, width, aspect_ratio, quality, ascii_chars.key, bool(invert))
+            if tone:
+                result_key += (tuple(sorted(tone.items())),)
+            if dither:
+                result_key += (dither,)
+            ascii_image = cache.results.get(result_key)
+            if ascii_image is None:
+                plane = AsciiArtConverter._cached_plane(cache, image_path, digest, data, width, aspect_ratio,
+                                                        quality, instrumentation)
+                plane, curve = AsciiArtConverter.tone_plane(plane, tone, instrumentation)
+                plane, curve = AsciiArtConverter.dither_plane(plane, ascii_chars, invert, dither, curve,
+                                                              instrumentation)
+                ascii_image = AsciiArtConverter.render_ascii(plane, ascii_chars, invert, instrumentation, curve)
+                cache.results.put(result_key, ascii_image, sys.getsizeof(ascii_image))
+            return ascii_image
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
+    @staticmethod
+    def mapped_plane(mapped, width=100, aspect_ratio=0.5, band_bytes=BAND_BYTES, instrumentation=None,
+                     bands=None):
+        """Average brightness of every cell of a ``MappedImage``, streamed over bands of rows.
+
+        Each band is box-reduced to whole rows of cells as soon as it is
+        mapped, so peak memory is one band (per ``BandPool`` worker) plus the
+        output plane. Every row of cells is reduced on its own, which makes
+        the result independent of the band size and of the worker count.
+        """
+        source_width, source_height = mapped.size
+        columns, rows = AsciiArtConverter.grid_size(mapped.size, width, aspect_ratio)
+        plane = Image.new("L", (columns, rows))
+        if not columns or not rows:
+            return plane
+        cell_height = source_height / rows
+        rows_per_band = max(1, int(band_bytes // (mapped.row_bytes * cell_height)))
+        
+        def reduce_band(first):
+            last = min(rows, first + rows_per_band)
+            top = int(first * cell_height)
+            bottom = min(source_height, math.ceil(last * cell_height))
+            with stage(instrumentation, "decode") as timed:
+                band = mapped.rows(top, bottom)
+                timed.pixels = source_width * (bottom - top)
+                timed.bytes = len(band)
+            with stage(instrumentation, "resize") as timed:
+                cells = Image.new(mapped.mode, (columns, last - first))
+                for row in range(first, last):
+                    row_top = int(row * cell_height)
+                    row_bottom = min(source_height, math.ceil((row + 1) * cell_height))
+                    source = Image.frombuffer(
+                        mapped.mode, (source_width, row_bottom - row_top),
+                        band[(row_top - top) * mapped.row_bytes:(row_bottom - top) * mapped.row_bytes],
+                        "raw", mapped.mode, 0, 1
+                    )
+                    # Exact area average between the fractional cell boundaries
+                    box = (0, row * cell_height - row_top, source_width,
+                           min((row + 1) * cell_height, row_bottom) - row_top)
+                    cells.paste(source.resize((columns, 1), Image.BOX, box=box), (0, row - first))
+                timed.pixels = columns * (last - first)
+            with stage(instrumentation, "gray"):
+                cells = AsciiArtConverter.gray(cells, mapped.invert)
+            # Let go of the band before its pages are released
+            del band, source
+            mapped.release(top, bottom)
+            return first, cells
+        
+        run = bands.executor.map if bands is not None else map
+        for first, cells in run(reduce_band, range(0, rows, rows_per_band)):
+            plane.paste(cells, (0, first))
+        return plane
+    
+    @staticmethod
+    def convert_mapped(image_path, width=100, ascii_set="Standard", invert=False, aspect_ratio=0.5,
+                       raw_size=None, workers=1, instrumentation=None, tone=None, dither=None):
+        """Convert an uncompressed image without loading it, see ``MappedImage``.
+
+        With ``workers`` above one the bands are reduced on that many threads.
+        """
+        try:
+            with stage(instrumentation, "open"):
+                mapped = MappedImage(image_path, raw_size)
+            with mapped, BandPool(workers) as bands:
+                plane = AsciiArtConverter.mapped_plane(mapped, width, aspect_ratio,
+                                                       instrumentation=instrumentation,
+                                                       bands=bands if workers != 1 else None)
+            plane, curve = AsciiArtConverter.tone_plane(plane, tone, instrumentation)
+            plane, curve = AsciiArtConverter.dither_plane(plane, ASCII_SETS[ascii_set], invert, dither, curve,
+                                                          instrumentation)
+            return AsciiArtConverter.render_ascii(plane, ASCII_SETS[ascii_set], invert, instrumentation, curve)
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
+    @staticmethod
+    def convert_tiled(image_path, width=100, ascii_set="Standard", invert=False, aspect_ratio=0.5,
+                      quality=DEFAULT_QUALITY, workers=None, band_rows=DEFAULT_BAND_ROWS, instrumentation=None,
+                      tone=None, dither=None):
+        """Convert one large image with every stage after decoding split into bands across threads.
+
+        The output is identical to ``convert_to_ascii``; ``band_rows`` is the
+        number of character rows per band and ``workers`` the thread count
+        (default: number of CPUs).
+        """
+        try:
+            with stage(instrumentation, "open"):
+                image = Image.open(image_path)
+            grid = AsciiArtConverter.grid_size(image.size, width, aspect_ratio)
+            if grid[0] < 1 or grid[1] < 1:
+                return ""
+            scale = AsciiArtConverter.decode_scale(image.size, grid, quality)
+            with BandPool(workers, -(-grid[1] // max(1, band_rows))) as bands:
+                image = AsciiArtConverter.load_reduced(image, scale, instrumentation, bands)
+                with stage(instrumentation, "resize") as timed:
+                    resized = bands.resize(image, grid, QUALITY_SETTINGS[quality][1])
+                    timed.pixels = grid[0] * grid[1]
+                if tone or dither:
+                    # The tone curve needs the histogram of the whole grid-sized plane first,
+                    # and error diffusion runs across band boundaries
+                    with stage(instrumentation, "gray"):
+                        plane = AsciiArtConverter.gray(resized)
+                    plane, curve = AsciiArtConverter.tone_plane(plane, tone, instrumentation)
+                    plane, curve = AsciiArtConverter.dither_plane(plane, ASCII_SETS[ascii_set], invert, dither,
+                                                                  curve, instrumentation)
+                    return AsciiArtConverter.render_ascii(plane, ASCII_SETS[ascii_set], invert,
+                                                          instrumentation, curve)
+                return bands.render(resized, ASCII_SETS[ascii_set], invert, instrumentation)
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
+    @staticmethod
+    def frame_count(image_path):
+        with Image.open(image_path) as image:
+            return getattr(image, "n_frames", 1)
+    
+    @staticmethod
+    def convert_frames(image_path, width=100, ascii_set="Standard", invert=False, aspect_ratio=0.5,
+                       quality=DEFAULT_QUALITY, workers=None, instrumentation=None, tone=None, dither=None):
+        """Lazily convert every frame of an animated image.
+
+        Yields ``(ascii_image, duration_ms)`` in frame order. Frames are decoded
+        one at a time and mapped on a thread pool with a bounded number of
+        frames in flight, so memory does not grow with the frame count.
+        """
+        ascii_chars = ASCII_SETS[ascii_set]
+        workers = workers or os.cpu_count() or 1
+        
+        with Image.open(image_path) as image:
+            grid = AsciiArtConverter.grid_size(image.size, width, aspect_ratio)
+            scale = AsciiArtConverter.decode_scale(image.size, grid, quality)
+            
+            def convert(frame):
+                # Pillow releases the GIL while reducing and resizing
+                frame = AsciiArtConverter.load_reduced(frame, scale, instrumentation)
+                plane = AsciiArtConverter.resize_plane(frame, grid, quality, instrumentation)
+                plane, curve = AsciiArtConverter.tone_plane(plane, tone, instrumentation)
+                plane, curve = AsciiArtConverter.dither_plane(plane, ascii_chars, invert, dither, curve,
+                                                              instrumentation)
+                return AsciiArtConverter.render_ascii(plane, ascii_chars, invert, instrumentation, curve)
+            
+            from concurrent.futures import ThreadPoolExecutor
+            pending = deque()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for frame in ImageSequence.Iterator(image):
+                    duration = frame.info.get("duration") or DEFAULT_FRAME_DURATION
+                    with stage(instrumentation, "open"):
+                        # Copy the frame out of the decoder, which is reused for the next one
+                        frame = frame.convert("RGB")
+                    pending.append((executor.submit(convert, frame), duration))
+                    if len(pending) >= workers * 2:
+                        future, duration = pending.popleft()
+                        yield future.result(), duration
+                while pending:
+                    future, duration = pending.popleft()
+                    yield future.result(), duration
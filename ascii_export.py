@@ -0,0 +1,239 @@
+"""Writers for exporting ASCII art to files.
+
+Writers take iterables so results can be streamed to disk as they are
+produced instead of being assembled in memory first. Text is passed around
+as blocks: strings of one or more whole rows separated by newlines, without
+a trailing newline (see ``AsciiArtConverter.render_blocks`` and
+``text_blocks``).
+"""
+import html
+import json
+
+from ascii_converter import stage
+
+# Approximate number of characters written per chunk
+CHUNK_SIZE = 64 * 1024
+
+# Starts every frame in frame-delimited text files, followed by the duration
+# in milliseconds and a newline. Form feeds never appear in character sets.
+FRAME_SEPARATOR = "\f"
+
+
+def text_blocks(ascii_image, chunk_size=CHUNK_SIZE):
+    """Split rendered text into blocks of whole rows of about ``chunk_size`` characters."""
+    start, length = 0, len(ascii_image)
+    while start < length:
+        end = ascii_image.find("\n", start + chunk_size)
+        if end < 0:
+            end = length
+        yield ascii_image[start:end]
+        start = end + 1
+
+
+def _chunked(blocks, chunk_size):
+    # Group small blocks so each write is about chunk_size characters
+    pending, size = [], 0
+    for block in blocks:
+        pending.append(block)
+        size += len(block)
+        if size >= chunk_size:
+            yield pending
+            pending, size = [], 0
+    if pending:
+        yield pending
+
+
+def write_text_blocks(f, blocks, row_separator="\n", chunk_size=CHUNK_SIZE, instrumentation=None):
+    """Write blocks to an open text file with ``row_separator`` between rows."""
+    first = True
+    for chunk in _chunked(blocks, chunk_size):
+        with stage(instrumentation, "export") as timed:
+            text = "\n".join(chunk)
+            if row_separator != "\n":
+                text = text.replace("\n", row_separator)
+            if not first:
+                f.write(row_separator)
+            f.write(text)
+            first = False
+            timed.bytes = len(text)
+
+
+def write_html_blocks(f, blocks, row_separator="<br>", chunk_size=CHUNK_SIZE, instrumentation=None):
+    """Write blocks as HTML-escaped rows with non-breaking spaces and ``row_separator`` between rows."""
+    first = True
+    for chunk in _chunked(blocks, chunk_size):
+        with stage(instrumentation, "export") as timed:
+            text = (html.escape("\n".join(chunk), quote=False)
+                    .replace(" ", "&nbsp;")
+                    .replace("\n", row_separator))
+            if not first:
+                f.write(row_separator)
+            f.write(text)
+            first = False
+            timed.bytes = len(text)
+
+
+def save_text(blocks, path, instrumentation=None):
+    """Stream blocks to a UTF-8 text file."""
+    with open(path, "w", encoding="utf-8") as f:
+        write_text_blocks(f, blocks, instrumentation=instrumentation)
+
+
+def save_html(blocks, path, text_color="#000000", bg_color="#ffffff", font_size=8, line_height=0.6,
+              letter_spacing="0", footer="", escape=True, instrumentation=None):
+    """Stream blocks into a styled HTML page; ``footer`` is inserted after the art.
+
+    With ``escape=False`` the blocks are already HTML (such as color spans)
+    and are written unchanged, one row per line.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>ASCII Art</title>
+    <style>
+        body {{
+            background-color: {bg_color};
+            margin: 20px;
+            font-family: monospace;
+        }}
+        pre {{
+            color: {text_color};
+            font-family: 'Courier New', monospace;
+            font-size: {font_size}pt;
+            line-height: {line_height};
+            white-space: pre;
+            letter-spacing: {letter_spacing};
+        }}
+    </style>
+</head>
+<body>
+    <pre>""")
+        if escape:
+            write_html_blocks(f, blocks, instrumentation=instrumentation)
+        else:
+            write_text_blocks(f, blocks, instrumentation=instrumentation)
+        f.write(f"""</pre>
+    {footer}
+</body>
+</html>""")
+
+
+def html_document(ascii_image, text_color="#000000", bg_color="#ffffff", font_size=8, line_height=0.6):
+    """Standalone HTML page showing the ASCII art in a styled ``<pre>`` block."""
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>ASCII Art</title>
+    <style>
+        body {{
+            background-color: {bg_color};
+            margin: 20px;
+            font-family: monospace;
+        }}
+        pre {{
+            color: {text_color};
+            font-family: 'Courier New', monospace;
+            font-size: {font_size}pt;
+            line-height: {line_height};
+            white-space: pre;
+        }}
+    </style>
+</head>
+<body>
+    <pre>{html.escape(ascii_image, quote=False)}</pre>
+</body>
+</html>"""
+
+
+def save_frames_text(frames, path, instrumentation=None):
+    """Write ``(ascii_image, duration_ms)`` frames to a frame-delimited text file.
+
+    Each frame is written as ``"\\f<duration>\\n<rows>\\n"``. Returns the
+    number of frames written.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for ascii_image, duration in frames:
+            with stage(instrumentation, "export") as timed:
+                f.write(f"{FRAME_SEPARATOR}{duration}\n")
+                f.write(ascii_image)
+                f.write("\n")
+                timed.bytes = len(ascii_image)
+            count += 1
+    return count
+
+
+def load_frames_text(path):
+    """Read a file written by ``save_frames_text`` back into ``(ascii_image, duration_ms)`` frames."""
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    frames = []
+    for chunk in content.split(FRAME_SEPARATOR)[1:]:
+        header, _, ascii_image = chunk.partition("\n")
+        frames.append((ascii_image[:-1], int(header)))
+    return frames
+
+
+def _script_string(text):
+    # JSON string literal that is safe to embed in a <script> element
+    return json.dumps(text).replace("</", "<\\/")
+
+
+def save_frames_html(frames, path, text_color="#000000", bg_color="#ffffff", font_size=8,
+                     line_height=0.6, instrumentation=None):
+    """Write frames to a self-contained HTML page that plays them with their durations.
+
+    Returns the number of frames written.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>ASCII Animation</title>
+    <style>
+        body {{
+            background-color: {bg_color};
+            margin: 20px;
+            font-family: monospace;
+        }}
+        pre {{
+            color: {text_color};
+            font-family: 'Courier New', monospace;
+            font-size: {font_size}pt;
+            line-height: {line_height};
+            white-space: pre;
+        }}
+    </style>
+</head>
+<body>
+    <pre id="frame"></pre>
+    <script>
+        const frames = [
+""")
+        for ascii_image, duration in frames:
+            with stage(instrumentation, "export") as timed:
+                f.write(f"            [{_script_string(ascii_image)}, {int(duration)}],\n")
+                timed.bytes = len(ascii_image)
+            count += 1
+        f.write("""        ];
+        const screen = document.getElementById('frame');
+        let index = 0;
+        function show() {
+            if (!frames.length) {
+                return;
+            }
+            screen.textContent = frames[index][0];
+            const duration = frames[index][1];
+            index = (index + 1) % frames.length;
+            setTimeout(show, duration);
+        }
+        show();
+    </script>
+</body>
+</html>""")
+    return count
@@ -0,0 +1,342 @@
+"""Compact binary grids of conversions, re-rendered without the source image.
+
+A grid file keeps what a conversion computed from the image up to the point
+where the character set comes in: the grayscale plane of the character grid,
+or the RGB image of the grid when colors are kept (the plane is its gray
+conversion, exactly as in the color path). Rendering it with any character
+set, inversion, tone adjustment, dithering or export format gives the same
+output as converting the original image again, without decoding it.
+
+Layout, little-endian:
+
+* header (``GRID_HEADER``) -- magic ``ASCG``, version, flags, columns, rows,
+  aspect ratio and the ``content_hash`` of the source image
+* cells -- one byte per cell (``L``), or three with ``GRID_COLOR`` (``RGB``),
+  row-major; zlib-compressed as a whole with ``GRID_ZLIB``
+
+Uncompressed grids are read through a memory map, so loading one costs a
+header read and its cells are paged in only as they are rendered.
+
+    python ascii_grid.py photo.jpg -o photo.agrid -w 200 --color
+    python ascii_grid.py photo.agrid -c Simple --invert --equalize
+    python ascii_grid.py photo.agrid -o photo.html --format html --color truecolor
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from PIL import Image
+
+from ascii_converter import (ASCII_SETS, CHARSETS_CONFIG, DEFAULT_QUALITY, DITHER_MODES, QUALITY_SETTINGS,
+                             AsciiArtConverter, file_hash, load_charsets, stage)
+
+GRID_MAGIC = b"ASCG"
+GRID_VERSION = 1
+# magic, version, flags, reserved, columns, rows, aspect ratio, source hash
+GRID_HEADER = struct.Struct("<4sBBHIId16s")
+GRID_COLOR = 1
+GRID_ZLIB = 2
+GRID_EXTENSION = ".agrid"
+# Output formats of rendered grids
+RENDER_FORMATS = ("text", "html", "png", "svg")
+
+
+class AsciiGrid:
+    """Grayscale plane of a character grid, with the RGB image of the grid when colors are kept.
+
+    ``source_hash`` is the ``content_hash`` of the converted image (or None)
+    and ``aspect_ratio`` the correction it was converted with.
+    """
+
+    def __init__(self, image, aspect_ratio=0.5, source_hash=None):
+        if image.mode not in ("L", "RGB"):
+            raise ValueError(f"Grids hold L or RGB images, not {image.mode}")
+        self.image = image
+        self.aspect_ratio = aspect_ratio
+        self.source_hash = source_hash
+        self._map = None
+        self._view = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the memory map of a loaded grid; the grid cannot be rendered afterwards.
+
+        Rendering never hands out images over the map, but if ``image`` is still
+        referenced elsewhere the map cannot be closed: BufferError is raised and
+        the grid stays open and usable.
+        """
+        if self._map is None:
+            self.image = None
+            return
+        mode, size = self.image.mode, self.image.size
+        self.image = None
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            self._view = memoryview(self._map)
+            self.image = _cells_image(mode, size, self._view[GRID_HEADER.size:])
+            raise BufferError("the grid image is still in use, release it before closing the grid") from None
+        self._map = self._view = None
+
+    def _detached(self):
+        # The grid image, copied out of a memory map so that nothing returned keeps the map open
+        return self.image.copy() if self._map is not None else self.image
+
+    @property
+    def size(self):
+        return self.image.size
+
+    @property
+    def has_colors(self):
+        return self.image.mode == "RGB"
+
+    def plane(self, instrumentation=None):
+        """Grayscale plane of the grid, as ``AsciiArtConverter.grayscale_plane`` returns it."""
+        if not self.has_colors:
+            return self._detached()
+        with stage(instrumentation, "gray") as timed:
+            plane = AsciiArtConverter.gray(self.image)
+            timed.pixels = plane.width * plane.height
+        return plane
+
+    def render(self, ascii_set="Standard", invert=False, tone=None, dither=None, instrumentation=None):
+        """Newline separated rows, equal to ``convert_to_ascii`` of the source with the same settings."""
+        ascii_chars = ASCII_SETS[ascii_set]
+        plane, curve = AsciiArtConverter.tone_plane(self.plane(instrumentation), tone, instrumentation)
+        plane, curve = AsciiArtConverter.dither_plane(plane, ascii_chars, invert, dither, curve, instrumentation)
+        return AsciiArtConverter.render_ascii(plane, ascii_chars, invert, instrumentation, curve)
+
+    def render_blocks(self, ascii_set="Standard", invert=False, tone=None, dither=None, instrumentation=None):
+        """Rows in blocks for ``ascii_export``, like ``AsciiArtConverter.render_blocks``."""
+        ascii_chars = ASCII_SETS[ascii_set]
+        plane, curve = AsciiArtConverter.tone_plane(self.plane(instrumentation), tone, instrumentation)
+        plane, curve = AsciiArtConverter.dither_plane(plane, ascii_chars, invert, dither, curve, instrumentation)
+        return AsciiArtConverter.render_blocks(plane, ascii_chars, invert, instrumentation=instrumentation,
+                                               curve=curve)
+
+    def color_rows(self, ascii_set="Standard", invert=False, mode="truecolor", stats=None, tone=None,
+                   dither=None, instrumentation=None):
+        """Colored rows like ``ascii_color.color_rows``; needs a grid with colors."""
+        if not self.has_colors:
+            raise ValueError("This grid was saved without colors")
+        from ascii_color import DEFAULT_COLORS, iter_color_rows
+        return iter_color_rows(self._detached(), ASCII_SETS[ascii_set], invert, mode, DEFAULT_COLORS, stats,
+                               instrumentation, tone, dither)
+
+    def to_bytes(self, compress=True):
+        flags = (GRID_COLOR if self.has_colors else 0) | (GRID_ZLIB if compress else 0)
+        digest = bytes.fromhex(self.source_hash) if self.source_hash else bytes(16)
+        cells = self.image.tobytes()
+        if compress:
+            cells = zlib.compress(cells)
+        return GRID_HEADER.pack(GRID_MAGIC, GRID_VERSION, flags, 0, self.image.width, self.image.height,
+                                self.aspect_ratio, digest) + cells
+
+    def save(self, path, compress=True, instrumentation=None):
+        with stage(instrumentation, "export") as timed:
+            data = self.to_bytes(compress)
+            with open(path, "wb") as f:
+                f.write(data)
+            timed.bytes = len(data)
+
+    @classmethod
+    def from_image(cls, image, width=100, aspect_ratio=0.5, quality=DEFAULT_QUALITY, color=False,
+                   source_hash=None, instrumentation=None):
+        """Grid of an opened (not yet loaded) image, decoded at reduced resolution like the plain path."""
+        if not color:
+            plane = AsciiArtConverter.reduced_plane(image, width, aspect_ratio, quality, instrumentation)
+            return cls(plane, aspect_ratio, source_hash)
+        grid = AsciiArtConverter.grid_size(image.size, width, aspect_ratio)
+        scale = AsciiArtConverter.decode_scale(image.size, grid, quality)
+        reduced = AsciiArtConverter.load_reduced(image, scale, instrumentation)
+        with stage(instrumentation, "resize") as timed:
+            resized = reduced.resize(grid, QUALITY_SETTINGS[quality][1])
+            timed.pixels = grid[0] * grid[1]
+        if resized.mode != "RGB":
+            resized = resized.convert("RGB")
+        return cls(resized, aspect_ratio, source_hash)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Grid of ``to_bytes`` output; uncompressed cells stay a view into ``data``."""
+        columns, rows, aspect_ratio, digest, mode, compressed = _parse_header(data)
+        cells = memoryview(data)[GRID_HEADER.size:]
+        if compressed:
+            cells = zlib.decompress(cells)
+        return cls(_cells_image(mode, (columns, rows), cells), aspect_ratio, digest)
+
+    @classmethod
+    def load(cls, path, instrumentation=None):
+        """Read a grid file; uncompressed cells are memory-mapped until ``close``."""
+        with stage(instrumentation, "open") as timed:
+            with open(path, "rb") as f:
+                header = f.read(GRID_HEADER.size)
+                columns, rows, aspect_ratio, digest, mode, compressed = _parse_header(header)
+                if compressed:
+                    cells = zlib.decompress(f.read())
+                    mapped = None
+                else:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    cells = memoryview(mapped)
+            timed.bytes = len(cells)
+        view = cells
+        if mapped is not None:
+            cells = view[GRID_HEADER.size:]
+        grid = cls(_cells_image(mode, (columns, rows), cells), aspect_ratio, digest)
+        if mapped is not None:
+            grid._map, grid._view = mapped, view
+        return grid
+
+
+def _parse_header(data):
+    # (columns, rows, aspect ratio, source hash, mode, compressed) of a grid's first bytes
+    if len(data) < GRID_HEADER.size:
+        raise ValueError("not a grid file")
+    magic, version, flags, _, columns, rows, aspect_ratio, digest = GRID_HEADER.unpack_from(data)
+    if magic != GRID_MAGIC:
+        raise ValueError("not a grid file")
+    if version != GRID_VERSION:
+        raise ValueError(f"unsupported grid version {version}")
+    digest = digest.hex() if any(digest) else None
+    return columns, rows, aspect_ratio, digest, "RGB" if flags & GRID_COLOR else "L", bool(flags & GRID_ZLIB)
+
+
+def _cells_image(mode, size, cells):
+    # Image over the cell bytes, without copying them
+    if len(cells) < size[0] * size[1] * len(mode):
+        raise ValueError("grid data is truncated")
+    if not size[0] or not size[1]:
+        return Image.new(mode, size)
+    return Image.frombuffer(mode, size, cells, "raw", mode, 0, 1)
+
+
+def is_grid_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(GRID_MAGIC)) == GRID_MAGIC
+
+
+def convert_to_grid(image_path, width=100, aspect_ratio=0.5, quality=DEFAULT_QUALITY, color=False,
+                    instrumentation=None):
+    """Grid of an image file, with its content hash as the source hash."""
+    with stage(instrumentation, "open"):
+        source_hash = file_hash(image_path)
+        image = Image.open(image_path)
+    with image:
+        return AsciiGrid.from_image(image, width, aspect_ratio, quality, color, source_hash, instrumentation)
+
+
+def save_rendered(grid, path, output_format="text", ascii_set="Standard", invert=False, color=None,
+                  tone=None, dither=None, font_size=None, instrumentation=None):
+    """Render a grid to a text, HTML, PNG or SVG file; ``color`` is None or an ANSI color mode."""
+    from ascii_export import save_html, save_text
+    if output_format in ("png", "svg"):
+        from ascii_raster import IMAGE_FONT_SIZE, save_png, save_svg
+        save_image = save_png if output_format == "png" else save_svg
+        ascii_image = grid.render(ascii_set, invert, tone, dither, instrumentation)
+        save_image(ascii_image, path, colors=grid._detached() if color else None,
+                   font_size=font_size or IMAGE_FONT_SIZE, instrumentation=instrumentation)
+    elif color:
+        mode = "html" if output_format == "html" else color
+        blocks = grid.color_rows(ascii_set, invert, mode, tone=tone, dither=dither,
+                                 instrumentation=instrumentation)
+        if output_format == "html":
+            save_html(blocks, path, line_height=grid.aspect_ratio * 1.2, escape=False,
+                      instrumentation=instrumentation)
+        else:
+            save_text(blocks, path, instrumentation=instrumentation)
+    else:
+        blocks = grid.render_blocks(ascii_set, invert, tone, dither, instrumentation)
+        if output_format == "html":
+            save_html(blocks, path, line_height=grid.aspect_ratio * 1.2, instrumentation=instrumentation)
+        else:
+            save_text(blocks, path, instrumentation=instrumentation)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Save an image as a grid file, or render a grid file "
+                                                 "with any character set and export format.")
+    parser.add_argument("path", help="image to convert, or grid file to render")
+    parser.add_argument("-o", "--output", help=f"file to write (default: the image name with "
+                                               f"{GRID_EXTENSION}, or the rendered text on stdout)")
+    creating = parser.add_argument_group("saving a grid")
+    creating.add_argument("-w", "--width", type=int, default=100, help="characters per line")
+    creating.add_argument("-a", "--aspect-ratio", type=float, default=0.5,
+                          help="character width/height correction")
+    creating.add_argument("-Q", "--quality", default=DEFAULT_QUALITY, choices=list(QUALITY_SETTINGS))
+    creating.add_argument("--uncompressed", action="store_true",
+                          help="store the cells without zlib so that loading maps them from disk")
+    rendering = parser.add_argument_group("rendering a grid")
+    rendering.add_argument("-c", "--charset", default="Standard",
+                           help="character set: one of the built-in sets or a name from --charsets")
+    rendering.add_argument("--charsets", help=f"JSON file of user character sets "
+                                              f"(default: {CHARSETS_CONFIG} if it exists)")
+    rendering.add_argument("-i", "--invert", action="store_true", help="invert brightness")
+    rendering.add_argument("--auto-levels", action="store_true",
+                           help="stretch the darkest and brightest levels to full range")
+    rendering.add_argument("--equalize", action="store_true", help="equalize the brightness histogram")
+    rendering.add_argument("--clahe", action="store_true",
+                           help="contrast-limited local equalization per tile (local contrast)")
+    rendering.add_argument("--gamma", type=float, default=1.0,
+                           help="gamma correction, above 1 brightens the midtones")
+    rendering.add_argument("--dither", choices=list(DITHER_MODES))
+    rendering.add_argument("--format", default="text", choices=list(RENDER_FORMATS))
+    rendering.add_argument("--font-size", type=int, help="font size in pixels of PNG and SVG output")
+    parser.add_argument("--color", nargs="?", const="truecolor", choices=("ansi256", "truecolor"),
+                        help="keep the cell colors when saving a grid; color the output when rendering one")
+    args = parser.parse_args(argv)
+
+    try:
+        rendering = is_grid_file(args.path)
+    except OSError as e:
+        parser.error(str(e))
+    if not rendering:
+        if args.width < 1:
+            parser.error("--width must be at least 1")
+        output = args.output or os.path.splitext(args.path)[0] + GRID_EXTENSION
+        grid = convert_to_grid(args.path, args.width, args.aspect_ratio, args.quality, bool(args.color))
+        grid.save(output, compress=not args.uncompressed)
+        print(f"{args.path}: {grid.size[0]}x{grid.size[1]} cells -> {output} ({os.path.getsize(output)} bytes)")
+        return 0
+
+    charsets_path = args.charsets or (CHARSETS_CONFIG if os.path.exists(CHARSETS_CONFIG) else None)
+    if charsets_path:
+        try:
+            load_charsets(charsets_path)
+        except Exception as e:
+            parser.error(f"cannot load character sets from {charsets_path}: {e}")
+    if args.charset not in ASCII_SETS:
+        parser.error(f"unknown character set {args.charset!r} (choose from {', '.join(ASCII_SETS)})")
+    if args.gamma <= 0:
+        parser.error("--gamma must be positive")
+    tone = {option: True for option in ("auto_levels", "equalize", "clahe") if getattr(args, option)}
+    if args.gamma != 1.0:
+        tone["gamma"] = args.gamma
+    tone = tone or None
+
+    with AsciiGrid.load(args.path) as grid:
+        if args.color and not grid.has_colors:
+            parser.error("--color needs a grid saved with --color")
+        if args.output:
+            save_rendered(grid, args.output, args.format, args.charset, args.invert, args.color, tone,
+                          args.dither, args.font_size)
+        elif args.format != "text":
+            parser.error(f"--format {args.format} needs --output")
+        elif args.color:
+            for row in grid.color_rows(args.charset, args.invert, args.color, tone=tone, dither=args.dither):
+                print(row)
+        else:
+            print(grid.render(args.charset, args.invert, tone, args.dither))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Rendering ASCII art to PNG images and SVG documents without a GUI.
+
+Each glyph is drawn once per font into a glyph atlas of coverage tiles, one
+cell-sized tile per character. The canvas is then assembled for all cells at
+once instead of drawing text per character: for every pixel position inside a
+cell, ``bytes.translate`` maps the glyph index of every cell to the coverage at
+that position, and strided slice assignments interleave the results into
+rows. The work grows with the cell size rather than with the number of cells.
+Text and background colors (or per-cell colors) are applied to the finished
+coverage mask in a single Pillow operation.
+
+Braille patterns are drawn as dots instead of with the font, since most
+monospace fonts (DejaVu Sans Mono among them) have no braille glyphs.
+"""
+import html
+import os
+import re
+
+from PIL import Image, ImageColor, ImageDraw
+
+from ascii_color import quantize_cells
+from ascii_converter import stage
+from ascii_shapes import load_font
+
+# Font size in pixels of rendered images
+IMAGE_FONT_SIZE = 12
+# Runs of equal palette indices within one row
+_RUNS = re.compile(rb"(.)\1*", re.DOTALL)
+# Unicode braille patterns: the low 8 bits of the code point select the dots
+BRAILLE_FIRST, BRAILLE_LAST = 0x2800, 0x28ff
+# Dot (column, row) of each bit of a braille pattern
+BRAILLE_DOTS = ((0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (0, 3), (1, 3))
+# Fonts named in SVG output; viewers use the first one installed
+SVG_FONT_FAMILY = "'DejaVu Sans Mono', 'Courier New', monospace"
+
+_ATLASES = {}
+
+
+class GlyphAtlas:
+    """Coverage tiles of the glyphs of one font, rendered on first use."""
+
+    def __init__(self, font):
+        self.font = font
+        ascent, descent = font.getmetrics()
+        self.ascent = ascent
+        self.cell = (max(1, int(round(font.getlength("M")))), max(1, ascent + descent))
+        self.tiles = {}
+
+    def tile(self, char):
+        """Coverage bytes of ``char``, row by row within the cell."""
+        tile = self.tiles.get(char)
+        if tile is None:
+            glyph = Image.new("L", self.cell, 0)
+            if BRAILLE_FIRST <= ord(char) <= BRAILLE_LAST:
+                self._draw_braille(ImageDraw.Draw(glyph), ord(char) - BRAILLE_FIRST)
+            elif not char.isspace():
+                ImageDraw.Draw(glyph).text((0, 0), char, fill=255, font=self.font)
+            tile = self.tiles[char] = glyph.tobytes()
+        return tile
+
+
+    def _draw_braille(self, draw, dots):
+        # Round dots centred in a 2x4 grid over the cell
+        width, height = self.cell
+        radius = max(0.5, min(width / 4, height / 8) * 0.6)
+        for bit, (column, row) in enumerate(BRAILLE_DOTS):
+            if dots >> bit & 1:
+                x, y = width * (2 * column + 1) / 4, height * (2 * row + 1) / 8
+                draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=255)
+
+
+def get_atlas(font_size=IMAGE_FONT_SIZE):
+    font = load_font(font_size)
+    atlas = _ATLASES.get(font)
+    if atlas is None:
+        atlas = _ATLASES[font] = GlyphAtlas(font)
+    return atlas
+
+
+def _grid(ascii_image):
+    # Rows padded to equal length
+    rows = ascii_image.split("\n") if ascii_image else []
+    columns = max(map(len, rows), default=0)
+    return [row.ljust(columns) for row in rows], columns
+
+
+def coverage_mask(ascii_image, font_size=IMAGE_FONT_SIZE):
+    """``L`` image of the glyph coverage of every cell of newline separated rows."""
+    atlas = get_atlas(font_size)
+    cell_width, cell_height = atlas.cell
+    rows, columns = _grid(ascii_image)
+    if not columns:
+        return Image.new("L", (columns * cell_width, len(rows) * cell_height))
+    chars = sorted(set("".join(rows)))
+    if len(chars) > 256:
+        raise ValueError("Images can only be rendered from up to 256 distinct characters")
+    # One glyph index byte per cell, row-major
+    indices = "".join(rows).translate({ord(char): chr(index) for index, char in enumerate(chars)})
+    indices = indices.encode("latin-1")
+    tiles = [atlas.tile(char) for char in chars]
+
+    # The canvas is built transposed, where every pixel row of a cell row is one
+    # strided run, and transposed back at the end
+    width = columns * cell_width
+    transposed = bytearray(width * len(rows) * cell_height)
+    for y in range(cell_height):
+        # Pixel row y of every cell row, cell rows stacked
+        scan = bytearray(len(indices) * cell_width)
+        for x in range(cell_width):
+            position = y * cell_width + x
+            scan[x::cell_width] = indices.translate(bytes(tile[position] for tile in tiles).ljust(256, b"\0"))
+        strip = Image.frombuffer("L", (width, len(rows)), scan, "raw", "L", 0, 1).transpose(Image.TRANSPOSE)
+        transposed[y::cell_height] = strip.tobytes()
+    return Image.frombuffer("L", (len(rows) * cell_height, width), transposed, "raw", "L", 0, 1).transpose(
+        Image.TRANSPOSE)
+
+
+def render_image(ascii_image, text_color="#000000", bg_color="#ffffff", colors=None,
+                 font_size=IMAGE_FONT_SIZE, instrumentation=None):
+    """Rasterize ASCII art to an image.
+
+    ``colors`` is an optional RGB image with one pixel per cell (the resized
+    image of a full color conversion) that replaces ``text_color``. Without
+    it the result is a paletted image shading from background to text color.
+    """
+    with stage(instrumentation, "export") as timed:
+        image = coverage_mask(ascii_image, font_size)
+        if colors is None:
+            background, foreground = ImageColor.getrgb(bg_color)[:3], ImageColor.getrgb(text_color)[:3]
+            image.putpalette([round(low + (high - low) * level / 255)
+                              for level in range(256) for low, high in zip(background, foreground)])
+        else:
+            mask = image
+            foreground = colors.convert("RGB").resize(mask.size, Image.NEAREST)
+            image = Image.composite(foreground, Image.new("RGB", mask.size, bg_color), mask)
+        timed.pixels = image.width * image.height
+    return image
+
+
+def save_png(ascii_image, path, text_color="#000000", bg_color="#ffffff", colors=None,
+             font_size=IMAGE_FONT_SIZE, instrumentation=None):
+    image = render_image(ascii_image, text_color, bg_color, colors, font_size, instrumentation)
+    with stage(instrumentation, "export") as timed:
+        image.save(path, "PNG")
+        timed.bytes = os.path.getsize(path)
+
+
+def svg_document(ascii_image, text_color="#000000", bg_color="#ffffff", colors=None,
+                 font_size=IMAGE_FONT_SIZE):
+    """SVG with one ``<text>`` element per row, stretched to the cell grid of the PNG output.
+
+    With ``colors`` (one pixel per cell) runs of equal quantized colors
+    become ``<tspan>`` elements.
+    """
+    atlas = get_atlas(font_size)
+    cell_width, cell_height = atlas.cell
+    rows, columns = _grid(ascii_image)
+    width, height = columns * cell_width, len(rows) * cell_height
+    cells, palette = quantize_cells(colors, "html") if colors is not None else (None, None)
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">\n',
+        f'<rect width="100%" height="100%" fill="{bg_color}"/>\n',
+        f'<g font-family="{SVG_FONT_FAMILY}" font-size="{font_size}" fill="{text_color}" '
+        f'xml:space="preserve">\n',
+    ]
+    for y, row in enumerate(rows):
+        length = len(row.rstrip())
+        if not length:
+            continue
+        parts.append(f'<text y="{y * cell_height + atlas.ascent}" textLength="{length * cell_width}" '
+                     f'lengthAdjust="spacing">')
+        if cells is None:
+            parts.append(html.escape(row[:length], quote=False))
+        else:
+            row_cells = cells[y * columns:y * columns + length]
+            for run in _RUNS.finditer(row_cells):
+                start, end = run.span()
+                red, green, blue = palette[row_cells[start]]
+                parts.append(f'<tspan fill="#{red:02x}{green:02x}{blue:02x}">'
+                             f'{html.escape(row[start:end], quote=False)}</tspan>')
+        parts.append("</text>\n")
+    parts.append("</g>\n</svg>\n")
+    return "".join(parts)
+
+
+def save_svg(ascii_image, path, text_color="#000000", bg_color="#ffffff", colors=None,
+             font_size=IMAGE_FONT_SIZE, instrumentation=None):
+    with stage(instrumentation, "export") as timed:
+        document = svg_document(ascii_image, text_color, bg_color, colors, font_size)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(document)
+        timed.bytes = len(document)
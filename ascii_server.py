@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""Local HTTP service converting uploaded images to ASCII art.
+
+    python ascii_server.py --port 8080
+    curl --data-binary @photo.jpg "http://127.0.0.1:8080/convert?width=120&charset=Detailed"
+    curl -F image=@photo.jpg -F format=html http://127.0.0.1:8080/convert
+    curl http://127.0.0.1:8080/metrics
+
+``POST /convert`` takes the image as the raw request body or as a
+``multipart/form-data`` file field. Parameters (query string or form fields):
+``width``, ``charset``, ``invert``, ``aspect_ratio``, ``quality`` and
+``format`` (``text`` or ``html``).
+
+Conversions run in a process pool. Identical requests (same image bytes and
+parameters) that arrive while one is in flight share its result. Jobs wait in
+a bounded queue; when it is full the service answers 503 with ``Retry-After``
+instead of queueing without limit. ``GET /metrics`` reports latency
+percentiles, queue depth and counters as JSON.
+
+Uses only the standard library and Pillow; it does not need PyQt5.
+"""
+import argparse
+import asyncio
+import email.parser
+import email.policy
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from PIL import Image
+
+from ascii_converter import (ASCII_SETS, DEFAULT_QUALITY, QUALITY_SETTINGS,
+                             AsciiArtConverter, content_hash)
+from ascii_export import html_document
+
+MAX_WIDTH = 1000
+HEADER_TIMEOUT = 10
+# Seconds allowed for receiving the whole upload
+BODY_TIMEOUT = 60
+LATENCY_WINDOW = 1000
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 422: "Unprocessable Entity", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def convert_upload(data, params):
+    """Convert image bytes to text or HTML; runs in a worker process."""
+    image = Image.open(io.BytesIO(data))
+    plane = AsciiArtConverter.reduced_plane(image, params["width"], params["aspect_ratio"], params["quality"])
+    ascii_image = AsciiArtConverter.render_ascii(plane, ASCII_SETS[params["charset"]], params["invert"])
+    if params["format"] == "html":
+        return html_document(ascii_image, line_height=params["aspect_ratio"] * 1.2)
+    return ascii_image
+
+
+def parse_params(fields):
+    """Validate conversion parameters from query/form fields."""
+    try:
+        params = {
+            "width": int(fields.get("width", 100)),
+            "charset": fields.get("charset", "Standard"),
+            "invert": fields.get("invert", "false").lower() in ("1", "true", "yes", "on"),
+            "aspect_ratio": float(fields.get("aspect_ratio", 0.5)),
+            "quality": fields.get("quality", DEFAULT_QUALITY),
+            "format": fields.get("format", "text"),
+        }
+    except ValueError as e:
+        raise RequestError(400, f"Invalid parameter: {e}")
+    if not 1 <= params["width"] <= MAX_WIDTH:
+        raise RequestError(400, f"width must be between 1 and {MAX_WIDTH}")
+    if not 0 < params["aspect_ratio"] <= 1:
+        raise RequestError(400, "aspect_ratio must be in (0, 1]")
+    if params["charset"] not in ASCII_SETS:
+        raise RequestError(400, f"charset must be one of {', '.join(ASCII_SETS)}")
+    if params["quality"] not in QUALITY_SETTINGS:
+        raise RequestError(400, f"quality must be one of {', '.join(QUALITY_SETTINGS)}")
+    if params["format"] not in ("text", "html"):
+        raise RequestError(400, "format must be text or html")
+    return params
+
+
+def parse_multipart(content_type, body):
+    """Return (file bytes, form fields) from a multipart/form-data body."""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    if not message.is_multipart():
+        raise RequestError(400, "Malformed multipart body")
+    data, fields = None, {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if part.get_filename() is not None:
+            if data is None:
+                data = part.get_payload(decode=True)
+        elif name:
+            fields[name] = part.get_content().strip()
+    if data is None:
+        raise RequestError(400, "No file in multipart body")
+    return data, fields
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.counters = {"requests": 0, "converted": 0, "coalesced": 0, "rejected": 0, "errors": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def percentiles(self):
+        if not self.latencies:
+            return {}
+        ordered = sorted(self.latencies)
+        report = {
+            f"p{percent}_ms": ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] * 1000
+            for percent in (50, 90, 99)
+        }
+        report["max_ms"] = ordered[-1] * 1000
+        return report
+
+
+class ConversionService:
+    def __init__(self, workers=None, queue_size=64, max_upload=50 * 1024 * 1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_upload = max_upload
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        # (content hash, params) -> future shared by identical in-flight requests
+        self.in_flight = {}
+        self.running = 0
+        self.metrics = Metrics()
+        self._dispatchers = []
+
+    def start(self):
+        # One dispatcher per worker process pulls jobs off the bounded queue
+        self._dispatchers = [asyncio.ensure_future(self._dispatch()) for _ in range(self.workers)]
+
+    async def close(self):
+        for dispatcher in self._dispatchers:
+            dispatcher.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            data, params, future = await self.queue.get()
+            self.running += 1
+            try:
+                result = await loop.run_in_executor(self.executor, convert_upload, data, params)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+
+    async def convert(self, data, params):
+        loop = asyncio.get_running_loop()
+        # Hashing large uploads releases the GIL, keep it off the event loop
+        digest = await loop.run_in_executor(None, content_hash, data)
+        key = (digest, tuple(sorted(params.items())))
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.metrics.counters["coalesced"] += 1
+        else:
+            future = loop.create_future()
+            try:
+                self.queue.put_nowait((data, params, future))
+            except asyncio.QueueFull:
+                self.metrics.counters["rejected"] += 1
+                raise RequestError(503, "Conversion queue is full, retry later")
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        # Shield so one client disconnecting does not cancel the shared job
+        return await asyncio.shield(future)
+
+    def metrics_report(self):
+        return {
+            "uptime_s": time.time() - self.metrics.started,
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "running": self.running,
+            "in_flight": len(self.in_flight),
+            "latency": self.metrics.percentiles(),
+            **self.metrics.counters,
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            status, content_type, body = await self._respond(reader)
+        except RequestError as e:
+            status, content_type, body = e.status, "text/plain; charset=utf-8", str(e)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            self.metrics.counters["errors"] += 1
+            status, content_type, body = 500, "text/plain; charset=utf-8", f"Error: {e}"
+
+        payload = body.encode("utf-8")
+        headers = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            "Connection: close",
+        ]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + payload)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    @staticmethod
+    async def _read_line(reader):
+        try:
+            return await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+        except ValueError:
+            # readline() raises ValueError for lines over the stream's limit
+            raise RequestError(431, "Request line or header too long")
+
+    async def _respond(self, reader):
+        request_line = await self._read_line(reader)
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise RequestError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await self._read_line(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+        self.metrics.counters["requests"] += 1
+        if url.path == "/metrics":
+            if method != "GET":
+                raise RequestError(405, "Use GET")
+            return 200, "application/json", json.dumps(self.metrics_report(), indent=1)
+        if url.path != "/convert":
+            raise RequestError(404, "Not found; use POST /convert or GET /metrics")
+        if method != "POST":
+            raise RequestError(405, "Use POST")
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise RequestError(400, "Invalid Content-Length")
+        if length < 0:
+            raise RequestError(400, "Invalid Content-Length")
+        if length > self.max_upload:
+            raise RequestError(413, f"Upload larger than {self.max_upload} bytes")
+        if not length:
+            raise RequestError(400, "Empty upload")
+        body = await asyncio.wait_for(reader.readexactly(length), BODY_TIMEOUT)
+
+        fields = dict(parse_qsl(url.query))
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            body, form_fields = parse_multipart(content_type, body)
+            fields.update(form_fields)
+        params = parse_params(fields)
+
+        start = time.perf_counter()
+        try:
+            result = await self.convert(body, params)
+        except RequestError:
+            raise
+        except Exception as e:
+            self.metrics.counters["errors"] += 1
+            raise RequestError(422, f"Cannot convert image: {e}")
+        self.metrics.latencies.append(time.perf_counter() - start)
+        self.metrics.counters["converted"] += 1
+        if params["format"] == "html":
+            return 200, "text/html; charset=utf-8", result
+        return 200, "text/plain; charset=utf-8", result
+
+
+async def serve(host, port, workers, queue_size, max_upload):
+    service = ConversionService(workers, queue_size, max_upload)
+    service.start()
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving on http://{host}:{port} with {service.workers} workers", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve image to ASCII conversions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of CPUs)")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="jobs allowed to wait before requests are rejected with 503")
+    parser.add_argument("--max-upload", type=int, default=50, help="largest accepted upload in MB")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size, args.max_upload * 1024 * 1024))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""Glyph-shape matching using coverage tables measured from a monospace font.
+
+Every character of a set is rendered once with Pillow and box-reduced to a
+small grid of sub-cells, giving its ink coverage per sub-cell. Image cells are
+sampled on the same sub-cell grid and quantized to a handful of levels, so a
+cell becomes an 8-bit pattern code. The nearest glyph for each of the 256
+codes is precomputed, which turns matching into the same one-lookup-per-cell
+``bytes.translate`` as the brightness mapping.
+
+Layouts (name -> columns, rows, levels per sub-cell):
+
+* ``1x1`` -- 256 gray levels; brightness mapping calibrated to measured glyph density
+* ``2x2`` -- 4 levels per quadrant, follows edges and diagonals
+* ``2x4`` -- black and white sub-cells, finer vertical detail
+* ``braille`` -- 2x4 dots drawn with Unicode braille, ignoring the character set
+* ``halfblock`` -- upper and lower half of the cell drawn with block elements
+
+Braille and half blocks need no matching: the pattern code of a cell, packed
+in the bit order of the code points, picks the glyph directly. They give
+eight and two samples per cell at the same column count.
+
+Fonts are only needed once coverage has to be measured, so the Pillow font
+modules and ``json`` are imported on first use; the GUI imports this module
+at startup for ``MATCHING_MODES``.
+"""
+import os
+import sys
+
+from PIL import Image, ImageChops
+
+from ascii_converter import (ASCII_SETS, DEFAULT_QUALITY, AsciiArtConverter, content_hash,
+                             encode_glyphs, stage)
+
+SHAPE_LAYOUTS = {
+    "1x1": (1, 1, 256),
+    "2x2": (2, 2, 4),
+    "2x4": (2, 4, 2),
+    "braille": (2, 4, 2),
+    "halfblock": (1, 2, 2),
+}
+# Glyphs of the fixed layouts, indexed by the sub-cells that carry ink
+GLYPH_LAYOUTS = {
+    "braille": tuple(chr(0x2800 + dots) for dots in range(256)),
+    "halfblock": (" ", "▀", "▄", "█"),
+}
+# Bit of each sub-cell (row-major) in the pattern code; braille numbers its
+# dots down the left column first, with the bottom row added last
+CODE_BITS = {
+    "braille": (0, 3, 1, 4, 2, 5, 6, 7),
+}
+DEFAULT_LAYOUT = "2x2"
+# User facing names; None keeps the plain brightness mapping
+MATCHING_MODES = {
+    "Brightness": None,
+    "Density": "1x1",
+    "Shape 2x2": "2x2",
+    "Shape 2x4": "2x4",
+    "Braille": "braille",
+    "Half Block": "halfblock",
+}
+
+# Monospace fonts tried in order; Pillow searches the system font directories
+FONT_CANDIDATES = ("DejaVuSansMono.ttf", "cour.ttf", "Courier New.ttf", "LiberationMono-Regular.ttf",
+                   "Menlo.ttc", "Consolas.ttf")
+FONT_SIZE = 24
+COVERAGE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".ascii_art_cache", "coverage")
+
+_FONTS = {}
+_COVERAGE = {}
+_SHAPE_TABLES = {}
+_SHAPE_LEVELS = {}
+
+
+def load_font(size=FONT_SIZE):
+    """First available monospace TrueType font of ``FONT_CANDIDATES``.
+
+    Pillow's built-in bitmap font is not a fallback: it has no metrics to size a
+    cell from and differs between Pillow versions, so OSError is raised instead.
+    """
+    font = _FONTS.get(size)
+    if font is None:
+        from PIL import ImageFont
+        for name in FONT_CANDIDATES:
+            try:
+                font = ImageFont.truetype(name, size)
+                break
+            except OSError:
+                continue
+        else:
+            raise OSError("No monospace TrueType font found, install one of: " + ", ".join(FONT_CANDIDATES))
+        _FONTS[size] = font
+    return font
+
+
+def _font_name(font):
+    return os.path.basename(font.path)
+
+
+def measure_coverage(ascii_chars, layout=DEFAULT_LAYOUT, font=None):
+    """Ink coverage of every glyph per sub-cell, scaled to the 0-1 range of the set."""
+    from PIL import ImageDraw
+    if font is None:
+        font = load_font()
+    columns, rows, _ = SHAPE_LAYOUTS[layout]
+    # Size every glyph in the same monospace cell
+    ascent, descent = font.getmetrics()
+    cell = (max(1, int(round(font.getlength("M")))), ascent + descent)
+    coverage = []
+    for char in ascii_chars:
+        glyph = Image.new("L", cell, 0)
+        ImageDraw.Draw(glyph).text((0, 0), char, fill=255, font=font)
+        sub_cells = glyph.resize((columns, rows), Image.BOX)
+        coverage.append([value / 255 for value in sub_cells.getdata()])
+
+    # Stretch so that the lightest and densest sub-cells of the set span 0-1
+    values = [value for vector in coverage for value in vector]
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    return [[(value - low) / span for value in vector] for vector in coverage]
+
+
+def get_coverage(ascii_chars, layout=DEFAULT_LAYOUT, font=None):
+    """Coverage vectors from memory, the disk cache or freshly measured."""
+    if font is None:
+        font = load_font()
+    key = "\0".join((_font_name(font), str(font.size), layout, "".join(ascii_chars)))
+    coverage = _COVERAGE.get(key)
+    if coverage is not None:
+        return coverage
+
+    import json
+    cache_path = os.path.join(COVERAGE_CACHE_DIR, content_hash(key.encode("utf-8")) + ".json")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            coverage = json.load(f)
+    except (OSError, ValueError):
+        coverage = measure_coverage(ascii_chars, layout, font)
+        try:
+            os.makedirs(COVERAGE_CACHE_DIR, exist_ok=True)
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump(coverage, f)
+        except OSError:
+            # The cache is only an optimisation
+            pass
+    _COVERAGE[key] = coverage
+    return coverage
+
+
+def nearest_glyphs(ascii_chars, invert=False, layout=DEFAULT_LAYOUT, font=None):
+    """The nearest glyph for every pattern code, as a list of 256 characters."""
+    columns, rows, levels = SHAPE_LAYOUTS[layout]
+    coverage = get_coverage(ascii_chars, layout, font)
+    sub_cells = columns * rows
+    glyphs = []
+    for code in range(256):
+        # Ink wanted in each sub-cell: dark pixels take dense glyphs unless inverted
+        target = []
+        for index in range(sub_cells):
+            level = code // levels ** index % levels
+            ink = (level + 0.5) / levels
+            target.append(ink if invert else 1 - ink)
+        best = min(range(len(ascii_chars)),
+                   key=lambda glyph: sum((want - have) ** 2 for want, have in zip(target, coverage[glyph])))
+        glyphs.append(ascii_chars[best])
+    return glyphs
+
+
+def build_shape_table(ascii_chars, invert=False, layout=DEFAULT_LAYOUT, font=None):
+    """Precompute the nearest glyph for every pattern code as a ``(planes, encoding)`` table."""
+    return encode_glyphs(nearest_glyphs(ascii_chars, invert, layout, font))
+
+
+def build_glyph_table(layout, invert=False):
+    """Table of a fixed glyph layout: sub-cells below mid gray carry ink unless inverted."""
+    columns, rows, _ = SHAPE_LAYOUTS[layout]
+    mask = (1 << columns * rows) - 1
+    glyphs = GLYPH_LAYOUTS[layout]
+    return encode_glyphs([glyphs[(code if invert else ~code) & mask] for code in range(256)])
+
+
+def get_shape_table(ascii_chars, invert=False, layout=DEFAULT_LAYOUT):
+    if layout in GLYPH_LAYOUTS:
+        # The character set plays no part
+        ascii_chars = ()
+    key = (tuple(ascii_chars), bool(invert), layout)
+    table = _SHAPE_TABLES.get(key)
+    if table is None:
+        if layout in GLYPH_LAYOUTS:
+            table = _SHAPE_TABLES[key] = build_glyph_table(layout, key[1])
+        else:
+            table = _SHAPE_TABLES[key] = build_shape_table(key[0], key[1], layout)
+    return table
+
+
+def shape_levels(ascii_chars, invert=False, layout=DEFAULT_LAYOUT):
+    """Gray levels that dithering quantizes to, ascending.
+
+    The middle of each sub-cell quantization step, or for ``1x1`` the middle
+    of the gray values that map to each glyph.
+    """
+    _, _, levels = SHAPE_LAYOUTS[layout]
+    if levels < 256:
+        return [(2 * level + 1) * 128 // levels for level in range(levels)]
+    key = (tuple(ascii_chars), bool(invert), layout)
+    shades = _SHAPE_LEVELS.get(key)
+    if shades is None:
+        spans = {}
+        for value, glyph in enumerate(nearest_glyphs(key[0], key[1], layout)):
+            first, _ = spans.get(glyph, (value, value))
+            spans[glyph] = (first, value)
+        shades = _SHAPE_LEVELS[key] = sorted((first + last) // 2 for first, last in spans.values())
+    return shades
+
+
+def dither_sub_cells(plane, layout=DEFAULT_LAYOUT, dither=None, curve=None, instrumentation=None):
+    """Dither a sampled plane to the sub-cell levels of ``layout``; returns ``(plane, curve)``.
+
+    ``1x1`` has no sub-cell quantization and passes through, its glyph
+    levels are dithered by ``render_shapes``.
+    """
+    if not dither or SHAPE_LAYOUTS[layout][2] >= 256:
+        return plane, curve
+    if curve is not None:
+        plane = plane.point(curve)
+    return AsciiArtConverter.dither(plane, shape_levels((), False, layout), dither, instrumentation), None
+
+
+def pattern_codes(plane, grid, layout=DEFAULT_LAYOUT, curve=None):
+    """Pack the sub-cells of a grayscale plane into one pattern code per cell.
+
+    ``plane`` is sampled at ``grid`` times the layout; the result is an ``L``
+    image of ``grid`` size whose pixel values index the shape table. A tone
+    ``curve`` is folded into the quantization tables.
+    """
+    columns, rows, levels = SHAPE_LAYOUTS[layout]
+    if columns == rows == 1:
+        return plane.point(curve) if curve is not None else plane
+    if curve is None:
+        curve = range(256)
+    bits = CODE_BITS.get(layout, range(columns * rows))
+    codes = None
+    for index in range(columns * rows):
+        x, y = index % columns, index // columns
+        # A nearest-neighbour reduction from this offset picks sub-cell (x, y) of every cell
+        left, top = x - columns // 2, y - rows // 2
+        phase = plane.crop((left, top, left + plane.width, top + plane.height)).resize(grid, Image.NEAREST)
+        weight = levels ** bits[index]
+        phase = phase.point([curve[value] * levels // 256 * weight for value in range(256)])
+        codes = phase if codes is None else ImageChops.add(codes, phase)
+    return codes
+
+
+def sampled_plane(image, width=100, aspect_ratio=0.5, quality=DEFAULT_QUALITY, layout=DEFAULT_LAYOUT,
+                  instrumentation=None):
+    """Grayscale plane at the sub-cell resolution of ``layout``; returns ``(plane, grid)``."""
+    columns, rows, _ = SHAPE_LAYOUTS[layout]
+    grid = AsciiArtConverter.grid_size(image.size, width, aspect_ratio)
+    if grid[0] < 1 or grid[1] < 1:
+        grid = (max(grid[0], 0), max(grid[1], 0))
+        return Image.new("L", grid), grid
+    sampled = (grid[0] * columns, grid[1] * rows)
+    scale = AsciiArtConverter.decode_scale(image.size, sampled, quality)
+    image = AsciiArtConverter.load_reduced(image, scale, instrumentation)
+    return AsciiArtConverter.resize_plane(image, sampled, quality, instrumentation), grid
+
+
+def shape_plane(image, width=100, aspect_ratio=0.5, quality=DEFAULT_QUALITY, layout=DEFAULT_LAYOUT,
+                instrumentation=None, tone=None, dither=None):
+    """Pattern code plane for an opened image, decoded at reduced resolution."""
+    plane, grid = sampled_plane(image, width, aspect_ratio, quality, layout, instrumentation)
+    if grid[0] < 1 or grid[1] < 1:
+        return plane
+    plane, curve = AsciiArtConverter.tone_plane(plane, tone, instrumentation)
+    plane, curve = dither_sub_cells(plane, layout, dither, curve, instrumentation)
+    with stage(instrumentation, "format") as timed:
+        codes = pattern_codes(plane, grid, layout, curve)
+        timed.pixels = grid[0] * grid[1]
+    return codes
+
+
+def render_shapes(codes, ascii_chars, invert=False, layout=DEFAULT_LAYOUT, instrumentation=None, dither=None):
+    """Map a pattern code plane to newline separated rows of glyphs.
+
+    With ``dither`` a ``1x1`` plane is first dithered to its glyph levels;
+    the other layouts are dithered before packing, see ``dither_sub_cells``.
+    """
+    if dither and SHAPE_LAYOUTS[layout][2] >= 256:
+        codes = AsciiArtConverter.dither(codes, shape_levels(ascii_chars, invert, layout), dither,
+                                         instrumentation)
+    return AsciiArtConverter.render_table(codes, get_shape_table(ascii_chars, invert, layout),
+                                          instrumentation)
+
+
+def render_shape_blocks(codes, ascii_chars, invert=False, layout=DEFAULT_LAYOUT, rows_per_block=64,
+                        instrumentation=None, dither=None):
+    """Yield shape matched rows in blocks, like ``AsciiArtConverter.render_blocks``."""
+    table = get_shape_table(ascii_chars, invert, layout)
+    if dither and SHAPE_LAYOUTS[layout][2] >= 256:
+        codes = AsciiArtConverter.dither(codes, shape_levels(ascii_chars, invert, layout), dither,
+                                         instrumentation)
+    width, height = codes.size
+    for top in range(0, height, rows_per_block):
+        band = codes.crop((0, top, width, min(height, top + rows_per_block)))
+        yield AsciiArtConverter.render_table(band, table, instrumentation)
+
+
+def convert_to_shapes(image_path, width=100, ascii_set="Standard", invert=False, aspect_ratio=0.5,
+                      quality=DEFAULT_QUALITY, layout=DEFAULT_LAYOUT, cache=None, instrumentation=None,
+                      tone=None, dither=None):
+    """Convert an image file to text with shape matched glyphs."""
+    ascii_chars = ASCII_SETS[ascii_set]
+    result_key = None
+    if cache is not None:
+        with stage(instrumentation, "open"):
+            digest, _ = cache.digest(image_path)
+        result_key = ("shape", layout, digest, width, aspect_ratio, quality, tuple(ascii_chars), bool(invert),
+                      tuple(sorted((tone or {}).items())), dither)
+        ascii_image = cache.results.get(result_key)
+        if ascii_image is not None:
+            return ascii_image
+    with stage(instrumentation, "open"):
+        image = Image.open(image_path)
+    codes = shape_plane(image, width, aspect_ratio, quality, layout, instrumentation, tone, dither)
+    ascii_image = render_shapes(codes, ascii_chars, invert, layout, instrumentation, dither)
+    if result_key is not None:
+        cache.results.put(result_key, ascii_image, sys.getsizeof(ascii_image))
+    return ascii_image
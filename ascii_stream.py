@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Play a video as ASCII art in the terminal at a target frame rate.
+
+Frames come either from a raw 8-bit grayscale stream, e.g. piped from ffmpeg:
+
+    ffmpeg -i clip.mp4 -f rawvideo -pix_fmt gray -s 640x360 - | \\
+        python ascii_stream.py --raw 640x360 --fps 24
+
+or from a directory of still images played in name order:
+
+    python ascii_stream.py frames/ --fps 12
+
+Each frame is redrawn in place from the top-left corner. When rendering falls
+behind the target rate frames are dropped rather than delayed. A summary of
+the achieved frame rate and the latency of every stage is printed to stderr.
+"""
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image
+
+from ascii_converter import ASCII_SETS, QUALITY_SETTINGS, AsciiArtConverter, StreamRenderer
+
+CURSOR_HOME = b"\x1b[H"
+CLEAR_SCREEN = b"\x1b[2J"
+HIDE_CURSOR = b"\x1b[?25l"
+SHOW_CURSOR = b"\x1b[?25h"
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+STAGES = ("read", "resize", "map", "write")
+
+
+def read_raw_frames(stream, frame_bytes):
+    """Yield a memoryview of each raw frame, read into one reused buffer.
+
+    The view is only valid until the next frame is requested.
+    """
+    buffer = bytearray(frame_bytes)
+    view = memoryview(buffer)
+    while True:
+        filled = 0
+        while filled < frame_bytes:
+            count = stream.readinto(view[filled:])
+            if not count:
+                return  # End of stream; a trailing partial frame is discarded
+            filled += count
+        yield view
+
+
+def write_all(fd, data):
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+
+    def add(self, stage, seconds):
+        self.samples[stage].append(seconds)
+
+    def summary(self):
+        lines = []
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            mean = sum(ordered) / len(ordered)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            lines.append(f"  {stage:7} mean {mean * 1000:7.2f} ms  p95 {p95 * 1000:7.2f} ms  "
+                         f"max {ordered[-1] * 1000:7.2f} ms")
+        return "\n".join(lines)
+
+
+def play(frames, resize, renderer, fps, out_fd, timer, drop=True):
+    """Render frames at ``fps``; returns (rendered, dropped, elapsed seconds)."""
+    interval = 1.0 / fps
+    rendered = dropped = 0
+    start = time.perf_counter()
+    index = 0
+    frames = iter(frames)
+    while True:
+        stage_start = time.perf_counter()
+        try:
+            frame = next(frames)
+        except StopIteration:
+            break
+        now = time.perf_counter()
+        timer.add("read", now - stage_start)
+
+        due = start + index * interval
+        index += 1
+        if drop and now > due + interval:
+            # More than a frame behind: skip this one to catch up
+            dropped += 1
+            continue
+        if now < due:
+            time.sleep(due - now)
+
+        stage_start = time.perf_counter()
+        plane = resize(frame)
+        now = time.perf_counter()
+        timer.add("resize", now - stage_start)
+
+        stage_start = now
+        output = renderer.map(plane)
+        now = time.perf_counter()
+        timer.add("map", now - stage_start)
+
+        stage_start = now
+        write_all(out_fd, CURSOR_HOME)
+        write_all(out_fd, output)
+        timer.add("write", time.perf_counter() - stage_start)
+        rendered += 1
+    return rendered, dropped, time.perf_counter() - start
+
+
+def parse_size(text):
+    try:
+        width, height = (int(value) for value in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    return width, height
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play raw video frames or an image directory as ASCII art.")
+    parser.add_argument("source", nargs="?", default="-",
+                        help="raw frame file, '-' for stdin (default) or a directory of images")
+    parser.add_argument("--raw", type=parse_size, metavar="WIDTHxHEIGHT",
+                        help="size of the raw 8-bit grayscale frames")
+    parser.add_argument("--fps", type=float, default=24.0, help="target frame rate")
+    parser.add_argument("--no-drop", action="store_true", help="never drop frames, play slower instead")
+    parser.add_argument("-w", "--width", type=int, default=100, help="characters per line")
+    parser.add_argument("-c", "--charset", default="Standard", choices=list(ASCII_SETS))
+    parser.add_argument("-a", "--aspect-ratio", type=float, default=0.5,
+                        help="character width/height correction")
+    parser.add_argument("-Q", "--quality", default="fast", choices=list(QUALITY_SETTINGS),
+                        help="resampling quality (default: fast)")
+    parser.add_argument("-i", "--invert", action="store_true", help="invert brightness")
+    args = parser.parse_args(argv)
+
+    stream = None
+    if os.path.isdir(args.source):
+        paths = sorted(
+            os.path.join(args.source, name) for name in os.listdir(args.source)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not paths:
+            parser.error(f"no images found in {args.source}")
+        with Image.open(paths[0]) as first:
+            frame_size = first.size
+        renderer = StreamRenderer(frame_size, args.width, args.charset, args.invert,
+                                  args.aspect_ratio, args.quality)
+        frames = paths
+        
+        def resize(path):
+            # Decode at reduced resolution, then match the grid of the first frame
+            plane = AsciiArtConverter.reduced_plane(Image.open(path), args.width,
+                                                    args.aspect_ratio, args.quality)
+            return plane if plane.size == renderer.grid else plane.resize(renderer.grid)
+    else:
+        if args.raw is None:
+            parser.error("--raw WIDTHxHEIGHT is required for raw frame input")
+        frame_size = args.raw
+        renderer = StreamRenderer(frame_size, args.width, args.charset, args.invert,
+                                  args.aspect_ratio, args.quality)
+        stream = sys.stdin.buffer.raw if args.source == "-" else open(args.source, "rb", buffering=0)
+        frames = read_raw_frames(stream, frame_size[0] * frame_size[1])
+        resize = renderer.resize
+
+    out_fd = sys.stdout.fileno()
+    timer = StageTimer()
+    write_all(out_fd, CLEAR_SCREEN + HIDE_CURSOR)
+    try:
+        rendered, dropped, elapsed = play(frames, resize, renderer, args.fps, out_fd, timer,
+                                          drop=not args.no_drop)
+    except KeyboardInterrupt:
+        rendered = dropped = None
+    finally:
+        write_all(out_fd, SHOW_CURSOR + b"\n")
+        if stream is not None and stream is not sys.stdin.buffer.raw:
+            stream.close()
+
+    if rendered is not None:
+        achieved = rendered / elapsed if elapsed else 0.0
+        print(f"{rendered} frames rendered, {dropped} dropped in {elapsed:.2f} s "
+              f"({achieved:.1f} fps, target {args.fps:g})", file=sys.stderr)
+        print(timer.summary(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Preview thumbnails decoded at reduced resolution, with an on-disk cache.
+
+A thumbnail is produced by ``Image.thumbnail``, which lets the JPEG decoder
+scale by 1/2 to 1/8 and box-reduces other formats before the final resample,
+so the full resolution bitmap is never kept. Thumbnails are stored as PNG
+files named by the content hash of the image and the thumbnail size, so a
+renamed or copied file hits the cache and an edited one does not. The cache
+directory is capped in bytes; the least recently used files are deleted
+first, with the file modification time marking the last use.
+"""
+import io
+import os
+import threading
+
+from PIL import Image
+
+from ascii_converter import file_hash
+
+THUMBNAIL_SIZE = (300, 200)
+THUMBNAIL_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".ascii_art_cache", "thumbnails")
+THUMBNAIL_CACHE_BYTES = 32 * 1024 * 1024
+
+
+def make_thumbnail(image_path, size=THUMBNAIL_SIZE):
+    """PNG bytes of the image scaled to fit ``size``, keeping its aspect ratio."""
+    with Image.open(image_path) as image:
+        image.thumbnail(size, Image.BICUBIC)
+        if image.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+            # CMYK, 16-bit and float images, which PNG cannot hold as they are
+            image = image.convert("RGBA" if "A" in image.mode else "RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class ThumbnailCache:
+    """Content-hashed thumbnails on disk, at most ``max_bytes`` in total.
+
+    The cache is only an optimisation: when the directory cannot be written
+    thumbnails are still returned, just not kept.
+    """
+
+    def __init__(self, directory=THUMBNAIL_CACHE_DIR, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # (path, mtime, size) -> content hash, so unchanged files are not rehashed
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def _digest(self, image_path):
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = self._digests[key] = file_hash(image_path)
+        return digest
+
+    def get(self, image_path, size=THUMBNAIL_SIZE):
+        """PNG bytes of the thumbnail of ``image_path``, from the cache or freshly made."""
+        cache_path = os.path.join(self.directory, f"{self._digest(image_path)}-{size[0]}x{size[1]}.png")
+        try:
+            with open(cache_path, "rb") as f:
+                data = f.read()
+            # Mark as recently used for eviction
+            os.utime(cache_path)
+            self.hits += 1
+            return data
+        except OSError:
+            pass
+        self.misses += 1
+        data = make_thumbnail(image_path, size)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Written under a temporary name so readers never see a partial file
+            partial = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(partial, "wb") as f:
+                f.write(data)
+            os.replace(partial, cache_path)
+            self.evict()
+        except OSError:
+            pass
+        return data
+
+    def evict(self):
+        """Delete the least recently used thumbnails until the cache fits ``max_bytes``."""
+        with self._lock:
+            entries = []
+            with os.scandir(self.directory) as files:
+                for entry in files:
+                    if entry.name.endswith(".png") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,258 @@
+"""Scrolling monospace viewer for large ASCII art.
+
+A ``QTextEdit`` lays out the whole document whenever its text or style
+changes, which gets slow for outputs of hundreds of columns. ``AsciiViewer``
+keeps the rows as plain strings and paints only the cells inside the exposed
+area, from glyph pixmaps rendered once per font size and color. Painted runs
+of cells are kept as tiles, so scrolling and repainting mostly copy tiles.
+Paint time therefore depends on the viewport and not on the size of the art.
+Lines never wrap, so zooming only changes the cell size.
+"""
+from collections import OrderedDict
+
+from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QKeySequence, QPainter, QPixmap
+from PyQt5.QtWidgets import QAbstractScrollArea, QApplication
+
+MIN_ZOOM = 0.25
+MAX_ZOOM = 8.0
+ZOOM_STEP = 1.25
+# Glyph caches kept for recently used zoom levels and font sizes
+GLYPH_CACHE_FONTS = 8
+# Cells per tile, and pixmap bytes of the tiles kept between paints; a tile
+# grows with the zoom, so the cache is bounded by memory and not by count
+TILE_COLUMNS = 64
+TILE_CACHE_BYTES = 128 * 1024 * 1024
+
+
+class GlyphCache:
+    """Pixmaps of single glyphs in one font, rendered on first use per color."""
+
+    def __init__(self, font, device_pixel_ratio=1.0):
+        self.font = font
+        self.device_pixel_ratio = device_pixel_ratio
+        metrics = QFontMetrics(font)
+        self.cell = QSize(max(1, metrics.horizontalAdvance("M")), max(1, metrics.height()))
+        self.ascent = metrics.ascent()
+        self.pixmaps = {}
+
+    def glyph(self, char, rgb):
+        """Pixmap of ``char`` drawn in ``rgb`` (a ``QColor.rgb()`` value) on a transparent cell."""
+        key = (char, rgb)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is None:
+            pixmap = QPixmap(self.cell * self.device_pixel_ratio)
+            pixmap.setDevicePixelRatio(self.device_pixel_ratio)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setFont(self.font)
+            painter.setPen(QColor.fromRgb(rgb))
+            painter.drawText(0, self.ascent, char)
+            painter.end()
+            self.pixmaps[key] = pixmap
+        return pixmap
+
+
+def _pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+class AsciiViewer(QAbstractScrollArea):
+    """Read-only view of ASCII art with optional per-cell colors and zoom.
+
+    Ctrl+wheel, Ctrl++ and Ctrl+- zoom, Ctrl+0 resets the zoom and Ctrl+C
+    copies the whole text.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._text = ""
+        self._rows = []
+        self._columns = 0
+        self._cells = None                 # Palette index per cell, row-major
+        self._cell_columns = 0
+        self._palette = []                 # QRgb per palette index
+        self._foreground = QColor(Qt.black).rgb()
+        self._background = QColor(Qt.white)
+        self._zoom = 1.0
+        self._glyph_caches = OrderedDict()
+        self._tiles = OrderedDict()        # (row, tile column) -> QPixmap, drawn with _tile_glyphs
+        self._tile_glyphs = None
+        self._tile_bytes = 0
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.horizontalScrollBar().setSingleStep(20)
+        self.verticalScrollBar().setSingleStep(20)
+
+    def setText(self, text):
+        self._text = text
+        self._rows = text.split("\n") if text else []
+        self._columns = max(map(len, self._rows), default=0)
+        self._cells = None
+        self._clear_tiles()
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def toPlainText(self):
+        return self._text
+
+    def setCellColors(self, cells, palette=None, columns=0):
+        """Color every cell: ``cells`` holds one palette index byte per cell, ``columns`` per row.
+
+        ``palette`` lists ``(r, g, b)`` tuples, as returned by
+        ``ascii_color.quantize_cells``. Pass None to use the text color again.
+        """
+        if cells is None:
+            self._cells = None
+        else:
+            self._cells = cells
+            self._cell_columns = columns
+            self._palette = [QColor(*color).rgb() for color in palette]
+        self._clear_tiles()
+        self.viewport().update()
+
+    def setColors(self, text_color, background):
+        foreground = QColor(text_color).rgb()
+        if foreground != self._foreground:
+            # Tiles are transparent, so only the text color is painted into them
+            self._foreground = foreground
+            self._clear_tiles()
+        self._background = QColor(background)
+        self.viewport().update()
+
+    def setFont(self, font):
+        super().setFont(font)
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def zoom(self):
+        return self._zoom
+
+    def setZoom(self, zoom):
+        zoom = min(MAX_ZOOM, max(MIN_ZOOM, zoom))
+        if zoom == self._zoom:
+            return
+        # Keep the cell at the top left corner in place
+        cell = self._glyphs().cell
+        column = self.horizontalScrollBar().value() / cell.width()
+        row = self.verticalScrollBar().value() / cell.height()
+        self._zoom = zoom
+        self._update_scrollbars()
+        cell = self._glyphs().cell
+        self.horizontalScrollBar().setValue(round(column * cell.width()))
+        self.verticalScrollBar().setValue(round(row * cell.height()))
+        self.viewport().update()
+
+    def zoomIn(self):
+        self.setZoom(self._zoom * ZOOM_STEP)
+
+    def zoomOut(self):
+        self.setZoom(self._zoom / ZOOM_STEP)
+
+    def _glyphs(self):
+        # Glyph cache for the current font and zoom, kept for a few recent sizes
+        font = QFont(self.font())
+        font.setPointSizeF(max(1.0, font.pointSizeF() * self._zoom))
+        ratio = self.devicePixelRatioF()
+        key = (font.key(), ratio)
+        glyphs = self._glyph_caches.get(key)
+        if glyphs is None:
+            glyphs = self._glyph_caches[key] = GlyphCache(font, ratio)
+            if len(self._glyph_caches) > GLYPH_CACHE_FONTS:
+                self._glyph_caches.popitem(last=False)
+        else:
+            self._glyph_caches.move_to_end(key)
+        return glyphs
+
+    def _update_scrollbars(self):
+        cell = self._glyphs().cell
+        viewport = self.viewport().size()
+        width, height = self._columns * cell.width(), len(self._rows) * cell.height()
+        self.horizontalScrollBar().setRange(0, max(0, width - viewport.width()))
+        self.horizontalScrollBar().setPageStep(viewport.width())
+        self.verticalScrollBar().setRange(0, max(0, height - viewport.height()))
+        self.verticalScrollBar().setPageStep(viewport.height())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scrollbars()
+
+    def scrollContentsBy(self, dx, dy):
+        # Move the pixels already painted; only the exposed strip is repainted
+        self.viewport().scroll(dx, dy)
+
+    def _clear_tiles(self):
+        self._tiles.clear()
+        self._tile_bytes = 0
+
+    def _tile(self, glyphs, row, tile):
+        # Pixmap of TILE_COLUMNS cells of a row, drawn from the glyph pixmaps
+        if glyphs is not self._tile_glyphs:
+            # Zoom, font or device pixel ratio changed: no cached tile fits anymore
+            self._clear_tiles()
+            self._tile_glyphs = glyphs
+        key = (row, tile)
+        pixmap = self._tiles.get(key)
+        if pixmap is not None:
+            self._tiles.move_to_end(key)
+            return pixmap
+        first = tile * TILE_COLUMNS
+        text = self._rows[row][first:first + TILE_COLUMNS]
+        cell_width = glyphs.cell.width()
+        pixmap = QPixmap(QSize(len(text) * cell_width, glyphs.cell.height()) * glyphs.device_pixel_ratio)
+        pixmap.setDevicePixelRatio(glyphs.device_pixel_ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        glyph = glyphs.glyph
+        cells, palette, foreground = self._cells, self._palette, self._foreground
+        offset = row * self._cell_columns + first
+        for index, char in enumerate(text):
+            if char != " ":
+                rgb = foreground if cells is None else palette[cells[offset + index]]
+                painter.drawPixmap(index * cell_width, 0, glyph(char, rgb))
+        painter.end()
+        self._tiles[key] = pixmap
+        self._tile_bytes += _pixmap_bytes(pixmap)
+        while self._tile_bytes > TILE_CACHE_BYTES and len(self._tiles) > 1:
+            self._tile_bytes -= _pixmap_bytes(self._tiles.popitem(last=False)[1])
+        return pixmap
+
+    def paintEvent(self, event):
+        rect = event.rect()
+        painter = QPainter(self.viewport())
+        painter.fillRect(rect, self._background)
+        glyphs = self._glyphs()
+        cell_width, cell_height = glyphs.cell.width(), glyphs.cell.height()
+        tile_width = TILE_COLUMNS * cell_width
+        left, top = self.horizontalScrollBar().value(), self.verticalScrollBar().value()
+        first_row = max(0, (top + rect.top()) // cell_height)
+        last_row = min(len(self._rows), (top + rect.bottom()) // cell_height + 1)
+        first_tile = max(0, (left + rect.left()) // tile_width)
+        last_tile = (left + rect.right()) // tile_width + 1
+        for row in range(first_row, last_row):
+            y = row * cell_height - top
+            for tile in range(first_tile, min(last_tile, -(-len(self._rows[row]) // TILE_COLUMNS))):
+                painter.drawPixmap(tile * tile_width - left, y, self._tile(glyphs, row, tile))
+        painter.end()
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            if event.angleDelta().y() > 0:
+                self.zoomIn()
+            elif event.angleDelta().y() < 0:
+                self.zoomOut()
+            event.accept()
+            return
+        super().wheelEvent(event)
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.ZoomIn) or (
+                event.modifiers() & Qt.ControlModifier and event.key() == Qt.Key_Equal):
+            self.zoomIn()
+        elif event.matches(QKeySequence.ZoomOut):
+            self.zoomOut()
+        elif event.modifiers() & Qt.ControlModifier and event.key() == Qt.Key_0:
+            self.setZoom(1.0)
+        elif event.matches(QKeySequence.Copy):
+            QApplication.clipboard().setText(self._text)
+        else:
+            super().keyPressEvent(event)
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""Benchmark the conversion pipeline stage by stage.
+
+Times decode, resize, grayscale, mapping and export separately for the bundled
+sample images and synthetic images, across output widths and every character
+set. Runs headless (no PyQt5 needed).
+
+    python benchmark.py                              # mm.jpg and mmp.png
+    python benchmark.py --synthetic 6000x4000 --json results.json
+    python benchmark.py --json new.json --compare old.json
+    python benchmark.py --dither floyd-steinberg     # dithering cost next to mapping
+    python benchmark.py --viewer                     # GUI output painting (needs PyQt5)
+    python benchmark.py --startup                    # cold start times against STARTUP_BUDGET_MS
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import PIL
+from PIL import Image
+
+from ascii_converter import (ASCII_SETS, DEFAULT_QUALITY, DITHER_MODES, QUALITY_SETTINGS,
+                             AsciiArtConverter)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_IMAGES = ("mm.jpg", "mmp.png")
+DEFAULT_WIDTHS = (10, 50, 100, 200, 500)
+STAGES = ("decode", "resize", "gray", "dither", "map", "export")
+# Output sizes (columns x rows) and viewport for the viewer benchmark
+VIEWER_SIZES = ((100, 50), (500, 250), (1000, 500), (2000, 1000))
+VIEWER_VIEWPORT = (1000, 700)
+# Cold start scenarios, each timed in a fresh interpreter: (name, code, needs PyQt5).
+# The code gets the image to convert as sys.argv[1].
+STARTUP_SCRIPTS = (
+    ("interpreter", "pass", False),
+    ("import core", "import ascii_converter", False),
+    ("first conversion", "from ascii_converter import AsciiArtConverter\n"
+                         "AsciiArtConverter.convert_to_ascii(sys.argv[1], 100)", False),
+    ("import GUI", "import ascii_art_app", True),
+    ("GUI window", "from PyQt5.QtWidgets import QApplication\n"
+                   "import ascii_art_app\n"
+                   "app = QApplication([])\n"
+                   "window = ascii_art_app.AsciiArtApp()\n"
+                   "window.show()\n"
+                   "app.processEvents()", True),
+)
+# Budgets in ms on top of the bare interpreter start
+STARTUP_BUDGET_MS = {"import core": 150, "first conversion": 300, "import GUI": 400, "GUI window": 600}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, if the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def synthetic_image(size, image_format="JPEG"):
+    """Encoded gradient-plus-noise test image of the given size."""
+    width, height = size
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 48)
+    image = Image.merge("RGB", (gradient, noise, Image.blend(gradient, noise, 0.5)))
+    buffer = io.BytesIO()
+    image.save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def measure(function, repeat):
+    """Median wall time of ``function`` over ``repeat`` runs, its last result and Python heap peak.
+
+    The heap peak comes from one more run under tracemalloc, which would slow
+    down the timed runs. It only covers allocations made through Python, not
+    the image buffers Pillow allocates in C.
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), result, peak
+
+
+def benchmark_image(name, data, widths, charsets, repeat, quality, export_dir, dither=None):
+    records = []
+    source_size = Image.open(io.BytesIO(data)).size
+    source_pixels = source_size[0] * source_size[1]
+    resample = QUALITY_SETTINGS[quality][1]
+
+    for width in widths:
+        grid = AsciiArtConverter.grid_size(source_size, width)
+        scale = AsciiArtConverter.decode_scale(source_size, grid, quality)
+        grid_pixels = grid[0] * grid[1]
+
+        def record(stage, seconds, pixels, peak, charset=None):
+            records.append({
+                "image": name,
+                "source_size": list(source_size),
+                "width": width,
+                "grid": list(grid),
+                "charset": charset,
+                "stage": stage,
+                "seconds": seconds,
+                "pixels_per_s": pixels / seconds if seconds else None,
+                "images_per_s": 1 / seconds if seconds else None,
+                "python_heap_peak_bytes": peak,
+            })
+
+        seconds, decoded, peak = measure(
+            lambda: AsciiArtConverter.load_reduced(Image.open(io.BytesIO(data)), scale), repeat)
+        record("decode", seconds, source_pixels, peak)
+        seconds, resized, peak = measure(lambda: decoded.resize(grid, resample), repeat)
+        record("resize", seconds, decoded.width * decoded.height, peak)
+        seconds, plane, peak = measure(lambda: AsciiArtConverter.gray(resized), repeat)
+        record("gray", seconds, grid_pixels, peak)
+
+        for charset in charsets:
+            ascii_chars = ASCII_SETS[charset]
+            mapped = plane
+            if dither:
+                seconds, mapped, peak = measure(
+                    lambda: AsciiArtConverter.dither_plane(plane, ascii_chars, dither=dither)[0], repeat)
+                record("dither", seconds, grid_pixels, peak, charset)
+            seconds, ascii_image, peak = measure(
+                lambda: AsciiArtConverter.render_ascii(mapped, ascii_chars), repeat)
+            record("map", seconds, grid_pixels, peak, charset)
+
+            path = os.path.join(export_dir, "export.txt")
+
+            def export():
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(ascii_image)
+
+            seconds, _, peak = measure(export, repeat)
+            record("export", seconds, grid_pixels, peak, charset)
+    return records
+
+
+def benchmark_viewer(sizes, repeat):
+    """Time showing and repainting outputs of each size in the GUI viewer and in a QTextEdit.
+
+    "update" sets the text and paints the viewport scrolled to the middle of
+    the output, "repaint" paints it again; the viewer's times should not grow
+    with the output size.
+    """
+    # Imported here so that the conversion benchmark runs without PyQt5
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QFont
+    from PyQt5.QtWidgets import QApplication, QTextEdit
+
+    from ascii_color import quantize_cells
+    from ascii_viewer import AsciiViewer
+
+    def median_time(function):
+        # Without tracemalloc, which slows down the Python paint loop
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return statistics.median(times)
+
+    app = QApplication.instance() or QApplication([])
+    lines = [f"{'output':>10} " + " ".join(f"{label:>14}" for label in (
+        "viewer update", "repaint", "color update", "repaint", "QTextEdit upd.", "repaint"))
+        + f"   (ms, viewport {VIEWER_VIEWPORT[0]}x{VIEWER_VIEWPORT[1]})"]
+    for columns, rows in sizes:
+        noise = Image.effect_noise((columns, rows), 64)
+        text = AsciiArtConverter.render_ascii(noise, ASCII_SETS["Standard"])
+        colors = Image.merge("RGB", (noise, noise.transpose(Image.FLIP_LEFT_RIGHT), noise.rotate(180)))
+        cells, palette = quantize_cells(colors, "truecolor")
+        times = []
+        for widget, color in ((AsciiViewer(), False), (AsciiViewer(), True), (QTextEdit(), False)):
+            widget.setAttribute(Qt.WA_DontShowOnScreen)
+            widget.setFont(QFont("Courier New", 8))
+            widget.resize(*VIEWER_VIEWPORT)
+            widget.show()
+
+            def update():
+                widget.setText(text)
+                if color:
+                    widget.setCellColors(cells, palette, columns)
+                widget.verticalScrollBar().setValue(widget.verticalScrollBar().maximum() // 2)
+                widget.horizontalScrollBar().setValue(widget.horizontalScrollBar().maximum() // 2)
+                widget.viewport().grab()
+
+            times.append(median_time(update))
+            times.append(median_time(widget.viewport().grab))
+            widget.close()
+        lines.append(f"{f'{columns}x{rows}':>10} " + " ".join(f"{seconds * 1000:14.2f}" for seconds in times))
+    app.processEvents()
+    return "\n".join(lines)
+
+
+def benchmark_startup(image_path, repeat):
+    """Median wall time of every ``STARTUP_SCRIPTS`` scenario in new processes; returns (report, over budget)."""
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    has_qt = importlib.util.find_spec("PyQt5") is not None
+    lines = [f"{'startup':18} {'total ms':>10} {'added ms':>10} {'budget':>8}"]
+    over = False
+    baseline = None
+    for name, code, needs_qt in STARTUP_SCRIPTS:
+        if needs_qt and not has_qt:
+            lines.append(f"{name:18} {'skipped (no PyQt5)':>30}")
+            continue
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "import sys\n" + code, image_path], cwd=HERE, env=env,
+                           check=True, stdout=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+        seconds = statistics.median(times)
+        if baseline is None:
+            baseline = seconds
+        added = (seconds - baseline) * 1000
+        budget = STARTUP_BUDGET_MS.get(name)
+        flag = ""
+        if budget is not None and added > budget:
+            flag = "  OVER BUDGET"
+            over = True
+        lines.append(f"{name:18} {seconds * 1000:10.1f} {added:10.1f} "
+                     f"{budget if budget is not None else '-':>8}{flag}")
+    return "\n".join(lines), over
+
+
+def summarize(records):
+    """Per (image, width): seconds per stage (map/export averaged over charsets) and images/s."""
+    rows = {}
+    for record in records:
+        key = (record["image"], record["width"])
+        rows.setdefault(key, {}).setdefault(record["stage"], []).append(record["seconds"])
+    lines = [f"{'image':24} {'width':>5} " + " ".join(f"{stage + ' ms':>10}" for stage in STAGES)
+             + f" {'images/s':>10}"]
+    for (image, width), stages in rows.items():
+        means = {stage: statistics.mean(stages[stage]) for stage in STAGES if stage in stages}
+        total = sum(means.values())
+        lines.append(f"{image[:24]:24} {width:5d} "
+                     + " ".join(f"{means.get(stage, 0) * 1000:10.3f}" for stage in STAGES)
+                     + f" {1 / total if total else 0:10.1f}")
+    return "\n".join(lines)
+
+
+def compare(records, baseline_records):
+    """Lines comparing stage times with a previous JSON result; ratios > 1 are slowdowns."""
+    def key(record):
+        return record["image"], record["width"], record["charset"], record["stage"]
+
+    baseline = {key(record): record["seconds"] for record in baseline_records}
+    lines = []
+    for record in records:
+        old = baseline.get(key(record))
+        if old:
+            ratio = record["seconds"] / old
+            flag = "  SLOWER" if ratio > 1.1 else ""
+            image, width, charset, stage = key(record)
+            lines.append(f"{image[:24]:24} {width:5d} {charset or '-':9} {stage:7} "
+                         f"{old * 1000:9.3f} -> {record['seconds'] * 1000:9.3f} ms  x{ratio:5.2f}{flag}")
+    return "\n".join(lines)
+
+
+def parse_size(text):
+    try:
+        width, height = (int(value) for value in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    return width, height
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ASCII conversion stages.")
+    parser.add_argument("images", nargs="*", help="images to benchmark (default: the bundled samples)")
+    parser.add_argument("--synthetic", type=parse_size, action="append", default=[], metavar="WxH",
+                        help="add a synthetic JPEG of this size (repeatable)")
+    parser.add_argument("--widths", type=int, nargs="+", default=list(DEFAULT_WIDTHS))
+    parser.add_argument("--charsets", nargs="+", default=list(ASCII_SETS), choices=list(ASCII_SETS))
+    parser.add_argument("-Q", "--quality", default=DEFAULT_QUALITY, choices=list(QUALITY_SETTINGS))
+    parser.add_argument("--dither", choices=list(DITHER_MODES), help="also time dithering to each charset")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="runs per measurement (median is kept)")
+    parser.add_argument("--json", help="write all measurements to this file")
+    parser.add_argument("--compare", help="JSON file from a previous run to compare against")
+    parser.add_argument("--viewer", action="store_true",
+                        help="benchmark painting the GUI output instead of the conversion (needs PyQt5)")
+    parser.add_argument("--startup", action="store_true",
+                        help="time cold starts in new processes instead; exits with 1 when over budget")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        image_path = args.images[0] if args.images else os.path.join(HERE, SAMPLE_IMAGES[0])
+        report, over = benchmark_startup(os.path.abspath(image_path), max(1, args.repeat))
+        print(report)
+        return 1 if over else 0
+
+    if args.viewer:
+        print(benchmark_viewer(VIEWER_SIZES, max(1, args.repeat)))
+        return 0
+
+    inputs = []
+    for path in args.images or [os.path.join(HERE, name) for name in SAMPLE_IMAGES]:
+        with open(path, "rb") as f:
+            inputs.append((os.path.basename(path), f.read()))
+    for size in args.synthetic:
+        inputs.append((f"synthetic-{size[0]}x{size[1]}.jpg", synthetic_image(size)))
+
+    records = []
+    with tempfile.TemporaryDirectory() as export_dir:
+        for name, data in inputs:
+            records.extend(benchmark_image(name, data, args.widths, args.charsets,
+                                           max(1, args.repeat), args.quality, export_dir, args.dither))
+
+    print(summarize(records))
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"peak RSS: {peak:.1f} MB")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare(records, json.load(f)["records"]))
+
+    if args.json:
+        result = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "quality": args.quality,
+            "repeat": args.repeat,
+            "peak_rss_mb": peak,
+            "records": records,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,81 @@
-import PIL.Image as im
-
-ASCII_CHARS = ["@", "#", "S", "%", "?", "*", "+", ";", ":", ",", "."]
-
-# resize image 
-def resize_image(image, new_width=75):
-    width, height = image.size
-    ratio = height / width 
-    new_height = int(new_width * ratio)
-    resized_image = image.resize((new_width, new_height))
-    return(resized_image)
-
-# pixels to a string of ascii 
-def pixels_to_ascii(image):
-    pixels = image.getdata()
-    characters = "".join([ASCII_CHARS[pixel//25] for pixel in pixels])
-    return(characters)  
-
-# grayscale
-def gray(image):
-    grayscale_image = image.convert("L")
-    return(grayscale_image)  
-
-def main(new_width=75):
-    # open image from user-input
-    path = input("Enter a valid pathname to an image:\n")
-    try:
-        image = im.open(path)
-    
-    except:
-        print(path, " is not a valid pathname to an image.")
-        return
-  
-    # convert image to ascii    
-    new_image_data = pixels_to_ascii(gray(resize_image(image)))
-    
-    # format
-    pixel_count = len(new_image_data)  
-    ascii_image = "\n".join([new_image_data[index:(index+new_width)] for index in range(0, pixel_count, new_width)])
-    
-    print(ascii_image)
-    
-    # save 
-    with open("ascii_image.txt", "w") as f:
-        f.write(ascii_image)
- 
-# run
-main()
\ No newline at end of file
+"""Minimal image to ASCII converter: prints the art and saves it to ascii_image.txt.
+
+Built on the headless conversion core, so it starts without loading PyQt5.
+
+    python img.py photo.jpg --width 100
+    python img.py                         # asks for the path
+"""
+import argparse
+import sys
+
+import PIL.Image as im
+
+from ascii_converter import ASCII_SETS, QUALITY_SETTINGS, AsciiArtConverter, Charset
+
+# The standard glyphs in the buckets this script has always used (pixel // 25),
+# which differ from the uniform 256 // 11 buckets of the GUI's Standard set
+ASCII_CHARS = Charset(ASCII_SETS["Standard"], "img.py", "breakpoints", breakpoints=list(range(25, 256, 25)))
+OUTPUT_FILE = "ascii_image.txt"
+# This script has always kept the pixel aspect ratio of the image
+ASPECT_RATIO = 1.0
+# Decode and resize the whole image, as this script always has; the reduced
+# qualities are faster but their output differs slightly
+QUALITY = "exact"
+
+
+# resize image
+def resize_image(image, new_width=75):
+    return AsciiArtConverter.resize_image(image, new_width, ASPECT_RATIO)
+
+
+# pixels to a string of ascii
+def pixels_to_ascii(image):
+    return AsciiArtConverter.pixels_to_ascii(image, ASCII_CHARS)
+
+
+# grayscale
+def gray(image):
+    return AsciiArtConverter.gray(image)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print an image as ASCII art and save it to "
+                                                 f"{OUTPUT_FILE}.")
+    parser.add_argument("path", nargs="?", help="image to convert (asked for when omitted)")
+    parser.add_argument("-w", "--width", type=int, default=75, help="characters per row (default: 75)")
+    parser.add_argument("-c", "--charset", choices=list(ASCII_SETS),
+                        help="character set of the GUI (default: the standard glyphs in 25-level buckets)")
+    parser.add_argument("--invert", action="store_true", help="dense glyphs for light pixels")
+    parser.add_argument("--aspect-ratio", type=float, default=ASPECT_RATIO,
+                        help="character width / height correction (default: 1.0)")
+    parser.add_argument("-Q", "--quality", default=QUALITY, choices=list(QUALITY_SETTINGS),
+                        help=f"decoding quality (default: {QUALITY})")
+    parser.add_argument("-o", "--output", default=OUTPUT_FILE, help=f"text file to write (default: {OUTPUT_FILE})")
+    args = parser.parse_args(argv)
+    if args.width < 1:
+        parser.error("--width must be at least 1")
+
+    # open image from the command line or user-input
+    path = args.path or input("Enter a valid pathname to an image:\n")
+    try:
+        image = im.open(path)
+    except (OSError, ValueError):
+        print(path, " is not a valid pathname to an image.")
+        return 1
+
+    # convert image to ascii
+    with image:
+        plane = AsciiArtConverter.reduced_plane(image, args.width, args.aspect_ratio, args.quality)
+    ascii_chars = ASCII_SETS[args.charset] if args.charset else ASCII_CHARS
+    ascii_image = AsciiArtConverter.render_ascii(plane, ascii_chars, args.invert)
+
+    print(ascii_image)
+
+    # save
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(ascii_image)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Conversion of palette, 1-bit and 16-bit images large enough to be block-reduced.
+
+Run with ``python -m pytest tests`` from the repository root.
+"""
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ascii_converter import QUALITY_SETTINGS, AsciiArtConverter, ConversionCache  # noqa: E402
+
+# Far above twice the grid at width 100, so every quality but exact reduces
+SIZE = (800, 600)
+
+
+def gradient():
+    return Image.linear_gradient("L").resize(SIZE)
+
+
+def make_image(kind):
+    base = gradient()
+    if kind == "P":
+        return Image.merge("RGB", (base, base.transpose(Image.FLIP_LEFT_RIGHT), base)).convert("P"), {}
+    if kind == "P transparency":
+        return Image.merge("RGB", (base, base, base)).convert("P"), {"transparency": 0}
+    if kind == "1":
+        return base.convert("1"), {}
+    # 16-bit grayscale, kept within the 8-bit range that grayscale conversion clips to
+    return base.convert("I").convert("I;16"), {}
+
+
+@pytest.mark.parametrize("kind", ["P", "P transparency", "1", "I;16"])
+@pytest.mark.parametrize("quality", list(QUALITY_SETTINGS))
+def test_reduced_modes_convert(tmp_path, kind, quality):
+    image, options = make_image(kind)
+    path = str(tmp_path / "image.png")
+    image.save(path, **options)
+    assert Image.open(path).mode == image.mode
+
+    plain = AsciiArtConverter.convert_to_ascii(path, 100, quality=quality)
+    assert not plain.startswith("Error"), plain
+    rows = plain.split("\n")
+    assert len(rows[0]) == 100
+    assert plain == AsciiArtConverter.convert_to_ascii(path, 100, quality=quality, cache=ConversionCache())
+    assert plain == AsciiArtConverter.convert_tiled(path, 100, quality=quality, workers=2, band_rows=8)
+
+
+def test_reduce_matches_unreduced_gray():
+    # Reducing the converted image averages the same gray levels as the original
+    image = make_image("I;16")[0]
+    plane = AsciiArtConverter.gray(AsciiArtConverter.load_reduced(image, 4))
+    expected = gradient().reduce(4)
+    assert plane.size == expected.size
+    assert plane.tobytes() == expected.tobytes()